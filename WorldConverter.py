@@ -22,14 +22,10 @@ LICENSE INFO:
 CHANGELOG: See changelog.txt
 '''
 
-import codecs
-import json
 import os
 import sys
 import webbrowser
-import urllib.error
 import urllib.request
-from collections import abc
 from glob import glob
 from time import time
 from typing import *
@@ -38,9 +34,12 @@ import tkinter.font as tkfont
 from tkinter import filedialog # not imported with tkinter by default
 from tkinter import messagebox # not imported with tkinter by default
 
-#### BEGIN UI SETUP ####
+# The conversion engine itself lives in the worldconverter package, which
+# doesn't need Tkinter. Everything in this file is just the GUI on top of it.
+import worldconverter.core
+from worldconverter import *
 
-VERSION = '3.4.6'
+#### BEGIN UI SETUP ####
 
 window = Tk()
 window.wm_title('Clippy’s World Converter')
@@ -106,10 +105,6 @@ icons = {
         PhotoImage(file='ui/accepted.png'),
 }
 
-# OTHER GLOBAL VARIABLES
-
-warnings = ''
-
 #### BEGIN UI FUNCTIONS ####
 
 def cls():
@@ -253,117 +248,9 @@ def simple_dialog(title:str, message:Union[str, List[str]],
 
 #### END UI CODE ####
 
-# Compatibility constants (see below)
-DELUXE  = 0b10000
-LEGACY  = 0b01000
-REMAKE  = 0b00100
-CLASSIC = 0b00010 # listed as "cross-platform" in menu
-# "Inferno" is an available setting but it's currently unused.
-# Basically it would be treated as Classic with fewer tiles/objects.
-INFERNO = 0b00001
-
-AUTODETECT = 0b00000 # Only for convert_from
-
-# OBJECT DATABASE
-# Format:
-# (name, compatibility, deluxe_id, legacy_id)
-# id of -1 means the tile doesn't exist in that version.
-#
-# compatibility is a binary number with bits in format <dlrci>, where:
-# - i for InfernoPlus (1.0.0 - 2.1.0),
-#   last common ancestor of Deluxe + all others
-# - c for Classic (by Igor & Cyuubi; 2.1.1 - 3.7.0),
-#   last common ancestor of Remake and Legacy
-# - r for Remake (by GoNow; no version numbers),
-#   new codebase but mostly backwards-compatible with Classic levels
-# - l for Legacy (by Terminal & Casini Loogi; 3.7.1 - 5.2.0)
-# - d for Deluxe (by Terminal & Casini Loogi)
-# EXAMPLES:
-# - 0b11011 means it's compatible with everything but Remake
-# - Semisolid at ID 6 is only compatible with Deluxe (0b10000) because it had a
-#   different ID in Classic, Legacy, and Remake
-ObjDbEntry = Tuple[str, int, int, int]
-OBJ_DATABASE : Tuple[ObjDbEntry, ...] = (
-    ('player',                  0b11111,1,  1),
-
-    ('goombrat',                0b11000,16, 16),
-    ('goomba',                  0b11111,17, 17),
-    ('green koopa troopa',      0b11111,18, 18),
-    ('red koopa troopa',        0b11111,19, 19),
-    ('koopa shell',             0b01000,-1, 20),
-    ('flying fish',             0b11111,21, 21),
-    ('piranha plant',           0b11111,22, 22),
-    ('spiny',                   0b11000,23, 23),
-    ('buzzy beetle',            0b11000,24, 24),
-    ('bowser',                  0b11111,25, 25),
-    ('dry bones',               0b01000,-1, 26),
-
-    ('made-up rabbit enemy',    0b01000,-1, 30),
-    ('boo',                     0b01000,-1, 31),
-    ('rotodisc',                0b01000,-1, 32),
-    ('fire bar',                0b11111,33, 33),
-    ('lava bubble',             0b11111,34, 34),
-    ('bill blaster',            0b11111,35, 35),
-    ('bullet bill',             0b11111,36, 36),
-    ('object spawner',          0b11110,37, 37),
-    ('banzai blaster',          0b01000,-1, 38),
-    ('banzai bill',             0b01000,-1, 39),
-    ('rex',                     0b10000,40, 40),
-    ('cheep cheep',             0b11000,38, 41),
-    ('thwomp',                  0b01000,-1, 42),
-    ('tweeter',                 0b01000,-1, 43),
-    ('icicle',                  0b01000,-1, 44),
-    ('fuzzy',                   0b01000,-1, 45),
-
-    ('hammer bro',              0b11111,49, 49),
-    ('fire bro',                0b11000,50, 50),
-
-    ('mushroom',                0b11111,81, 81),
-    ('fire flower',             0b11111,82, 82),
-    ('1up',                     0b11111,83, 83),
-    ('star',                    0b11111,84, 84),
-    ('axe',                     0b11111,85, 85),
-    ('poison mushroom',         0b11111,86, 86),
-    ('checkpoint',              0b01000,-1, 87),
-
-    ('coin',                    0b11111,97, 97),
-
-    ('gold flower',             0b01000,-1, 100),
-        # in Remake editor but unused in game
-
-    ('door',                    0b01000,-1, 129),
-    ('key',                     0b01000,-1, 130),
-
-    ('platform',                0b11111,145,145),
-    ('bus platform',            0b11111,146,146),
-    ('path platform',           0b01000,-1, 147),
-
-    ('spring',                  0b11111,149,149),
-
-    ('fireball projectile',     0b11111,161,161),
-    ('fire breath projectile',  0b11111,162,162),
-    ('hammer projectile',       0b11111,163,163),
-
-    ('flag',                    0b11111,177,177),
-    ('goalpost',                0b11000,178,178), # from SMW
-
-    ('cheep cheep spawner',     0b01000,-1, 193),
-    ('environment prop',        0b01000,-1, 200),
-
-    ('text',                    0b11111,253,253),
-    ('checkmark',               0b11111,254,254),
-
-    # Deluxe only:
-    ('blooper',                 0b10000,39, -1),
-    ('leaf',                    0b10000,87, -1),
-    ('hammer suit',             0b10000,88, -1),
-)
-UNKNOWN_OBJ = ('UNKNOWN', 0b00000, -1, -1)
-    # generic entry for unknown object, e.g. if an invalid ID is removed
-removed_objects = [] # Object IDs removed from the world will go here
-
 # Misc. global variables
-convert_fail = False
+# These hold the options selected in the menu, and get passed to the
+# conversion engine as plain ints/bools when the user starts converting
 
 convert_from = IntVar()
 convert_from.set(AUTODETECT)
@@ -375,1159 +262,10 @@ convert_to.set(DELUXE)
 # to progressive item boxes
 use_prog = IntVar()
 
-# TILE DATABASE
-# Format: (tile_name, version_support, deluxe_id, legacy_id, remake_id,
-#           (fallback1, fallback2, ...))
-# id of -1 means the tile doesn't exist in that version.
-# Fallback can be 0 (air), 1 (solid), or a valid tile_name.
-# If possible, make the last fallback supported in all versions.
-# If a version doesn't support any fallback, default to air.
-TileDbEntry = Tuple[str, int, int, int, int, tuple]
-TILE_DATABASE : Tuple[TileDbEntry, ...] = (
-    # The program expects index 0 to be Air and index 1 to be Solid Standard.
-    # All other indices do not have a guaranteed definition.
-    ('air', 0b11111, 0, 0, 0, (0,)),
-    ('solid standard', 0b11111, 1, 1, 1, (0,)),
-
-    # Supported in all versions
-    ('solid bumpable', 0b11111, 2, 2, 2, (0,)),
-    ('solid breakable', 0b11111, 3, 3, 3, (0,)),
-    ('item block', 0b11111, 17, 17, 17, (0,)),
-    ('coin block', 0b11111, 18, 18, 18, (0,)),
-    ('coin block multi', 0b11111, 19, 19, 19, (0,)),
-    ('item block invisible', 0b11111, 21, 21, 21, (0,)),
-    ('coin block invisible', 0b11111, 22, 22, 22, (0,)),
-    ('vine block', 0b11111, 24, 24, 24, (0,)),
-    ('warp tile', 0b11111, 81, 81, 81, (0,)),
-    ('warp pipe down slow', 0b11111, 82, 82, 82, (0,)),
-    ('warp pipe right slow', 0b11111, 83, 83, 83, (0,)),
-    ('warp pipe down fast', 0b11111, 84, 84, 84, (0,)),
-    ('warp pipe right fast', 0b11111, 85, 85, 85, (0,)),
-    ('level end warp', 0b11111, 86, 86, 86, (0,)),
-    ('flagpole', 0b11111, 160, 160, 160, (0,)),
-    ('vine', 0b11111, 165, 165, 165, (0,)),
-    ('vote block', 0b11111, 240, 240, 240, (0,)),
-
-    # Added in Cyuubi builds (common ancestor of Remake and Legacy)
-    # (sorted by Legacy ID)
-    ('solid damage', 0b11110, 4, 4, 4, (1,)),
-    ('semisolid', 0b11110, 6, 5, 5, (1,)),
-    ('semisolid weak', 0b01110, -1, 6, 6, (0,)),
-    ('water surface', 0b01110, -1, 8, 8, ('water', 0,)), # pushes you down
-    ('water current', 0b01110, -1, 9, 9, ('water', 0,)), # pushes you left/right
-    ('water', 0b11110, 7, 7, 7, (0,)),
-    ('item block infinite', 0b11110, 25, 25, 25, (0,)),
-
-    # Added in Remake (sorted by Remake ID)
-    ('solid ice', 0b11100, 10, 10, 10, (1,)),
-    ('note block', 0b11100, 11, 11, 11, (1,)),
-        # ^ called "pop block" in Remake but works the same
-    ('conveyor', 0b00100, -1, -1, 12, (1,)),
-        # ^ in Deluxe but as 2 different tiles
-
-    # Added in Legacy 4.x (sorted by Legacy ID)
-    ('item note block', 0b11000, 12, 12, -1, ('note block', 'item block',)),
-    ('ice -> tile', 0b01000, -1, 13, -1, ('ice -> object', 'solid ice', 1,)),
-    ('flip block', 0b11000, 8, 14, -1, ('solid breakable',)),
-    ('air damage', 0b11000, 5, 15, -1, ('solid damage', 0,)),
-    ('ice -> object', 0b11000, 13, 16, -1, ('solid ice', 1,)),
-    ('item block progressive', 0b11000, 20, 20, -1, ('item block',)),
-    ('semisolid ice', 0b01000, -1, 23, -1, ('semisolid', 1,)),
-    ('item block invisible progressive', 0b11000, 27, 26, -1,
-        ('item block invisible',)),
-    ('scroll lock x', 0b11000, 30, 30, -1, (0,)),
-    ('scroll unlock x', 0b11000, 31, 31, -1, (0,)),
-    ('checkpoint', 0b01000, -1, 40, -1, (0,)),
-    ('warp pipe single slow', 0b11000, 93, 87, -1, (1,)),
-    ('warp pipe single fast', 0b11000, 94, 88, -1, (1,)),
-    ('warp pipe left slow', 0b11000, 89, 89, -1, (1,)),
-    ('warp pipe left fast', 0b11000, 90, 90, -1, (1,)),
-    ('warp pipe up slow', 0b11000, 91, 91, -1, (1,)),
-    ('warp pipe up fast', 0b11000, 92, 92, -1, (1,)),
-    ('flagpole level end warp', 0b01000, -1, 161, -1, ('level end warp',)),
-
-    # ONLY in Deluxe (sorted by Deluxe ID)
-    ('conveyor left', 0b10000, 14, -1, -1, ('conveyor', 1,)),
-    ('conveyor right', 0b10000, 15, -1, -1, ('conveyor', 1,)),
-    ('item block regen', 0b10000, 26, -1, -1,
-        ('item block infinite', 'item block',)),
-    ('warp tile relative', 0b10000, 80, -1, -1, (0,)),
-        # ^ not compatible with td32
-    ('warp tile random', 0b10000, 87, -1, -1, (0,)),
-    ('message block', 0b10000, 241, -1, -1, (1,)),
-    ('sound block', 0b10000, 239, -1, -1, (0,)),
-
-    # Added in Legacy 5.x and later (sorted by Legacy ID)
-    ('half tile bumpable', 0b01000, -1, 27, -1, ('solid bumpable',)),
-    ('half tile solid', 0b01000, -1, 28, -1, (1,)),
-    ('half tile semisolid', 0b01000, -1, 29, -1, ('semisolid', 1,)),
-    ('scroll lock y', 0b01000, -1, 32, -1, (0,)),
-    ('scroll unlock y', 0b01000, -1, 33, -1, (0,)),
-    ('scroll lock x/y', 0b01000, -1, 34, -1, (0,)),
-    ('scroll unlock x/y', 0b01000, -1, 35, -1, (0,)),
-    ('player barrier', 0b11000, 9, 36, -1, (1,)),
-    ('enemy barrier', 0b01000, -1, 37, -1, (0,)),
-)
-
-# List of tuple(str, str) with any incompatible tiles that got replaced
-replacement_list = []
-
-# Build lookups for obj database based on L/D tile IDs
-# KEY: the object's ID in L/D
-# VALUE: the tuple index of the object's database entry
-# Loading this from a file would be faster but also less secure
-deluxe_obj_lookup : Dict[int, int] = {}
-for i_index, i_item in enumerate(OBJ_DATABASE):
-    obj_id = i_item[2]
-    if obj_id >= 0: # negative ID = obj doesn't exist in this version
-        deluxe_obj_lookup[obj_id] = i_index
-legacy_obj_lookup : Dict[int, int] = {}
-for i_index, i_item in enumerate(OBJ_DATABASE):
-    obj_id = i_item[3]
-    if obj_id >= 0: # negative ID = obj doesn't exist in this version
-        legacy_obj_lookup[obj_id] = i_index
-# Unlike tile lookups, there's no remake ID because that's the same as legacy
-
-# Build lookups for tile database based on R/L/D tile IDs
-# KEY: the tile's ID in R/L/D
-# VALUE: the tuple index of the tile's database entry
-# Loading this from a file would be faster but also less secure
-deluxe_tile_lookup : Dict[int, int] = {}
-for i_index, i_item in enumerate(TILE_DATABASE):
-    tile_id = i_item[2]
-    if tile_id >= 0: # negative ID = tile doesn't exist in this version
-        deluxe_tile_lookup[tile_id] = i_index
-legacy_tile_lookup : Dict[int, int] = {}
-for i_index, i_item in enumerate(TILE_DATABASE):
-    tile_id = i_item[3]
-    if tile_id >= 0: # negative ID = tile doesn't exist in this version
-        legacy_tile_lookup[tile_id] = i_index
-remake_tile_lookup : Dict[int, int] = {}
-for i_index, i_item in enumerate(TILE_DATABASE):
-    tile_id = i_item[4]
-    if tile_id >= 0:
-        remake_tile_lookup[tile_id] = i_index
-
-def get_obj_by_name(name:str) -> Optional[Tuple[str, int, int, int]]:
-    '''
-    Given an obj's standard string name as it appears in the above database,
-    return that obj's database entry.
-    '''
-    for i in OBJ_DATABASE:
-        if i[0] == name:
-            return i
-    # If name doesn't exist in database, return None
-    return None
-
-def get_obj_id_for_version(obj:Tuple[str, int, int, int]) -> int:
-    '''
-    Given an obj database entry, return the correct obj ID int for the game
-    version set in the global variable convert_to
-    '''
-    if convert_to.get() == DELUXE:
-        new_id = obj[2]
-    else: # legacy/remake/classic/inferno
-        new_id = obj[3]
-    return new_id
-
-def get_tile_by_name(name:str) -> TileDbEntry:
-    '''
-    Given a tile's standard string name as it appears in the above database,
-    return that tile's database entry.
-    '''
-    for i in TILE_DATABASE:
-        if i[0] == name:
-            return i
-    # If name doesn't exist in database, return air
-    return TILE_DATABASE[0]
-
-def get_tile_id_for_version(tile:TileDbEntry) -> int:
-    '''
-    Given a tile database entry, return the correct tile data int for the game
-    version set in the global variable convert_to
-    '''
-    if convert_to.get() == DELUXE:
-        new_id = tile[2]
-    elif convert_to.get() == REMAKE:
-        new_id = tile[4]
-    else: # legacy/classic/inferno
-        new_id = tile[3]
-    return new_id
-
-def convert_tile(old_td:list) -> Union[list, int]:
-    '''
-    Convert a tile from one version to another, including any ID changes and
-    replacements of incompatible tiles.
-    Takes in an int[5] list, i.e. the Deluxe tile format.
-    Returns the new tile in the target version's format.
-    '''
-    # Deluxe TD format:
-    # 0. sprite index (keep)
-    # 1. bump state (keep)
-    # 2. depth (keep)
-    # 3. tile data (change)
-    # 4. extra data (keep except in special cases)
-    new_td = old_td.copy()
-
-    # Get data of the tile that the old ID refers to
-    if convert_from.get() == DELUXE:
-        try:
-            db_entry = TILE_DATABASE[deluxe_tile_lookup[old_td[3]]]
-        except KeyError:
-            # If tile ID is invalid, turn it into air
-            db_entry = TILE_DATABASE[0]
-    elif convert_from.get() == REMAKE:
-        try:
-            db_entry = TILE_DATABASE[remake_tile_lookup[old_td[3]]]
-        except KeyError:
-            # If tile ID is invalid, turn it into air
-            db_entry = TILE_DATABASE[0]
-    else: # legacy/classic/inferno
-        try:
-            db_entry = TILE_DATABASE[legacy_tile_lookup[old_td[3]]]
-        except KeyError:
-            # If tile ID is invalid, turn it into air
-            db_entry = TILE_DATABASE[0]
-
-    # Find that tile's new ID
-    new_td[3] = get_tile_id_for_version(db_entry)
-
-    # If converting to L/D, use progressive item blocks where appropriate
-    if convert_to.get() & (LEGACY|DELUXE) and use_prog.get() \
-            and old_td[4] in (81, 82): # mushroom, flower
-        if db_entry[0] == 'item block':
-            new_td[3] = 20 # progressive item block ID in both Legacy & Deluxe
-        if db_entry[0] == 'item block invisible':
-            new_td[3] = 27 if convert_to.get()==DELUXE else 26
-
-    # If tile not compatible with target version, follow fallback chain
-    if not (db_entry[1] & convert_to.get()):
-        replacement = ('error', 'error')
-
-        for i in db_entry[5]: # tuple of possible fallback tiles
-            if i == 0 or i == 1:
-                # In the database, 0 and 1 are accepted shorthands for
-                # air and solid, respectively -- for convenience
-                fallback_id = i
-                fallback_entry = TILE_DATABASE[i]
-            else:
-                fallback_entry = get_tile_by_name(i)
-                fallback_id = get_tile_id_for_version(fallback_entry)
-
-            # If the fallback tile is compatible with the target version:
-            if fallback_entry[1] & convert_to.get():
-                new_td[3] = fallback_id
-
-                # Get data for fallback tile to add to log
-                # (may be changed by special cases below)
-                replacement = (db_entry[0], fallback_entry[0])
-
-                # BEGIN SPECIAL CASES (mostly for extra data)
-
-                # Convert conveyors from Remake to Deluxe format
-                if db_entry[0] == 'conveyor' and convert_to.get() == DELUXE:
-                    if old_td[4] < 128:
-                        new_td[3] = 14 # Conveyor left
-                        replacement = (db_entry[0], 'conveyor left')
-                    elif old_td[4] > 128:
-                        new_td[3] = 15 # Conveyor right
-                        replacement = (db_entry[0], 'conveyor right')
-                    else: # Remake conveyor speed = 0
-                        new_td[3] = 1 # Solid standard
-
-                # Convert conveyors from Deluxe to Remake format
-                # Make the custom Remake speed about the same as
-                # the only Deluxe speed
-                if db_entry[0] == 'conveyor left' and \
-                        convert_to.get() == REMAKE:
-                    new_td[4] = 124
-                if db_entry[0] == 'conveyor right' and \
-                        convert_to.get() == REMAKE:
-                    new_td[4] = 132
-
-                # Make former progressive item blocks
-                # always spit out a mushroom
-                if 'progressive' in db_entry[0]:
-                    new_td[4] = 81 # mushroom
-
-                # turn ice -> tile blocks into ice -> object blocks
-                # that turn into 0 object
-                if 'ice -> tile' in db_entry[0]:
-                    new_td[4] = 0
-
-                # END SPECIAL CASES
-
-                break
-            # If fallback tile is NOT compatible with target
-            # version, do another round of the loop
-
-        # When loop is done, leave note that tile was replaced
-        if replacement not in replacement_list:
-            replacement_list.append(replacement)
-
-    # End fallback code
-
-    if convert_to.get() == DELUXE:
-        # If we're converting to Deluxe,
-        # we're already using the right tile format
-        return new_td
-    else:
-        # If we're converting to an older version,
-        # return the tile in td32 format
-        return new_td[0] + new_td[1]*(2**11) + new_td[2]*(2**15) + \
-                new_td[3]*(2**16) + new_td[4]*(2**24)
-
-def web_file_exists(path:str):
-    '''
-    Test if an image file exists on the web.
-    Return True if the specified string is a valid URL.
-    Return False if attempting to visit the URL returns an HTTP error.
-    Return None if GoNow forgot to renew his TLS certificate again.
-    '''
-    try:
-        # Assign to throwaway variable, just call to check for error
-        _ = urllib.request.urlopen(path).status
-        return True
-    except AttributeError:
-        # If using Python 3.8.x or earlier, use `code` instead of `status`
-        # Assign to throwaway variable, just call to check for error
-        _ = urllib.request.urlopen(path).code
-        return True
-    except urllib.error.HTTPError:
-        # If the path leads to a 404, or the server is down
-        return False
-    except urllib.error.URLError:
-        # If Remake's certificate expired AGAIN. (URLError could also mean
-        # "no internet", but that case is handled elsewhere.)
-        return None
-
-def extract_tile(tile:abc.Sequence):
-    '''
-    Given a tile of unknown format, return
-    the tile normalized to a list of 5 ints
-    '''
-    global warnings
-
-    # Start with an empty tile
-    extracted_tile = [30,0,0,0,0]
-
-    try:
-        if isinstance(tile, list):
-            # Deluxe: list-based format
-            # ValueError = not an int (e.g. extra data in relative warp tiles)
-            # IndexError = out of range (e.g. if tile data is just [30])
-            try:
-                extracted_tile[0] = int(tile[0])
-            except (ValueError, IndexError):
-                extracted_tile[0] = 30 # empty sprite
-            try:
-                extracted_tile[1] = int(tile[1])
-            except (ValueError, IndexError):
-                extracted_tile[1] = 0
-            try:
-                extracted_tile[2] = int(tile[2])
-            except (ValueError, IndexError):
-                extracted_tile[2] = 0
-            try:
-                extracted_tile[3] = int(tile[3])
-            except (ValueError, IndexError):
-                extracted_tile[3] = 0
-            try:
-                extracted_tile[4] = int(tile[4])
-            except (ValueError, IndexError):
-                extracted_tile[4] = 0
-        elif isinstance(tile, int):
-            # Legacy and earlier: td32
-            extracted_tile[0] = tile % 2**11 # sprite: 11-bit
-            extracted_tile[1] = tile // 2**11 % 2**4 # bump state: 4-bit
-            extracted_tile[2] = tile // 2**15 % 2 # depth: 1-bit
-            extracted_tile[3] = tile // 2**16 % 2**8 # definition: 8-bit
-            extracted_tile[4] = tile // 2**24 % 2**8 # extra data: 8-bit
-        # Else, it's a format we just don't recognize at all, so we stick to
-        # the default extracted_tile
-    except Exception:
-        warnings += f'Failed to convert tile: {tile}\n'
-
-    return extracted_tile
-
-def absolute_path(version: int, rel_path: str):
-    '''
-    Given a relative path, convert to an absolute URL path
-    '''
-    if version == DELUXE:
-        return 'https://raw.githubusercontent.com/mroyale/assets-dx/main/' + \
-                rel_path
-    elif version == REMAKE:
-        return 'https://mroyale.net/' + rel_path
-    else: # LEGACY
-        return 'https://raw.githubusercontent.com/mroyale/assets/legacy/' + \
-                rel_path
-
-def is_abs_path(url: str):
-    return (url.startswith('http://') or \
-            url.startswith('https://') or \
-            url.startswith('//'))
-
-def convert(open_path: str, save_path: str):
-    '''
-    Convert 1 world file from Legacy TO DELUXE, and return string
-    containing all converter warnings
-    '''
-    global convert_fail, warnings
-    convert_fail = False # Wipe away previous failed conversions
-    warnings = '' # Reset warnings
-
-    if open_path == save_path:
-        convert_fail = True
-        error_msg = f'For your safety, this program does not allow you to \
-overwrite your existing world files. \
-Please try a different file path.\n{open_path}\n'
-        return error_msg
-
-    try:
-        # Open and read the old world file
-        read_file = codecs.open(open_path, 'r', 'utf-8-sig')
-        content = json.load(read_file)
-        read_file.close()
-    except FileNotFoundError:
-        # Not sure if we can get here now that the GUI handles file opening,
-        # but this can't hurt
-        convert_fail = True
-        error_msg = f'The selected file does not exist.\n{open_path}\n'
-        return error_msg
-    except IsADirectoryError:
-        convert_fail = True
-        error_msg = f'The selected file is a folder.\n{open_path}\n'
-        return error_msg
-    except UnicodeDecodeError:
-        # File is an image, movie, or other binary
-        convert_fail = True
-        error_msg = f'The selected file is a binary file such as an image, \
-song, or movie, and could not be read.\n{open_path}\n'
-        return error_msg
-    except json.decoder.JSONDecodeError:
-        # File is not JSON
-        convert_fail = True
-        error_msg = f'''The selected text file could not be read.
-Are you sure it’s a world?\n{open_path}\n'''
-        return error_msg
-
-    # Create a file at the save path if it doesn't already exist.
-    # No overwriting yet because if the user is saving over an existing level
-    # and the program crashes, we don't want the user to lose previous progress
-    try:
-        open(save_path, 'a', encoding='utf-8').close()
-    except PermissionError:
-        # If user tries to save to a folder they don't have write access to
-        convert_fail = True
-        error_msg = f'Your computer blocked World Converter from saving to \
-the selected folder: \n{save_path}\n'
-        return error_msg
-
-    try:
-        # Might as well check for layers now,
-        # so we don't have to do it over and over again
-        if 'layers' in content['world'][0]['zone'][0]:
-            has_layers = True
-        else:
-            has_layers = False
-
-        # Auto-detect version of source file if necessary
-        # Why is this a while loop when I only want to run it once?
-        # Because Python doesn't have goto
-        while convert_from.get() == AUTODETECT:
-            # Test for Deluxe format by checking if tiles are lists
-            if has_layers:
-                dx_check = isinstance(content['world'][0]['zone'][0]['layers']\
-                        [0]['data'][0][0], list)
-            else:
-                dx_check = isinstance(content['world'][0]['zone'][0]\
-                        ['data'][0][0], list)
-            if dx_check:
-                convert_from.set(DELUXE)
-                break
-
-            # Remake-exclusive World attributes
-            if 'vertical' in content or 'autoMove' in content:
-                convert_from.set(REMAKE)
-                break
-
-            # Legacy-exclusive World attributes
-            if 'group' in content or 'longname' in content:
-                convert_from.set(LEGACY)
-                break
-
-            # Try to detect version based on map availability
-            # (if we have internet)
-            for index, item in enumerate(content['resource']):
-                # Expand relative map paths to the correct full URL,
-                # based on the version selected/detected earlier.
-                # First of all, only do this if it *is* a relative path, because
-                # if it's already a full URL, then we shouldn't have any issues
-                if item['id'] == 'map' and not is_abs_path(item['src']):
-                    try:
-                        # Basic internet connection test
-                        urllib.request.urlopen('http://google.com')
-                        # If this causes an error, there's a 99% chance you're
-                        # not connected to the internet
-
-                        # First try Legacy URL
-                        legacy_url = absolute_path(LEGACY, item['src'])
-                        exists_in_legacy = web_file_exists(legacy_url)
-                        if exists_in_legacy is True:
-                            convert_from.set(LEGACY)
-                        elif exists_in_legacy is None:
-                            convert_from.set(LEGACY)
-                            warnings += \
-'Security warning on Legacy map image.\n'
-                        else:
-                            # If it's not in Legacy, fall back to Remake URL
-                            remake_url = absolute_path(REMAKE, item['src'])
-                            exists_in_remake = web_file_exists(remake_url)
-                            if exists_in_remake is True:
-                                convert_from.set(REMAKE)
-                            elif exists_in_remake is None:
-                                convert_from.set(REMAKE)
-                                warnings += \
-'Security warning on Remake map image, what a surprise.\n'
-                            # If it's not in Legacy or Remake, give up
-                            else:
-                                warnings += \
-f'Couldn’t find the map sheet {open_path.split(os.sep)[-1]} in Legacy or \
-Remake. Defaulting to Legacy for the world version.\n'
-                    except urllib.error.HTTPError:
-                        # If test page 404s, fall through to the "detect
-                        # everything else as Legacy" code
-                        warnings += 'No internet connection! Version \
-detection will be less accurate.\n'
-                    except urllib.error.URLError:
-                        # If no internet, fall through to the "detect
-                        # everything else as Legacy" code
-                        warnings += 'No internet connection! Version \
-detection will be less accurate.\n'
-                    finally:
-                        pass
-                    # Since we've found the map sheet, we don't need to
-                    # keep looping anymore
-                    break
-
-            # Remake-exclusive feature check #1:
-            # Fire bars have 4 params in Remake, and 3 in Legacy
-            for level_i, level in enumerate(content['world']): # Loop thru lvls
-                for zone_i, zone in enumerate(level['zone']): # Loop thru zones
-                    for obj_i, obj in enumerate(zone['obj']): # Loop thru objs
-                        if obj['type'] == 33: # fire bar
-                            if len(obj['param']) == 4:
-                                convert_from.set(REMAKE)
-
-            # Remake-exclusive feature check #2: conveyors
-            for level_i, level in enumerate(content['world']): # Loop thru lvls
-                for zone_i, zone in enumerate(level['zone']): # Loop thru zones
-                    if has_layers:
-                        for layer_i, layer in enumerate(zone['layers']):
-                                                        # Loop thru layers
-                            for row_i, row in enumerate(layer['data']):
-                                                            # Loop thru rows
-                                for tile_i, tile in enumerate(row):
-                                                            # Loop tiles by col
-                                    test_tile = extract_tile(tile)
-                                    # Check for conveyor tile (see below)
-                                    if test_tile[3] == 12 \
-                                            and test_tile[4] >= 112 \
-                                            and test_tile[4] < 144:
-                                        convert_from.set(REMAKE)
-                    else:
-                        for row_i, row in enumerate(zone['data']):
-                                                        # Loop thru rows
-                            for tile_i, tile in enumerate(row):
-                                                        # Loop tiles by col
-                                test_tile = extract_tile(tile)
-                                # Check for conveyor tile (ID 12 in Remake).
-                                # In Legacy, ID 12 = Item Note Block, so we also
-                                # make sure Extra Data has a reasonable speed
-                                # value that ISN'T a valid object ID.
-                                if test_tile[3] == 12 and test_tile[4] >= 112 \
-                                        and test_tile[4] < 144:
-                                    convert_from.set(REMAKE)
-
-            # Treat everything else as Legacy because it has more tile options
-            # and it's harder to detect from file contents
-            # This could make conveyors get misconverted, but they only show
-            # up in 2 known worlds (Royale City and Stiz 1)
-            if convert_from.get() == AUTODETECT:
-                warnings += 'Failed to definitively detect world version; \
-defaulting to Legacy. Please check to make sure this is correct.\n'
-                convert_from.set(LEGACY)
-            else:
-                warnings += \
-                    f'World version detected as {game_ver_str(convert_from)}\n'
-            break
-
-        # Vertical (really free-roam) scrolling is set zone-by-zone in L/D
-        vertical_world = False
-        if convert_from.get() == REMAKE and 'vertical' in content:
-            if content['vertical'] == 'true':
-                vertical_world = True
-            del content['vertical']
-        # If ANY zone in a Deluxe or Legacy world is set to
-        # Vertical or Free-Roam camera, make the whole world vertical in Remake
-        if convert_from.get() & (DELUXE|LEGACY) \
-                and convert_to.get() == REMAKE:
-            # Yup, we gotta loop thru EVERY world, level, and zone
-            for level_i, level in enumerate(content['world']):
-                for zone_i, zone in enumerate(level['zone']):
-                    # If world was vertical, add free-roam camera to each zone
-                    if zone['camera'] != 0:
-                        vertical_world = True
-                        break
-                if vertical_world: # Second break after detecting vertical
-                    break
-            # If we detected a vertical zone at any point in the loop,
-            # add the vertical flag to the world
-            content['vertical'] = 'true'
-
-        if convert_to.get() == DELUXE:
-            # Add extra effects sprite sheet that's not in Legacy or Remake
-            content['resource'].append({"id":"effects",
-                    "src":"img/game/smb_effects.png"})
-
-            # Add audio override so Legacy worlds play their original music/SFX
-            # if convert_from.get() == REMAKE:
-            #     content["audioOverrideURL"] = absolute_path(REMAKE,'audio/')
-            if convert_from.get() & (LEGACY|CLASSIC|INFERNO):
-                content["audioOverrideURL"] = absolute_path(LEGACY, 'audio/')
-
-            # Remove effects sheet that's only in Deluxe
-            for index, dict_ in enumerate(content['resource']):
-                if dict_['id'] == 'effects':
-                    del content['resource'][index]
-
-        if convert_to.get() & (DELUXE|INFERNO):
-            # Delete world data that isn't in Deluxe
-            if 'shortname' in content:
-                del content['shortname']
-            if 'longname' in content:
-                del content['longname']
-            if 'autoMove' in content:
-                del content['autoMove']
-            if 'musicOverridePath' in content:
-                del content['musicOverridePath']
-            if 'soundOverridePath' in content:
-                del content['soundOverridePath']
-            # NOTE: This is only necessary because the Java (Inferno/Deluxe)
-            # server rejects any world with a parameter it doesn't recognize,
-            # while the Python (Classic/Legacy) server simply ignores unknown
-            # parameters. (The Remake server also ignores them.)
-
-        if convert_to.get() & (LEGACY|REMAKE|CLASSIC):
-            # Add shortname to make world pass validation in
-            # Classic and Legacy. For Remake, it's just useful as a watermark.
-            if 'shortname' not in content:
-                content['shortname'] = '[WC]'
-            # longname isn't *necessary* anywhere, but again, watermark
-            if 'longname' not in content:
-                content['longname'] = \
-                    f"Converted with Clippy's World Converter (v{VERSION})"
-            if 'mode' not in content:
-                content['mode'] = 'royale'
-            # Legacy music overrides only work with relative paths,
-            # not full URLs, so we can't play music in Legacy yet
-
-        # Turn lobbies into regular worlds so they don't crash the game
-        content['type'] = 'game'
-        # Any valid level should have a type, so no existence check needed.
-        # If the level is missing a type, it will throw a KeyError, which will
-        # make the program say the level is corrupted
-
-        # Add full URL for Legacy assets when converting to Deluxe
-        if convert_to.get() == DELUXE:
-            if convert_from.get() == LEGACY and 'assets' in content:
-                if not is_abs_path(content['assets']):
-                    content['assets'] = absolute_path(LEGACY,
-                                                  "assets/"+content['assets'])
-            # If the world doesn't specify assets (i.e. Classic & Remake),
-            # use Legacy assets because they're a superset of Classic/Remake's
-            # hardcoded animations
-            else:
-                content['assets'] = absolute_path(LEGACY,
-                        'assets/assets.json')
-        # Similar situation but for Deluxe->Legacy assets
-        elif convert_from.get() == DELUXE and convert_to.get() == LEGACY:
-            if 'assets' in content:
-                if not is_abs_path(content['assets']):
-                    content['assets'] = absolute_path(DELUXE,
-                                                  "assets/"+content['assets'])
-            else:
-                # Deluxe worlds won't use the Legacy animations
-                content['assets'] = absolute_path(DELUXE,
-                        'assets/assets-noanim.json')
-        # DX->R assets will just be wrong and there's nothing I can do about it
-
-        # Convert map & obj sheets
-        for index, item in enumerate(content['resource']):
-            # Expand relative map paths to the correct full URL,
-            # based on the version selected/detected earlier.
-            # First of all, only do this if it *is* a relative path, because
-            # if it's already a full URL, then we shouldn't have any issues
-            if item['id'] == 'map' and not is_abs_path(item['src']):
-                if convert_from.get() == DELUXE:
-                    dx_url = absolute_path(DELUXE, item['src'])
-                    content['resource'][index]['src'] = dx_url
-                elif convert_from.get() == REMAKE:
-                    remake_url = absolute_path(REMAKE, item['src'])
-                    content['resource'][index]['src'] = remake_url
-                else: # legacy
-                    legacy_url = absolute_path(LEGACY, item['src'])
-                    content['resource'][index]['src'] = legacy_url
-
-            # Either convert obj URL from relative to absolute, or if conversion
-            # involves Deluxe, change the obj to a set default because Deluxe
-            # uses a different obj sheet layout from other versions
-            if item['id'] == 'obj':
-                # Converting from Any to Deluxe: Switch to Deluxe default obj
-                if convert_to.get() == DELUXE:
-                    content['resource'][index]['src'] = absolute_path(DELUXE,
-                            'img/game/smb_obj.png')
-                # Converting from Deluxe to Any: Switch to Legacy's SMAS obj
-                elif convert_from.get() == DELUXE:
-                    content['resource'][index]['src'] = absolute_path(LEGACY,
-                            'img/game/smas_obj.png')
-                # Don't need a special case for Legacy->Remake because Legacy
-                # obj is a superset of Remake's
-                # If the conversion doesn't involve Deluxe but it uses a
-                # relative path
-                elif not is_abs_path(item['src']):
-                    # Converting from Remake to Legacy: Expand obj sheet URL
-                    # to absolute path on Remake domain
-                    if convert_from.get() == REMAKE:
-                        content['resource'][index]['src'] = \
-                                absolute_path(REMAKE, item['src'])
-                    # Converting from Legacy to Remake: Expand obj sheet URL
-                    # to absolute path on Legacy domain
-                    else:
-                        legacy_url = \
-                        content['resource'][index]['src'] = \
-                                absolute_path(LEGACY, item['src'])
-                # Else (i.e. if the conversion doesn't involve Deluxe and it
-                # already uses an absolute path), leave it
-
-        for level_i, level in enumerate(content['world']): # Loop thru levels
-            for zone_i, zone in enumerate(level['zone']): # Loop thru zones
-                # Calculate zone height (for flagpole placement and
-                # per-zone vertical setting)
-                if has_layers:
-                    zone_height = len(zone['layers'][0]['data'])
-                else:
-                    zone_height = len(zone['data'])
-                # Calculate zone width (for background looping)
-                zone_width = 0
-                if convert_from.get() == DELUXE:
-                    if has_layers:
-                        zone_width = len(zone['layers'][0]['data'][0])
-                    else:
-                        zone_width = len(zone['data'][0])
-
-                if convert_to.get() == DELUXE:
-                    # Delete world data that isn't in Deluxe because it
-                    # doesn't like extra parameters
-                    if 'winmusic' in content['world'][level_i]['zone'][zone_i]:
-                        del content['world'][level_i]['zone'][zone_i]\
-                                ['winmusic']
-                    if 'victorymusic' in \
-                                content['world'][level_i]['zone'][zone_i]:
-                        del content['world'][level_i]['zone'][zone_i]\
-                                ['victorymusic']
-                    if 'levelendoff' in \
-                                content['world'][level_i]['zone'][zone_i]:
-                        del content['world'][level_i]['zone'][zone_i]\
-                                ['levelendoff']
-
-                    # If world was vertical in Remake, add free-roam camera
-                    # to each zone in Deluxe if zone is above height limit 14
-                    if vertical_world and zone_height > 14:
-                        content['world'][level_i]['zone'][zone_i]['camera'] = 2
-                elif convert_to.get() == LEGACY:
-                    # If world was vertical in Remake, add free-roam camera
-                    # to each zone in Legacy if zone is above height limit 16
-                    if vertical_world and zone_height > 16:
-                        content['world'][level_i]['zone'][zone_i]['camera'] = 2
-
-                # Fix background image URLs in Deluxe worlds
-                if convert_from.get() == DELUXE and 'background' in zone:
-                    for i in zone['background']:
-                        dx_url = absolute_path(DELUXE, i['url'])
-                        i['url'] = dx_url
-                        # Legacy doesn't yet support infinite bg looping,
-                        # so we need to calculate it from zone width + speed.
-                        # Assume bg image width is ≥128px (the lowest width
-                        # found in Deluxe's assets). In most cases our estimate
-                        # will be too high, but that should be fine because
-                        # there's background culling
-                        if i['loop'] <= 0:
-                            i['loop'] = (zone_width // 8) + 1
-
-                # Adjust position of left warp exits
-                # Remake and Legacy have a bug where you need to place a warp
-                # three tiles right of the pipe if you want the player to exit
-                # in the right place. Deluxe fixed this bug, so we need to
-                # shift any left warps in the zone
-                for warp in zone['warp']:
-                    # Replace no-offset warps if converting to anything other
-                    # than Deluxe or Legacy
-                    if convert_to.get() < LEGACY:
-                        if warp['data'] == 5:
-                            warp['data'] = 1
-                        elif warp['data'] == 6:
-                            warp['data'] = 2
-                    if warp['data'] == 3:
-                        if convert_to.get() == DELUXE:
-                            if warp['pos'] % 65536 >= 3:
-                                # Shift 3 left to "correct" position
-                                # (though it's still 1 tile left of
-                                # what I'd expect)
-                                warp['pos'] -= 3
-                            else:
-                                # If warp is all the way at the left for some
-                                # reason, clip its x tile to 0
-                                warp['pos'] -= (warp['pos'] % 65536)
-                        elif convert_from.get() == DELUXE:
-                            # Shift 3 right to "incorrect" position
-                            # Note that warps CAN be placed outside the zone
-                            # as long as they're to the RIGHT
-                            warp['pos'] += 3
-
-                flagpole_pos = None
-                # Two different conversion options based on if level has layers
-                if has_layers:
-                    # Loop thru the layers
-                    for layer_i, layer in enumerate(zone['layers']):
-                        # Loop thru the rows
-                        for row_i, row in enumerate(layer['data']):
-                            # Loop thru tiles by column
-                            for tile_i, tile in enumerate(row):
-                                # Convert the tile to a 5-element list
-                                # (Deluxe tile format) regardless of its
-                                # original format
-                                old_tile = extract_tile(tile)
-
-                                # Overwrite the old tiledata with the new
-                                # tile in the appropriate format
-                                # (list or td32, depending on game version)
-                                content['world'][level_i]['zone'][zone_i]\
-                                        ['layers'][layer_i]['data']\
-                                        [row_i][tile_i] = \
-                                    convert_tile(old_tile)
-
-                                # WATER HITBOX WORKAROUND for conv. TO DELUXE
-                                #   (see extended notes in no-layers section)
-                                # Make sure we’re not in top row
-                                if convert_to.get() == DELUXE and \
-                                        (old_tile[3] == 7 or \
-                                         old_tile[3] == 8 or \
-                                         old_tile[3] == 9) and row_i >= 1:
-                                    # Get data for the tile 1 row up
-                                    above_tile = content['world'][level_i]\
-                                            ['zone'][zone_i]['layers'][layer_i]\
-                                            ['data'][row_i-1][tile_i]
-                                    # If td-1 is air, change it to water
-                                    if (above_tile[3] == 0):
-                                        above_tile[3] = 7
-
-                                # FLAGPOLE CHECK
-                                # See no-layer section for notes
-                                if convert_from.get() != DELUXE \
-                                        and flagpole_pos is None \
-                                        and (old_tile[3] == 161):
-                                    flagpole_pos = (tile_i, row_i) # (x, y)
-                else:
-                    for row_i, row in enumerate(zone['data']): # Loop thru rows
-                        for tile_i, tile in enumerate(row): # Loop tiles by col
-                            # Convert the tile to a 5-element list
-                            # (Deluxe tile format) regardless of its
-                            # original format
-                            old_tile = extract_tile(tile)
-
-                            # Overwrite the old tiledata with the new
-                            # tile in the appropriate format
-                            # (list or td32, depending on game version)
-                            content['world'][level_i]['zone'][zone_i]['data']\
-                                    [row_i][tile_i] = \
-                                convert_tile(old_tile)
-
-                            # WATER HITBOX WORKAROUND
-                            # The water hitboxes in Legacy (and probably Remake)
-                            # are infamously bad—they’re about a tile too tall.
-                            # Deluxe fixes them, but it means we have to change
-                            # old worlds built with these hitboxes in mind.
-                            # This will work because the row(s) above already
-                            # have their “final” data (in list format).
-                            # Make sure we’re not in top row
-                            if convert_to.get() == DELUXE and \
-                                    (old_tile[3] == 7 or old_tile[3] == 8 or \
-                                    old_tile[3] == 9) and row_i >= 1:
-                                # Get data for the tile 1 row up/same col
-                                above_tile = content['world'][level_i]\
-                                        ['zone'][zone_i]['data'][row_i-1]\
-                                        [tile_i]
-                                # If td-1 is air, change it to water
-                                if (above_tile[3] == 0):
-                                    above_tile[3] = 7
-
-                            # FLAGPOLE CHECK
-                            # Check if this zone has a flagpole. If it does,
-                            # then check later if it has a flag object.
-                            # If it doesn't, add one at the top of the pole.
-                            # This is needed because Remake doesn't use the
-                            # flag object, but all other versions require
-                            # a flag object if the zone has a flagpole.
-                            if flagpole_pos is None \
-                                    and (old_tile[3] == 161):
-                                # Log the highest position with a flagpole
-                                # tile, so we can place a flag object there
-                                # if necessary
-                                flagpole_pos = (tile_i, row_i) # (x, y) coord
-                                # Note that the tile array does the top row
-                                # first, while int-based coordinates use the
-                                # bottom row first.
-
-                # Check for unsupported objects and remove them
-                # Need to use a while loop because length of obj list may
-                # change while program runs
-                obj_i = 0 # START
-                has_flag = False
-                while True:
-                    # STOP
-                    if obj_i >= len(zone['obj']):
-                        break
-
-                    # Object is incompatible if it's either:
-                    #   - Not in the list of all objects
-                    #   - In the list but not flagged as supported in
-                    #     the target version
-                    # This data is collected differently based on which
-                    # object lookup table we need to use
-                    in_obj_db : bool
-                    obj_entry : Optional[Tuple[str,int,int,int]] = None
-                    if convert_from.get() == DELUXE:
-                        in_obj_db = zone['obj'][obj_i]['type'] \
-                                in deluxe_obj_lookup
-                        if in_obj_db:
-                            obj_entry = OBJ_DATABASE[deluxe_obj_lookup[
-                                zone['obj'][obj_i]['type']
-                            ]]
-                    else:
-                        in_obj_db = zone['obj'][obj_i]['type'] \
-                                in legacy_obj_lookup
-                        if in_obj_db:
-                            obj_entry = OBJ_DATABASE[legacy_obj_lookup[
-                                zone['obj'][obj_i]['type']
-                            ]]
-                    # This part below is the same regardless of version/lookup
-                    if not in_obj_db or not obj_entry or \
-                            not (obj_entry[1] & convert_to.get()):
-                        # Log the removed object if it's not already in the
-                        # removed objects list
-                        if zone['obj'][obj_i]['type'] not in removed_objects:
-                            removed_objects.append(zone['obj'][obj_i]['type'])
-                        # Actually remove the object from the world
-                        # Must do AFTER logging to avoid out-of-range errors
-                        del content['world'][level_i]['zone'][zone_i]\
-                                ['obj'][obj_i]
-                        # Reduce the loop variable to account for the removal
-                        obj_i -= 1
-
-                    # Remake<->Legacy fire bar conversion
-                    # Deluxe only has 2 params (phase & length), like Classic
-                    if obj_entry and obj_entry[0] == 'fire bar':
-                        if convert_from.get() == REMAKE \
-                                and convert_to.get() == LEGACY:
-                            # Remake firebar params:
-                            # [phase, length, clockwise, speed_mult]
-                            old_param = zone['obj'][obj_i]['param']
-
-                            if len(old_param) == 2: # clockwise
-                                old_param.append(0)
-                                # fallthrough
-                            if len(old_param) == 3: # speed_mult
-                                old_param.append(1)
-                            # len(old_param) is now at least 4
-
-                            # The game doesn't care if params are int or str,
-                            # but Python does
-                            try:
-                                old_param[0] = int(old_param[0])
-                            except (ValueError, TypeError):
-                                # Default value if a param is invalid or blank
-                                old_param[0] = 0 # phase
-                            try:
-                                old_param[1] = int(old_param[1])
-                            except (ValueError, TypeError):
-                                # Default value if a param is invalid or blank
-                                old_param[1] = 6 # length
-                            try:
-                                old_param[2] = int(old_param[2])
-                            except (ValueError, TypeError):
-                                # Default value if a param is invalid or blank
-                                old_param[2] = 0 # clockwise
-                            try:
-                                old_param[3] = float(old_param[3])
-                            except (ValueError, TypeError):
-                                # Default value if a param is invalid or blank
-                                old_param[3] = 1.0 # speed_mult
-
-                            cw = -1 if zone['obj'][obj_i]['param'][2] else 1
-                            zone['obj'][obj_i]['param'] = [
-                                old_param[0], old_param[1],
-                                23//old_param[3]*cw
-                            ]
-                        elif convert_from.get() == LEGACY \
-                                and convert_to.get() == REMAKE:
-                            # Legacy firebar params:
-                            # [phase, length, rate]
-                            # Default rate is 23. Lower is faster.
-                            old_param = zone['obj'][obj_i]['param']
-                            if len(old_param) == 2: # rate
-                                old_param.append(23)
-                            # len(old_param) is now at least 4
-
-                            # The game doesn't care if params are int or str,
-                            # but Python does
-                            try:
-                                old_param[0] = int(old_param[0])
-                            except (ValueError, TypeError):
-                                # Default value if a param is invalid or blank
-                                old_param[0] = 0 # phase
-                            try:
-                                old_param[1] = int(old_param[1])
-                            except (ValueError, TypeError):
-                                # Default value if a param is invalid or blank
-                                old_param[1] = 6 # length
-                            try:
-                                old_param[2] = int(old_param[2])
-                            except (ValueError, TypeError):
-                                # Default value if a param is invalid or blank
-                                old_param[2] = 23 # rate
-
-                            zone['obj'][obj_i]['param'] = [
-                                old_param[0], old_param[1],
-                                0, 23/old_param[2] # decimals allowed here
-                            ]
-                            # Don't bother setting "clockwise" param
-                            # because negating speed_mult does the same thing
-
-                    # Deluxe<->Legacy cheep cheep conversion
-                    # In Deluxe, the variant param is 0=green, 1=red
-                    # In Legacy, the variant param is 0=red, 1=gray
-                    if obj_entry and obj_entry[0] == 'cheep cheep' \
-                            and convert_from.get() & (DELUXE|LEGACY) \
-                            and convert_to.get() & (DELUXE|LEGACY) \
-                            and convert_from.get() != convert_to.get():
-                        # In both Legacy and Deluxe, the first param is the
-                        # color variant, but in Legacy, 0=red and 1=gray,
-                        # while in Deluxe, 0=green and 1=red.
-                        # So we need to flip these
-                        old_param = zone['obj'][obj_i]['param']
-                        if len(old_param) >= 1:
-                            try:
-                                # Parse int
-                                old_param[0] = int(old_param[0])
-                                # Flip 0 to 1, and 1 to 0
-                                old_param[0] = int(not bool(old_param[0]))
-                            except (ValueError, TypeError):
-                                # Default value if a param is invalid or blank
-                                old_param[0] = 0 # variant
-
-                    # FLAG CHECK
-                    if obj_entry and obj_entry[0] == 'flag':
-                        has_flag = True
-
-                    # STEP
-                    obj_i += 1
-
-                # Now that we've left the loop, if we still don't have a flag,
-                # add one at the position we found earlier
-                if flagpole_pos is not None and not has_flag:
-                    # Create object
-                    new_flag_obj : Dict[str, Any] = {
-                        'type': 177,
-                        'pos': flagpole_pos[0] + \
-                            (zone_height - 1 - flagpole_pos[1]) * (2**16),
-                        'param': []
-                    }
-                    # Add object to JSON
-                    zone['obj'].append(new_flag_obj)
-
-#     except KeyError:
-#         # File is missing required fields
-#         convert_fail = True
-#         error_msg = '''The selected file appears to be corrupted.
-# Are you sure it’s a world?\n%s\n''' % open_path
-#         return error_msg
-    finally:
-        pass
-
-    # Open the file for real and wipe it
-    write_file = open(save_path, 'w', encoding='utf-8')
-    # Save the file's new contents
-    json.dump(content, write_file, separators=(',',':'))
-    # Close the file to prevent bugs that occur in large levels
-    write_file.close()
-
-    warnings += f'\nYOUR CONVERTED WORLD HAS BEEN SAVED TO:\n{save_path}\n\n'
-
-    # Report the IDs of incompatible objects that were removed
-    if removed_objects:
-        warnings += 'Removed incompatible objects with the following IDs: '
-        for index, item in enumerate(removed_objects):
-            # Print the name of the incompatible object if available
-            removed_obj_entry : Tuple[str, int, int, int]
-            if convert_from.get() == DELUXE and item in deluxe_obj_lookup:
-                removed_obj_entry = OBJ_DATABASE[
-                    deluxe_obj_lookup[item]
-                ]
-            elif item in legacy_obj_lookup: # legacy/remake/etc
-                removed_obj_entry = OBJ_DATABASE[
-                    legacy_obj_lookup[item]
-                ]
-            else: # unknown/invalid object ID
-                removed_obj_entry = UNKNOWN_OBJ
-            warnings += f'{item} ({removed_obj_entry[0]})'
-            # Add comma if we aren't at the end of the removed objects list
-            if index < (len(removed_objects) - 1):
-                warnings += ', '
-        warnings += '\n'
-
-    # Report the IDs of incompatible tiles that were replaced
-    if replacement_list:
-        for i in replacement_list:
-            warnings += f'Incompatible tile definition “{i[0]}” \
-replaced with “{i[1]}”\n'
-    # Tiles that work the same but have different IDs across versions are
-    # converted silently as of v3.0.0
-
-    return warnings
-
-def game_ver_str(v:IntVar):
-    '''
-    Given an IntVar (from convert_from or convert_to),
-    return the string associated with that game version number
-    (e.g. 'INFERNO' for v=1)
-    '''
-    i = v.get()
-    if i == 0b10000:
-        return 'DELUXE'
-    elif i == 0b01000:
-        return 'LEGACY'
-    elif i == 0b00100:
-        return 'REMAKE'
-    elif i == 0b00010:
-        return 'CLASSIC'
-    elif i == 0b00001:
-        return 'INFERNO'
-    elif i == 0:
-        return 'AUTODETECT'
-    # else
-    return 'UNKNOWN'
+# Whether folder conversions should copy worlds that were already converted
+# with the same settings from the result cache, instead of converting them
+# again
+use_result_cache = IntVar()
 
 def convert_file():
     '''
@@ -1556,7 +294,9 @@ def convert_file():
     t1 = time()
 
     # Run main conversion function
-    final_warnings = convert(open_path, save_path)
+    final_warnings = convert(open_path, save_path, convert_from.get(),
+                             convert_to.get(), use_prog.get(), online=True)
+    convert_fail = worldconverter.core.convert_fail
 
     # Stop the timer
     t2 = time()
@@ -1596,21 +336,7 @@ def convert_folder():
 
     # Make a folder (inside the working directory)
     # to drop all the converted worlds in
-    save_dir = './converted'
-    if not os.path.exists(save_dir):
-        os.makedirs(save_dir)
-    else:
-        # If there's already a subfolder called _converted,
-        # tack a number on the end
-        i = 1
-        # Keep trying numbers until we get a folder name
-        # that doesn't exist yet
-        while os.path.exists(save_dir + str(i)):
-            i += 1
-        # Now that we know it works, permanently add the number to save_dir
-        save_dir += str(i)
-        # Create the folder with the number that works
-        os.makedirs(save_dir)
+    save_dir = make_save_dir()
 
     # Set up progress updates
     heading = Label(main_frame, text=f'Converting {len(files)} files',
@@ -1632,7 +358,13 @@ def convert_folder():
 
         filename = item.split(os.sep)[-1] # Get just the filename w/o the path
 
-        all_warnings += convert(item, save_dir + os.sep + filename) + '\n\n'
+        # If the result cache is on, worlds that haven't changed since they
+        # were last converted are just copied from it
+        all_warnings += convert(item, save_dir + os.sep + filename,
+                                convert_from.get(), convert_to.get(),
+                                use_prog.get(), online=True,
+                                result_cache=get_result_cache()
+                                if use_result_cache.get() else None) + '\n\n'
 
     # Save all warnings to a log file in the "converted" folder
     log_file = open(save_dir + '/_WARNINGS.LOG', 'a', encoding='utf-8')
@@ -1679,8 +411,7 @@ def setup():
 def menu():
     cls()
 
-    # Reset convert_from and convert_to because they may be changed during the
-    # conversion process
+    # Reset convert_from and convert_to to their default settings
     convert_from.set(AUTODETECT)
     convert_to.set(DELUXE)
 
@@ -1690,22 +421,22 @@ def menu():
     btn_run_single = Button(main_frame, text='Convert world',
             font=f_large, highlightbackground=colors['BG'],
             command=convert_file)
-    btn_run_single.place(x=240, y=240, anchor=NE)
+    btn_run_single.place(x=240, y=250, anchor=NE)
 
     btn_run_multi = Button(main_frame, text='Convert folder',
             font=f_large, highlightbackground=colors['BG'],
             command=convert_folder)
-    btn_run_multi.place(x=240, y=240, anchor=NW)
+    btn_run_multi.place(x=240, y=250, anchor=NW)
 
     btn_help = Button(main_frame, text='Warnings',
             highlightbackground=colors['BG'],
             command=warnings_bugs)
-    btn_help.place(x=240, y=280, anchor=NE)
+    btn_help.place(x=240, y=290, anchor=NE)
 
     btn_exit = Button(main_frame, text='Exit',
                       highlightbackground=colors['BG'],
                       command=exit_app)
-    btn_exit.place(x=240, y=280, anchor=NW)
+    btn_exit.place(x=240, y=290, anchor=NW)
 
     col1_header = Label(main_frame, text='Convert FROM:', font=f_bold,
                         bg=colors['BG'])
@@ -1750,11 +481,18 @@ def menu():
         item.place(x=240, y=100+(20*index))
 
     # Checkbox options
-    prog_option = Checkbutton(main_frame,
-            text='Use progressive item boxes (Legacy/Deluxe only)',
-            bg=colors['BG'], variable=use_prog)
-    prog_option.select()
-    prog_option.place(x=80, y=200)
+    checkbox_options = [
+        Checkbutton(main_frame,
+                    text='Use progressive item boxes (Legacy/Deluxe only)',
+                    bg=colors['BG'], variable=use_prog),
+        Checkbutton(main_frame,
+                    text='Skip worlds already converted (folders only)',
+                    bg=colors['BG'], variable=use_result_cache),
+    ]
+    # Progressive item boxes are on by default
+    checkbox_options[0].select()
+    for index, item in enumerate(checkbox_options):
+        item.place(x=80, y=200+(20*index))
 
     window.update_idletasks()
 
@@ -0,0 +1,259 @@
+'''
+Benchmark suite for the converter.
+
+Makes synthetic worlds with worldgen.py (Legacy, Deluxe and Remake; layered
+and not; different numbers of zones), converts each one, and prints how long
+it took, both in total and for each phase:
+
+    parse      reading the world file (all at once, or with load_world() for
+               big files, which leaves most of the work until the zones are
+               used)
+    detect     auto-detecting the world version
+    tiles      converting the tile data of every zone
+    objects    converting everything else in every zone (objects, warps...)
+    write      encoding the converted world and writing it to disk
+
+The phases are timed separately from the full conversion, so they won't add
+up to exactly the total. Throughput is tiles/s and MB/s of input over the
+full conversion, and peak memory is measured with tracemalloc in one extra
+run (so it's Python's memory, not the whole process's).
+
+Every world is generated from a fixed seed, so results are comparable from
+run to run. Save a baseline with --json and compare against it later:
+
+    python benchmarks/suite.py --zones 1,10,100 --json baseline.json
+
+To see what a faster JSON library (see jsonbackend.py) does, run it again
+with --json-backend json (the json module only) and compare.
+'''
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import *
+
+# Run from a source checkout without installing anything
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from worldconverter import core
+from worldconverter.constants import *
+from worldconverter.detect import detect_version
+from worldconverter.jsonbackend import (JSON_BACKENDS, loads,
+                                        set_json_backend)
+from worldconverter.reader import load_world, read_world_file
+from worldconverter.translation import get_translation_table
+from worldconverter.writer import save_world
+from worldgen import VERSION_NAMES, make_world
+
+PHASES = ('parse', 'detect', 'tiles', 'objects', 'write')
+
+# What each version gets converted to by default
+DEFAULT_TARGETS = {LEGACY: DELUXE, REMAKE: DELUXE, DELUXE: LEGACY}
+
+def best_time(func:Callable[[], Any], repeat:int,
+              setup:Optional[Callable[[], Any]]=None) -> float:
+    '''
+    Run func repeat times and return the fastest time in seconds.
+    If setup is given, it's called (untimed) before each run, and its return
+    value is passed to func.
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def read_world(path:str) -> dict:
+    # Same as convert() does it
+    if os.path.getsize(path) >= core.LAZY_LOAD_SIZE:
+        return load_world(path)
+    return loads(read_world_file(path))
+
+def read_zones(path:str) -> Tuple[dict, List[dict], bool]:
+    # Read a world with every zone parsed, so timing the zone phases doesn't
+    # include parsing. Returns (content, zones, has_layers).
+    content = read_world(path)
+    for level in content['world']:
+        level['zone'] = list(level['zone'])
+    zones = [zone for level in content['world'] for zone in level['zone']]
+    return (content, zones, 'layers' in zones[0])
+
+def strip_tiles(zones:List[dict]):
+    # Leave only the objects etc. (an empty grid still has to be a grid)
+    for zone in zones:
+        for grid in zone['layers'] if 'layers' in zone else [zone]:
+            grid['data'] = [[]]
+
+def strip_objects(zones:List[dict]):
+    # Leave only the tiles
+    for zone in zones:
+        zone['obj'] = []
+        zone['warp'] = []
+        zone['spawnpoint'] = []
+
+def count_tiles(zones:List[dict]) -> int:
+    return sum(len(row) for zone in zones
+               for grid in (zone['layers'] if 'layers' in zone else [zone])
+               for row in grid['data'])
+
+def run_case(version:int, convert_to:int, zones:int, layered:bool,
+             repeat:int, work_dir:str, memory:bool=True) -> Dict[str, Any]:
+    '''
+    Benchmark 1 synthetic world. Returns a dict of results.
+    '''
+    content = make_world(version, zones, layered)
+    open_path = os.path.join(work_dir, 'world.json')
+    save_path = os.path.join(work_dir, 'converted.json')
+    with open(open_path, 'w', encoding='utf-8') as world_file:
+        json.dump(content, world_file, separators=(',',':'))
+    del content
+    size = os.path.getsize(open_path)
+    _, zone_list, has_layers = read_zones(open_path)
+    tile_count = count_tiles(zone_list)
+    del zone_list
+
+    def convert():
+        core.convert(open_path, save_path, AUTODETECT, convert_to)
+        if core.convert_fail:
+            raise RuntimeError(core.warnings)
+    total = best_time(convert, repeat)
+
+    # Time each phase on its own
+    convert_from = detect_version(read_world(open_path), has_layers,
+                                  open_path)[0]
+    table = get_translation_table(convert_from, convert_to, True)
+    def convert_zones(world:Tuple[dict, List[dict], bool]):
+        for zone in world[1]:
+            core.convert_zone(zone, has_layers, convert_from, convert_to,
+                              True, False, table)
+    def without(strip:Callable[[List[dict]], None]) \
+            -> Callable[[], Tuple[dict, List[dict], bool]]:
+        def setup():
+            world = read_zones(open_path)
+            strip(world[1])
+            return world
+        return setup
+    def converted() -> dict:
+        world = read_zones(open_path)
+        convert_zones(world)
+        return world[0]
+    phases = {
+        'parse': best_time(lambda: read_world(open_path), repeat),
+        'detect': best_time(lambda world: detect_version(world, has_layers,
+                                                         open_path),
+                            repeat, lambda: read_world(open_path)),
+        'tiles': best_time(convert_zones, repeat, without(strip_objects)),
+        'objects': best_time(convert_zones, repeat, without(strip_tiles)),
+        'write': best_time(lambda world: save_world(world, save_path),
+                           repeat, converted),
+    }
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        convert()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'from': version_name(convert_from),
+        'to': version_name(convert_to),
+        'zones': zones,
+        'layered': layered,
+        'tiles': tile_count,
+        'bytes': size,
+        'total': total,
+        'phases': phases,
+        'tiles_per_sec': tile_count / total,
+        'mb_per_sec': size / 1e6 / total,
+        'peak_memory': peak,
+    }
+
+def version_name(version:int) -> str:
+    return {DELUXE: 'deluxe', LEGACY: 'legacy', REMAKE: 'remake',
+            CLASSIC: 'classic', INFERNO: 'inferno'}[version]
+
+def print_header():
+    print(f'{"case":28}{"tiles":>9}{"MB":>7}{"total":>8}'
+          + ''.join(f'{phase:>8}' for phase in PHASES)
+          + f'{"tiles/s":>10}{"MB/s":>7}{"peak MB":>8}')
+
+def print_result(result:Dict[str, Any]):
+    case = f'{result["from"]}->{result["to"]} {result["zones"]}z' \
+            + (' layered' if result['layered'] else '')
+    peak = '' if result['peak_memory'] is None \
+            else f'{result["peak_memory"] / 1e6:.1f}'
+    print(f'{case:28}{result["tiles"]:9}{result["bytes"] / 1e6:7.2f}'
+          f'{result["total"]:8.3f}'
+          + ''.join(f'{result["phases"][phase]:8.3f}' for phase in PHASES)
+          + f'{result["tiles_per_sec"]:10.0f}{result["mb_per_sec"]:7.1f}'
+          f'{peak:>8}', flush=True)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--versions', default='legacy,deluxe,remake',
+                        help='source versions, comma-separated '
+                             '(default: legacy,deluxe,remake)')
+    parser.add_argument('--to', dest='convert_to',
+                        choices=['deluxe', 'legacy', 'remake'],
+                        help='target version (default: Deluxe, or Legacy '
+                             'for Deluxe worlds)')
+    parser.add_argument('--zones', default='1,10,100,500',
+                        help='zone counts, comma-separated '
+                             '(default: 1,10,100,500)')
+    parser.add_argument('--layout', choices=['flat', 'layered', 'both'],
+                        default='both')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per measurement; the best one counts '
+                             '(default: 3)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help="don't measure peak memory")
+    parser.add_argument('--json', metavar='FILE',
+                        help='also save the results to a JSON file')
+    parser.add_argument('--json-backend', choices=JSON_BACKENDS,
+                        default='auto',
+                        help='JSON library to read and write worlds with '
+                             '(default: auto)')
+    args = parser.parse_args(argv)
+    json_backend = set_json_backend(args.json_backend)
+
+    versions = [VERSION_NAMES[name] for name in args.versions.split(',')]
+    zone_counts = [int(count) for count in args.zones.split(',')]
+    layouts = {'flat': [False], 'layered': [True],
+               'both': [False, True]}[args.layout]
+
+    print(f'Python {platform.python_version()}, JSON: {json_backend}, '
+          f'best of {args.repeat}')
+    print_header()
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for version in versions:
+            convert_to = VERSION_NAMES[args.convert_to] if args.convert_to \
+                    else DEFAULT_TARGETS[version]
+            for layered in layouts:
+                for zones in zone_counts:
+                    result = run_case(version, convert_to, zones, layered,
+                                      args.repeat, work_dir, args.memory)
+                    print_result(result)
+                    results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as json_file:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'json_backend': json_backend,
+                       'repeat': args.repeat,
+                       'results': results}, json_file, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+'''
+Micro-benchmark for the tile conversion kernel.
+
+Times each way of converting a grid of random tiles and prints the cost per
+tile, e.g.:
+
+    python benchmarks/tile_kernel.py --from legacy --to deluxe --tiles 100000
+
+Steps:
+    per-tile    extract_tile() + convert_tile() on every tile, i.e. the
+                regular per-tile code (used for unusual tile data)
+    pack        TileGrid.from_rows()
+    convert     convert_tile_grid()
+    unpack      TileGrid.to_rows()
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Run from a source checkout without installing anything
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__))))
+
+from worldconverter.constants import *
+from worldconverter.database import deluxe_tile_lookup, legacy_tile_lookup
+from worldconverter.core import convert_tile, extract_tile
+from worldconverter.tilegrid import TileGrid, convert_tile_grid
+from worldconverter.translation import get_translation_table
+
+VERSION_NAMES = {'deluxe': DELUXE, 'legacy': LEGACY, 'remake': REMAKE,
+                 'classic': CLASSIC}
+
+def make_rows(convert_from:int, width:int, height:int,
+              seed:int=0) -> list:
+    '''
+    Make a grid of random tiles that are valid in convert_from, mostly air
+    like a real level.
+    '''
+    rng = random.Random(seed)
+    tile_ids = sorted(deluxe_tile_lookup if convert_from == DELUXE
+                      else legacy_tile_lookup)
+    rows = []
+    for _ in range(height):
+        row = []
+        for _ in range(width):
+            tile_def = 0 if rng.random() < 0.6 else rng.choice(tile_ids)
+            tile = [rng.randrange(2048), 0, rng.randrange(2), tile_def,
+                    rng.randrange(256) if rng.random() < 0.1 else 0]
+            if convert_from != DELUXE:
+                tile = tile[0] + (tile[1] << 11) + (tile[2] << 15) + \
+                        (tile[3] << 16) + (tile[4] << 24)
+            row.append(tile)
+        rows.append(row)
+    return rows
+
+def best_time(func, repeat:int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--from', dest='convert_from', default='legacy',
+                        choices=['deluxe', 'legacy', 'remake'])
+    parser.add_argument('--to', dest='convert_to', default='deluxe',
+                        choices=sorted(VERSION_NAMES))
+    parser.add_argument('--tiles', type=int, default=100000,
+                        help='number of tiles (default: 100000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per step; the best one counts '
+                             '(default: 5)')
+    args = parser.parse_args(argv)
+
+    convert_from = VERSION_NAMES[args.convert_from]
+    convert_to = VERSION_NAMES[args.convert_to]
+    width = 400
+    height = max(1, args.tiles // width)
+    rows = make_rows(convert_from, width, height)
+    count = width * height
+    table = get_translation_table(convert_from, convert_to, True)
+
+    def per_tile():
+        for row in rows:
+            for tile in row:
+                convert_tile(extract_tile(tile), convert_from, convert_to,
+                             True, table)
+    def pack():
+        return TileGrid.from_rows(rows, extract_tile)
+    def convert():
+        convert_tile_grid(pack(), convert_to, table)
+    grid = pack()
+    convert_tile_grid(grid, convert_to, table)
+
+    steps = [('per-tile', per_tile, 0.0),
+             ('pack', pack, 0.0),
+             # Packing has to be redone every run, so don't count it
+             ('convert', convert, best_time(pack, args.repeat)),
+             ('unpack', grid.to_rows, 0.0)]
+
+    print(f'{count} tiles, {args.convert_from} -> {args.convert_to}')
+    for name, func, overhead in steps:
+        seconds = max(0.0, best_time(func, args.repeat) - overhead)
+        print(f'{name:10}{seconds * 1e9 / count:10.1f} ns/tile')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
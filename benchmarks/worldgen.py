@@ -0,0 +1,172 @@
+'''
+Synthetic world generator for benchmarks.
+
+Makes worlds that look enough like real ones to exercise every part of the
+converter: Legacy/Remake td32 tiles or Deluxe list tiles, layered or not,
+with objects, warps, flagpoles, water, item blocks, and (for Remake)
+conveyors and 4-param fire bars. The same arguments always give the same
+world.
+
+    python benchmarks/worldgen.py legacy 50 -o world.json [--layered]
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+from typing import *
+
+# Run from a source checkout without installing anything
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__))))
+
+from worldconverter.constants import *
+from worldconverter.database import (OBJ_DATABASE, TILE_DATABASE,
+                                     get_tile_by_name)
+
+VERSION_NAMES = {'deluxe': DELUXE, 'legacy': LEGACY, 'remake': REMAKE}
+
+# Zones per level
+ZONES_PER_LEVEL = 4
+
+def td32(sprite:int, bump:int, depth:int, tile_def:int, extra:int) -> int:
+    return sprite + (bump << 11) + (depth << 15) + (tile_def << 16) + \
+            (extra << 24)
+
+def _tile_id(version:int, entry:tuple) -> int:
+    # ID of a tile database entry in a version (-1 if it doesn't exist)
+    return entry[{DELUXE: 2, LEGACY: 3, REMAKE: 4}[version]]
+
+def _obj_id(version:int, entry:tuple) -> int:
+    return entry[2] if version == DELUXE else entry[3]
+
+def make_zone(version:int, rng:random.Random, zone_id:int, width:int,
+              height:int, layered:bool) -> dict:
+    '''
+    Make 1 zone. Mostly air, with ground at the bottom, some platforms,
+    water, item blocks and a flagpole.
+    '''
+    def tile_id(name:str) -> int:
+        return _tile_id(version, get_tile_by_name(name))
+    # Every tile that exists in this version
+    tile_ids = [_tile_id(version, i) for i in TILE_DATABASE
+                if _tile_id(version, i) >= 0]
+    solid = tile_id('solid standard')
+    water = tile_id('water')
+    item_block = tile_id('item block')
+    flagpole = tile_id('flagpole')
+
+    def make_tile(tile_def:int, extra:int=0):
+        sprite = rng.randrange(2048) if tile_def else 30
+        if version == DELUXE:
+            return [sprite, 0, 0, tile_def, extra]
+        return td32(sprite, 0, 0, tile_def, extra)
+
+    def make_grid() -> list:
+        rows = []
+        for y in range(height):
+            row = []
+            for x in range(width):
+                if y >= height - 2:
+                    tile = make_tile(solid)
+                elif y >= height - 4 and x % 40 < 6:
+                    tile = make_tile(water)
+                elif y == height // 2 and rng.random() < 0.1:
+                    # Item block with a mushroom or coin in it
+                    tile = make_tile(item_block, rng.choice((81, 97)))
+                elif rng.random() < 0.05:
+                    tile = make_tile(rng.choice(tile_ids),
+                                     rng.choice((0, 0, 0, 5)))
+                else:
+                    tile = make_tile(0)
+                row.append(tile)
+            rows.append(row)
+        # Flagpole near the end. In Legacy, the top of the pole is the
+        # level end warp, which needs a flag object (see convert_zone()).
+        for y in range(height // 3, height - 2):
+            rows[y][width - 5] = make_tile(flagpole)
+        if version == LEGACY:
+            rows[height // 3][width - 5] = \
+                    make_tile(tile_id('flagpole level end warp'))
+        if version == REMAKE:
+            # Conveyors (tile 12 with a speed in the extra data)
+            for x in range(10, min(width, 20)):
+                rows[height - 6][x] = make_tile(12, 120)
+        return rows
+
+    # Fire bars are added separately (with params), and flags are left out
+    # so the converter has to add them
+    objs = [i for i in OBJ_DATABASE if _obj_id(version, i) >= 0
+            and i[0] not in ('fire bar', 'flag')]
+    obj_list = []
+    for _ in range(rng.randrange(10, 30)):
+        entry = rng.choice(objs)
+        obj_list.append({'type': _obj_id(version, entry),
+                         'pos': rng.randrange(width) + \
+                                (rng.randrange(height) << 16),
+                         'param': []})
+    # Fire bars: 4 params in Remake, 3 in Legacy, 2 in Deluxe
+    fire_bar_params = {REMAKE: [0, 6, 1, 1.5], LEGACY: [0, 6, 23],
+                       DELUXE: [0, 6]}[version]
+    for _ in range(3):
+        obj_list.append({'type': 33, 'pos': rng.randrange(width),
+                         'param': list(fire_bar_params)})
+
+    zone = {'id': zone_id, 'initial': 0, 'color': '#6B8CFF', 'music': '',
+            'camera': 0,
+            'obj': obj_list,
+            'warp': [{'id': 0, 'pos': 2 + ((height - 3) << 16), 'data': 0},
+                     {'id': 1, 'pos': 30 + ((height - 3) << 16),
+                      'data': 3}],
+            'spawnpoint': [{'id': 0, 'pos': 2 + ((height - 3) << 16)}]}
+    if version == DELUXE:
+        zone['background'] = [{'url': 'img/bg/overworld.png', 'loop': 0}]
+    if layered:
+        zone['layers'] = [{'z': 0, 'data': make_grid()},
+                          {'z': 1, 'data': make_grid()}]
+    else:
+        zone['data'] = make_grid()
+    return zone
+
+def make_world(version:int, zones:int=1, layered:bool=False,
+               width:int=200, height:int=15, seed:int=0) -> dict:
+    '''
+    Make a world with the given number of zones (split into levels of
+    ZONES_PER_LEVEL zones each). The world has no version-specific world
+    attributes, so auto-detection has to look at the map sheet and zones.
+    '''
+    rng = random.Random(f'{version}/{zones}/{layered}/{width}/{height}/{seed}')
+    levels = []
+    for zone_i in range(zones):
+        if zone_i % ZONES_PER_LEVEL == 0:
+            levels.append({'id': len(levels), 'name': f'{len(levels)+1}',
+                           'zone': []})
+        levels[-1]['zone'].append(make_zone(version, rng, zone_i %
+                ZONES_PER_LEVEL, width, height, layered))
+    return {
+        'type': 'game',
+        'mode': 'royale',
+        'world': levels,
+        'resource': [{'id': 'map', 'src': 'img/game/smb_map.png'},
+                     {'id': 'obj', 'src': 'img/game/smb_obj.png'}],
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('version', choices=sorted(VERSION_NAMES))
+    parser.add_argument('zones', type=int)
+    parser.add_argument('--layered', action='store_true')
+    parser.add_argument('--width', type=int, default=200)
+    parser.add_argument('--height', type=int, default=15)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', required=True, metavar='FILE')
+    args = parser.parse_args(argv)
+    content = make_world(VERSION_NAMES[args.version], args.zones,
+                         args.layered, args.width, args.height, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as world_file:
+        json.dump(content, world_file, separators=(',',':'))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
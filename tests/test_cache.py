@@ -0,0 +1,69 @@
+'''
+Tests for the result cache (cache.py and its use in core.py).
+'''
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from worldconverter import DELUXE, LEGACY, ConversionContext, ResultCache
+from worldconverter import run_conversion
+from worldconverter.core import _mark_paths, _unmark_paths
+
+WORLD = {
+    'type': 'game', 'mode': 'royale', 'initial': 0,
+    'resource': [{'id': 'map', 'src': 'https://example.com/map.png'}],
+    'world': [{'id': 0, 'name': 'world', 'initial': 0, 'zone': [{
+        'id': 0, 'initial': 0, 'color': '#6B8CFF', 'music': '', 'camera': 0,
+        'data': [[30, 30], [98331, 98331]], 'obj': [], 'warp': [],
+        'spawnpoint': [{'id': 0, 'pos': 0}]}]}],
+}
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.cache = ResultCache(os.path.join(self.dir, 'cache'))
+
+    def path(self, *names:str) -> str:
+        return os.path.join(self.dir, *names)
+
+    def convert(self, open_path:str, save_path:str) -> ConversionContext:
+        context = ConversionContext(LEGACY, DELUXE, True)
+        context.warnings = run_conversion(open_path, save_path, context,
+                                          self.cache)
+        return context
+
+    def test_hit(self):
+        for name in ('a.json', 'b.json'):
+            with open(self.path(name), 'w', encoding='utf-8') as world_file:
+                json.dump(WORLD, world_file)
+        first = self.convert(self.path('a.json'), self.path('a-out.json'))
+        second = self.convert(self.path('b.json'), self.path('b-out.json'))
+        self.assertEqual(first.stats['result cache misses'], 1)
+        self.assertEqual(second.stats['result cache hits'], 1)
+        with open(self.path('a-out.json'), 'rb') as first_file, \
+                open(self.path('b-out.json'), 'rb') as second_file:
+            self.assertEqual(first_file.read(), second_file.read())
+
+    def test_warning_paths(self):
+        # Warnings can have the full paths, or just the world's file name
+        open_path = os.path.join('worlds', 'path.json')
+        save_path = os.path.join('converted', 'path.json')
+        warnings = (f'Failed to convert {open_path}\n'
+                    f'Couldn’t find the map sheet path.json\n'
+                    f'Saved to {save_path}\n')
+        marked = _mark_paths(warnings, open_path, save_path)
+        self.assertNotIn('path.json', marked)
+        self.assertEqual(_unmark_paths(marked, open_path, save_path),
+                         warnings)
+        new_open_path = os.path.join('other', 'new.json')
+        self.assertEqual(_unmark_paths(marked, new_open_path, save_path),
+                         f'Failed to convert {new_open_path}\n'
+                         f'Couldn’t find the map sheet new.json\n'
+                         f'Saved to {save_path}\n')
+
+if __name__ == '__main__':
+    unittest.main()
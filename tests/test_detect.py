@@ -0,0 +1,114 @@
+'''
+Tests for version auto-detection (detect.py).
+'''
+
+import json
+import os
+import tempfile
+import unittest
+from typing import *
+
+from worldconverter import DELUXE, LEGACY, REMAKE, detect_version, load_world
+from worldconverter.detect import (has_remake_conveyor, has_remake_features,
+                                   is_remake_conveyor)
+
+def td32(sprite:int, tile_def:int, extra:int) -> int:
+    return sprite + (tile_def << 16) + (extra << 24)
+
+def make_world(tile, fire_bar_params:Sequence=(0, 6, 23)) -> dict:
+    zone = {'id': 0, 'data': [[tile, 30], [30, 30]],
+            'obj': [{'type': 33, 'pos': 0, 'param': list(fire_bar_params)}]}
+    return {'resource': [{'id': 'map', 'src': 'https://example.com/map.png'}],
+            'world': [{'id': 0, 'zone': [zone]}]}
+
+class TestRemakeConveyors(unittest.TestCase):
+    def test_td32_conveyor(self):
+        # Tile ID 12 with a speed of 120 in the extra data
+        self.assertTrue(is_remake_conveyor(td32(30, 12, 120)))
+        self.assertTrue(is_remake_conveyor(td32(30, 12, 112)))
+        self.assertTrue(is_remake_conveyor(td32(30, 12, 143)))
+
+    def test_td32_not_conveyor(self):
+        # Speed out of range (so it's a Legacy note block)
+        self.assertFalse(is_remake_conveyor(td32(30, 12, 111)))
+        self.assertFalse(is_remake_conveyor(td32(30, 12, 144)))
+        # Definition and extra data the other way around
+        self.assertFalse(is_remake_conveyor(td32(30, 120, 12)))
+        self.assertFalse(is_remake_conveyor(30))
+
+    def test_list_conveyor(self):
+        self.assertTrue(is_remake_conveyor([30, 0, 0, 12, 120]))
+        self.assertFalse(is_remake_conveyor([30, 0, 0, 120, 12]))
+        self.assertFalse(is_remake_conveyor([30, 0, 0, 12]))
+
+    def test_detect_world_with_conveyor(self):
+        world = make_world(td32(30, 12, 120))
+        self.assertTrue(has_remake_features(world, False))
+        version, warnings = detect_version(world, False, 'world.json')
+        self.assertEqual(version, REMAKE)
+
+    def test_detect_world_without_conveyor(self):
+        world = make_world(td32(30, 120, 12))
+        self.assertFalse(has_remake_features(world, False))
+        version, warnings = detect_version(world, False, 'world.json')
+        self.assertEqual(version, LEGACY)
+
+    def test_detect_fire_bar(self):
+        world = make_world(30, [0, 6, 0, 1])
+        self.assertEqual(detect_version(world, False, 'world.json')[0],
+                         REMAKE)
+
+    def test_detect_deluxe(self):
+        world = make_world([30, 0, 0, 12, 120])
+        self.assertEqual(detect_version(world, False, 'world.json')[0],
+                         DELUXE)
+
+    def test_packed_grid(self):
+        grid = [[30, 30, 30], [30, 30, td32(30, 12, 120)]]
+        self.assertTrue(has_remake_conveyor(grid))
+        # The right bytes, but in the wrong part of the tile: sprite low
+        # byte 12 and bump 14 (i.e. a second byte of 112), then bump 1 and
+        # sprite high bits 4 (a second byte of 12) and definition 112
+        grid = [[12 + (14 << 11), (4 << 8) + (1 << 11) + (112 << 16)]]
+        self.assertFalse(has_remake_conveyor(grid))
+        self.assertFalse(has_remake_conveyor([]))
+
+    def test_unusual_grid(self):
+        # Tiles that can't be packed are checked one at a time
+        self.assertTrue(has_remake_conveyor([[-1, td32(30, 12, 120)]]))
+        self.assertTrue(has_remake_conveyor([[30, [30, 0, 0, 12, 120]]]))
+        self.assertFalse(has_remake_conveyor([[2**40, 'x', None]]))
+
+class TestLazyZones(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        world = make_world(30)
+        world['world'][0]['zone'].append(make_world(td32(30, 12, 120))
+                                         ['world'][0]['zone'][0])
+        with os.fdopen(fd, 'w', encoding='utf-8') as world_file:
+            json.dump(world, world_file)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_detection_keeps_zones(self):
+        world = load_world(self.path)
+        zones = world['world'][0]['zone']
+        peeked = [zones.peek(0), zones.peek(1)]
+        self.assertEqual(detect_version(world, False, self.path)[0], REMAKE)
+        # Detection parsed the same zones, and the next lookup gets them
+        # instead of parsing them again
+        self.assertIs(zones[0], peeked[0])
+        self.assertIs(zones[1], peeked[1])
+        self.assertIsNot(zones[0], peeked[0])
+
+    def test_field(self):
+        world = load_world(self.path)
+        zones = world['world'][0]['zone']
+        self.assertEqual(zones.field(1, 'id'), 0)
+        self.assertEqual(zones.field(1, 'obj'), zones[1]['obj'])
+        with self.assertRaises(KeyError):
+            zones.field(0, 'camera')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+'''
+Golden-output tests: every way of converting a world (packed tile grids,
+lazily read zones, the streaming writer, other processes, either JSON
+library) has to give the exact same file as converting each tile with
+convert_tile() and saving the world with one json.dump() call.
+'''
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from typing import *
+from unittest import mock
+
+from worldconverter import (CLASSIC, DELUXE, LEGACY, REMAKE,
+                            ConversionContext, get_json_backend,
+                            run_conversion, set_json_backend)
+from worldconverter import core
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'benchmarks'))
+from worldgen import make_world
+
+NAMES = {DELUXE: 'deluxe', LEGACY: 'legacy', REMAKE: 'remake',
+         CLASSIC: 'classic'}
+
+def _dump_world(content:dict, save_path:str, convert_zone=None,
+                zone_json=None):
+    # Stand-in for save_world(): convert every zone, then save the world
+    # the way convert() did before writer.py
+    for level in content['world']:
+        for zone in level['zone']:
+            convert_zone(zone)
+    with open(save_path, 'w', encoding='utf-8') as write_file:
+        json.dump(content, write_file, separators=(',',':'))
+
+class TestGolden(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        backend = get_json_backend()
+        self.addCleanup(set_json_backend, backend)
+
+    def world_path(self, version:int, layered:bool) -> str:
+        path = os.path.join(self.dir, f'{NAMES[version]}_{layered}.json')
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as write_file:
+                json.dump(make_world(version, 3, layered, 60, 12, 1),
+                          write_file)
+        return path
+
+    def convert(self, open_path:str, name:str, convert_from:int,
+                convert_to:int, jobs:int=1) -> Tuple[bytes, str]:
+        save_path = os.path.join(self.dir, name)
+        context = ConversionContext(convert_from, convert_to, True)
+        context.jobs = jobs
+        warnings = run_conversion(open_path, save_path, context)
+        self.assertFalse(context.failed, warnings)
+        with open(save_path, 'rb') as read_file:
+            return read_file.read(), warnings.replace(save_path, '<save>')
+
+    def reference(self, open_path:str, convert_from:int,
+                  convert_to:int) -> Tuple[bytes, str]:
+        # One tile at a time, everything in memory, plain json
+        set_json_backend('json')
+        try:
+            with mock.patch.object(core, 'palette_convert',
+                                   return_value=None), \
+                    mock.patch.object(core.TileGrid, 'from_rows',
+                                      return_value=None), \
+                    mock.patch.object(core, 'save_world', _dump_world):
+                return self.convert(open_path, 'reference.json',
+                                    convert_from, convert_to)
+        finally:
+            set_json_backend('auto')
+
+    def assertSameOutput(self, actual:Tuple[bytes, str],
+                         expected:Tuple[bytes, str]):
+        # The worlds are too big for assertEqual() to diff quickly
+        self.assertEqual(actual[1], expected[1])
+        if actual[0] != expected[0]:
+            offset = next((i for i, (a, b) in enumerate(zip(*(
+                    output[0] for output in (actual, expected)))) if a != b),
+                    min(len(actual[0]), len(expected[0])))
+            start = max(offset - 20, 0)
+            self.fail(f'Output differs at byte {offset}: '
+                      f'{actual[0][start:offset+20]!r} != '
+                      f'{expected[0][start:offset+20]!r}')
+
+    def check_pair(self, convert_from:int, convert_to:int, layered:bool):
+        open_path = self.world_path(convert_from, layered)
+        expected = self.reference(open_path, convert_from, convert_to)
+        for backend in ('auto', 'json'):
+            set_json_backend(backend)
+            with self.subTest(backend=backend):
+                self.assertSameOutput(self.convert(open_path, 'fast.json',
+                        convert_from, convert_to), expected)
+            with self.subTest(backend=backend, lazy=True), \
+                    mock.patch.object(core, 'LAZY_LOAD_SIZE', 0):
+                self.assertSameOutput(self.convert(open_path, 'lazy.json',
+                        convert_from, convert_to), expected)
+        set_json_backend('auto')
+
+    def test_pairs(self):
+        for convert_from in (DELUXE, LEGACY, REMAKE):
+            for convert_to in (DELUXE, LEGACY, REMAKE, CLASSIC):
+                for layered in (False, True):
+                    with self.subTest(convert_from=NAMES[convert_from],
+                                      convert_to=NAMES[convert_to],
+                                      layered=layered):
+                        self.check_pair(convert_from, convert_to, layered)
+
+    def test_jobs(self):
+        # Zones converted in other processes, and read lazily there
+        for convert_from, convert_to in ((LEGACY, DELUXE),
+                                         (DELUXE, REMAKE)):
+            open_path = self.world_path(convert_from, True)
+            expected = self.reference(open_path, convert_from, convert_to)
+            with self.subTest(convert_from=NAMES[convert_from]), \
+                    mock.patch.object(core, 'LAZY_LOAD_SIZE', 0):
+                self.assertSameOutput(self.convert(open_path, 'jobs.json',
+                        convert_from, convert_to, 2), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+'''
+Tests for checking the asset servers (probes.py), against a local HTTP
+server standing in for the Legacy and Remake servers.
+'''
+
+import subprocess
+import sys
+import threading
+import time
+import unittest
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from worldconverter import LEGACY, REMAKE, AUTODETECT
+from worldconverter import cache, probes
+
+# Path -> (seconds to wait, HTTP status)
+PAGES = {
+    '/': (0, 200),
+    '/legacy/legacy.png': (0, 200),
+    '/remake/remake.png': (0, 200),
+    '/legacy/slow.png': (0.5, 404),
+    '/remake/slow.png': (0, 200),
+}
+
+class AssetHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        delay, status = PAGES.get(self.path, (0, 404))
+        time.sleep(delay)
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+class TestMapSheetProbe(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), AssetHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever,
+                                      daemon=True)
+        cls.thread.start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        def absolute_path(version:int, rel_path:str) -> str:
+            folder = 'legacy' if version == LEGACY else 'remake'
+            return f'{self.url}/{folder}/{rel_path}'
+        def check_connection():
+            with urllib.request.urlopen(self.url + '/', timeout=5):
+                return True
+        patches = [mock.patch.object(probes, 'absolute_path', absolute_path),
+                   mock.patch.object(probes, '_check_connection',
+                                     check_connection),
+                   mock.patch.object(probes, '_connection', None)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        old_settings = (probes.PROBE_WORKERS, probes.PROBE_TIMEOUT)
+        self.addCleanup(probes.configure_probes, *old_settings)
+        probes.configure_probes(timeout=5)
+        # Every test should actually go to the server
+        old_cache = cache.get_probe_cache()
+        cache.configure_probe_cache(False)
+        self.addCleanup(setattr, cache, '_probe_cache', old_cache)
+
+    def test_legacy(self):
+        probe = probes.MapSheetProbe('legacy.png', 'world.json')
+        self.assertEqual(probe.result(), (LEGACY, ''))
+
+    def test_remake(self):
+        probe = probes.MapSheetProbe('remake.png', 'world.json')
+        self.assertEqual(probe.result(), (REMAKE, ''))
+
+    def test_not_found(self):
+        version, warnings = probes.MapSheetProbe('missing.png',
+                                                 'world.json').result()
+        self.assertEqual(version, AUTODETECT)
+        self.assertIn('Couldn’t find the map sheet', warnings)
+
+    def test_timeout(self):
+        probes.configure_probes(timeout=0.1)
+        version, warnings = probes.MapSheetProbe('slow.png',
+                                                 'world.json').result()
+        self.assertEqual(version, REMAKE)
+        self.assertIn('Timed out checking the Legacy server', warnings)
+
+    def test_cancel_shared_checks(self):
+        # With 1 thread, the Remake check and the connection test are still
+        # waiting to start when the first probe is cancelled. Both probes
+        # share them, so the second one still needs them.
+        probes.configure_probes(workers=1)
+        first = probes.MapSheetProbe('slow.png', 'world.json')
+        second = probes.MapSheetProbe('slow.png', 'world.json')
+        self.assertIs(first.futures[REMAKE], second.futures[REMAKE])
+        first.cancel()
+        self.assertEqual(second.result(), (REMAKE, ''))
+
+    def test_cancel_unshared_checks(self):
+        probes.configure_probes(workers=1)
+        probe = probes.MapSheetProbe('slow.png', 'world.json')
+        remake = probe.futures[REMAKE]
+        probe.cancel()
+        self.assertTrue(remake.cancelled())
+        # A new probe doesn't get the cancelled check
+        probe = probes.MapSheetProbe('slow.png', 'world.json')
+        self.assertEqual(probe.result(), (REMAKE, ''))
+
+class TestProbeCacheDefault(unittest.TestCase):
+    def test_off_by_default(self):
+        # Only the command line and the server turn it on, so the app and
+        # other programs using the converter don't write to the cache folder
+        output = subprocess.run([sys.executable, '-c',
+                'from worldconverter import get_probe_cache; '
+                'print(get_probe_cache())'],
+                stdout=subprocess.PIPE, check=True).stdout
+        self.assertEqual(output.strip(), b'None')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+'''
+Tests for the conversion service (server.py).
+'''
+
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from worldconverter.server import ConversionServer, ConversionService
+
+WORLD = {
+    'type': 'game', 'mode': 'royale', 'initial': 0,
+    'resource': [{'id': 'map', 'src': 'https://example.com/map.png'}],
+    'world': [{'id': 0, 'name': 'world', 'initial': 0, 'zone': [{
+        'id': 0, 'initial': 0, 'color': '#6B8CFF', 'music': '', 'camera': 0,
+        'data': [[30, 30], [98331, 98331]], 'obj': [], 'warp': [],
+        'spawnpoint': [{'id': 0, 'pos': 0}]}]}],
+}
+
+class TestConversionServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = ConversionService(max_workers=2, timeout=30)
+        cls.server = ConversionServer(('127.0.0.1', 0), cls.service)
+        cls.thread = threading.Thread(target=cls.server.serve_forever,
+                                      daemon=True)
+        cls.thread.start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+
+    def post(self, world:dict, query:str='from=legacy&to=deluxe'):
+        request = urllib.request.Request(f'{self.url}/convert?{query}',
+                                         json.dumps(world).encode('utf-8'))
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return (response.status, json.load(response))
+        except urllib.error.HTTPError as e:
+            with e:
+                return (e.code, json.load(e))
+
+    def test_convert(self):
+        status, body = self.post(WORLD)
+        self.assertEqual(status, 200)
+        self.assertFalse(body['failed'])
+        zone = body['world']['world'][0]['zone'][0]
+        self.assertEqual(zone['data'][1][0], [27, 0, 1, 1, 0])
+
+    def test_broken_worlds(self):
+        # These make the converter raise an exception, which should still
+        # get a proper response
+        no_levels = dict(WORLD, world=[])
+        zone = dict(WORLD['world'][0]['zone'][0])
+        del zone['camera']
+        no_camera = dict(WORLD, world=[dict(WORLD['world'][0], zone=[zone])])
+        for world, query in ((no_levels, 'from=legacy&to=deluxe'),
+                             (no_camera, 'from=legacy&to=remake')):
+            status, body = self.post(world, query)
+            self.assertEqual(status, 422)
+            self.assertTrue(body['failed'])
+            self.assertIsNone(body['world'])
+            self.assertIn('Failed to convert world.json', body['warnings'])
+
+    def test_classic(self):
+        status, body = self.post(WORLD, 'from=classic&to=legacy')
+        self.assertEqual(status, 200)
+        self.assertFalse(body['failed'])
+
+    def test_unknown_version(self):
+        for query in ('from=smb3&to=legacy', 'from=legacy&to=smb3',
+                      'from=legacy&to=auto'):
+            status, body = self.post(WORLD, query)
+            self.assertEqual(status, 400)
+            self.assertTrue(body['failed'])
+
+    def test_names(self):
+        status, body = self.post(WORLD, 'from=auto&to=deluxe&name=my.json')
+        self.assertEqual(status, 200)
+        self.assertIn('my.json', body['warnings'])
+        for name in ('.', '..', '../world.json', 'levels/world.json',
+                     'levels%5Cworld.json', 'a%00b', 'a' * 300):
+            status, body = self.post(WORLD, f'name={name}')
+            self.assertEqual(status, 400, name)
+            self.assertTrue(body['failed'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+'''
+Tests for the tile grids in tilegrid.py, against the per-tile code they
+stand in for (convert_raw_rows() in core.py).
+'''
+
+import copy
+import json
+import random
+import unittest
+from typing import *
+
+from worldconverter import (CLASSIC, DELUXE, LEGACY, REMAKE,
+                            ConversionContext, PaletteGrid, TileGrid,
+                            convert_tile_grid, convert_zone)
+from worldconverter.core import (convert_raw_rows, extract_tile,
+                                 get_translation_table, palette_convert)
+from worldconverter.tilegrid import MAX_PALETTE_SIZE
+
+# Air, water, and flagpole tiles get special treatment, so there's plenty
+# of them
+SPECIAL_DEFS = (0, 0, 0, 7, 8, 9, 161)
+
+def make_rows(rng:random.Random, width:int, height:int,
+              deluxe:bool) -> list:
+    rows = []
+    for _ in range(height):
+        row = []
+        for _ in range(width):
+            tile = [rng.randrange(2048), rng.randrange(16), rng.randrange(2),
+                    rng.choice(SPECIAL_DEFS) if rng.random() < 0.5
+                    else rng.randrange(256), rng.randrange(256)]
+            row.append(tile if deluxe else tile[0] + (tile[1] << 11) +
+                       (tile[2] << 15) + (tile[3] << 16) + (tile[4] << 24))
+        rows.append(row)
+    return rows
+
+def make_pool_rows(rng:random.Random, width:int, height:int, deluxe:bool,
+                   pool_size:int) -> list:
+    # Rows made of only pool_size different tiles (each its own object)
+    pool = make_rows(rng, pool_size, 1, deluxe)[0]
+    return [[copy.copy(rng.choice(pool)) for _ in range(width)]
+            for _ in range(height)]
+
+def convert_reference(rows:list, convert_from:int, convert_to:int,
+                      check_flagpole:bool=True) -> tuple:
+    # One tile at a time: (rows, flagpole_pos, replacements)
+    rows = copy.deepcopy(rows)
+    context = ConversionContext(convert_from, convert_to, True)
+    flagpole_pos = convert_raw_rows(rows, convert_from, convert_to, True,
+            get_translation_table(convert_from, convert_to, True), context,
+            check_flagpole)
+    return (rows, flagpole_pos, list(context.replacements))
+
+def convert_packed(rows:list, convert_from:int, convert_to:int,
+                   check_flagpole:bool=True) -> Optional[tuple]:
+    grid = TileGrid.from_rows(copy.deepcopy(rows), extract_tile)
+    if grid is None:
+        return None
+    flagpole_pos, replacements = convert_tile_grid(grid, convert_to,
+            get_translation_table(convert_from, convert_to, True),
+            check_flagpole)
+    return (grid.to_rows(), flagpole_pos, replacements)
+
+def convert_palette(rows:list, convert_from:int, convert_to:int,
+                    check_flagpole:bool=True) -> Optional[tuple]:
+    result = palette_convert(copy.deepcopy(rows), convert_from, convert_to,
+            True, get_translation_table(convert_from, convert_to, True),
+            check_flagpole)
+    if result is None:
+        return None
+    grid, flagpole_pos, replacements = result
+    return (grid.to_rows(), flagpole_pos, replacements)
+
+def pairs() -> Iterator[Tuple[int, int]]:
+    for convert_from in (DELUXE, LEGACY, REMAKE):
+        for convert_to in (DELUXE, LEGACY, REMAKE, CLASSIC):
+            yield (convert_from, convert_to)
+
+class TestTileGrid(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(0)
+        for deluxe in (False, True):
+            rows = make_rows(rng, 30, 10, deluxe)
+            grid = TileGrid.from_rows(rows, extract_tile)
+            grid.deluxe = deluxe
+            self.assertEqual(grid.to_rows(), rows)
+
+    def test_random(self):
+        rng = random.Random(1)
+        for convert_from, convert_to in pairs():
+            rows = make_rows(rng, 40, 15, convert_from == DELUXE)
+            for check_flagpole in (True, False):
+                with self.subTest(convert_from=convert_from,
+                                  convert_to=convert_to,
+                                  check_flagpole=check_flagpole):
+                    self.assertEqual(
+                        convert_packed(rows, convert_from, convert_to,
+                                       check_flagpole),
+                        convert_reference(rows, convert_from, convert_to,
+                                          check_flagpole))
+
+    def test_every_tile(self):
+        # Every tile definition with every extra data value, with each row
+        # under the one before, so every kind of tile ends up above water
+        for convert_from, convert_to in pairs():
+            deluxe = convert_from == DELUXE
+            rows = [[[30, 0, 0, tile_def, extra] if deluxe
+                     else 30 + (tile_def << 16) + (extra << 24)
+                     for extra in range(256)] for tile_def in range(256)]
+            with self.subTest(convert_from=convert_from,
+                              convert_to=convert_to):
+                self.assertEqual(
+                    convert_packed(rows, convert_from, convert_to),
+                    convert_reference(rows, convert_from, convert_to))
+
+    def test_unusual_tiles(self):
+        # Tiles extract_tile() has to clean up are packed one at a time
+        rows = make_rows(random.Random(2), 10, 4, True)
+        rows[1][3] = [30]
+        rows[2][5] = [30, 0, 0, 'x', 0]
+        rows[3][0] = [30, 0, 0, 7, 0, 'extra']
+        self.assertEqual(convert_packed(rows, DELUXE, LEGACY),
+                         convert_reference(rows, DELUXE, LEGACY))
+
+    def test_too_big(self):
+        # Left to the per-tile code
+        rows = make_rows(random.Random(3), 10, 4, True)
+        rows[2][2] = [30, 0, 0, 300, 0]
+        self.assertIsNone(TileGrid.from_rows(rows, extract_tile))
+        self.assertIsNone(TileGrid.from_rows([[1, 2], [3]], extract_tile))
+
+class TestPaletteGrid(unittest.TestCase):
+    def test_random(self):
+        rng = random.Random(4)
+        for convert_from, convert_to in pairs():
+            for pool_size in (1, 20, MAX_PALETTE_SIZE):
+                rows = make_pool_rows(rng, 40, 15, convert_from == DELUXE,
+                                      pool_size)
+                with self.subTest(convert_from=convert_from,
+                                  convert_to=convert_to,
+                                  pool_size=pool_size):
+                    self.assertEqual(
+                        convert_palette(rows, convert_from, convert_to,
+                                        convert_from != DELUXE),
+                        convert_reference(rows, convert_from, convert_to,
+                                          convert_from != DELUXE))
+
+    def test_water_copies(self):
+        # Every tile is different and air is on top of water everywhere, so
+        # the water copies of the air tiles don't fit in 1 byte indexes
+        rows = [[[i, 0, 0, 0, 0] for i in range(MAX_PALETTE_SIZE // 2)],
+                [[i, 0, 0, 7, 0] for i in range(MAX_PALETTE_SIZE // 2)]]
+        result = palette_convert(copy.deepcopy(rows), DELUXE, DELUXE, True,
+                                 get_translation_table(DELUXE, DELUXE, True))
+        self.assertEqual(result[0].indexes.typecode, 'H')
+        self.assertEqual(result[0].to_rows(),
+                         convert_reference(rows, DELUXE, DELUXE)[0])
+
+    def test_too_many_tiles(self):
+        rows = [[[i, 0, 0, 0, 0] for i in range(MAX_PALETTE_SIZE + 1)]]
+        self.assertIsNone(PaletteGrid.from_rows(rows))
+
+    def test_unusual_tiles(self):
+        # Left to TileGrid or the per-tile code
+        for rows in ([[1, [30, 0, 0, 0, 0]]], [[1, 2.0]], [[1, 2], [3]],
+                     [[[30, 0, 0, [0], 0]]]):
+            self.assertIsNone(PaletteGrid.from_rows(rows))
+        # Tiles the per-tile code would warn about
+        rows = [[[30, 0, 0, 0, 0], [30, 0, 0, None, 0]]]
+        self.assertIsNone(convert_palette(rows, DELUXE, LEGACY))
+
+class TestRepeatedRows(unittest.TestCase):
+    def make_rows(self, deluxe:bool) -> list:
+        # Air above water, with the same row object more than once (so the
+        # water fix can't go thru to the other air rows), and a row that's
+        # only equal to one before it
+        def tile(tile_def:int):
+            return [30, 0, 0, tile_def, 0] if deluxe else 30 + (tile_def << 16)
+        air = [tile(0) for _ in range(12)]
+        solid = [tile(1) for _ in range(12)]
+        water = [tile(7 if i % 3 else 0) for i in range(12)]
+        return [air, air, solid, copy.deepcopy(air), air, water, water]
+
+    def test_count(self):
+        for deluxe in (False, True):
+            grid = PaletteGrid.from_rows(self.make_rows(deluxe))
+            self.assertEqual(grid.repeated_rows, 4)
+
+    def test_shared_rows(self):
+        # Rows read from a file are never the same object, so the reference
+        # gets its own copy of every row. The shared rows mustn't be changed
+        # in place either.
+        for convert_from, convert_to in pairs():
+            rows = self.make_rows(convert_from == DELUXE)
+            rows_json = json.dumps(rows)
+            result = palette_convert(rows, convert_from, convert_to, True,
+                    get_translation_table(convert_from, convert_to, True))
+            with self.subTest(convert_from=convert_from,
+                              convert_to=convert_to):
+                self.assertEqual(result[0].to_rows(), convert_reference(
+                        json.loads(rows_json), convert_from, convert_to)[0])
+                self.assertEqual(json.dumps(rows), rows_json)
+
+    def test_stats(self):
+        context = ConversionContext(LEGACY, DELUXE, True)
+        zone = {'id': 0, 'initial': 0, 'color': '#6B8CFF', 'music': '',
+                'camera': 0, 'data': self.make_rows(False), 'obj': [],
+                'warp': [], 'spawnpoint': [{'id': 0, 'pos': 0}]}
+        convert_zone(zone, False, LEGACY, DELUXE, context=context)
+        self.assertEqual(context.stats['rows reused'], 4)
+        self.assertEqual(context.stats['rows converted'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+'''
+MR World Converter -- conversion engine
+
+This package has no GUI dependencies. WorldConverter.py is a Tkinter frontend
+built on top of it, but it can also be imported directly, e.g.:
+
+    from worldconverter import convert, DELUXE, LEGACY
+    warnings = convert('old.json', 'new.json', convert_to=LEGACY)
+'''
+
+from .constants import (VERSION, DELUXE, LEGACY, REMAKE, CLASSIC, INFERNO,
+                        AUTODETECT, game_ver_str)
+from .database import (OBJ_DATABASE, TILE_DATABASE, UNKNOWN_OBJ,
+                       ObjDbEntry, TileDbEntry,
+                       deluxe_obj_lookup, legacy_obj_lookup,
+                       deluxe_tile_lookup, legacy_tile_lookup,
+                       remake_tile_lookup,
+                       get_obj_by_name, get_obj_id_for_version,
+                       get_tile_by_name, get_tile_id_for_version)
+from .core import (convert, run_conversion, convert_zone, convert_tile,
+                   extract_tile, convert_raw_tile, convert_raw_rows,
+                   palette_convert, make_save_dir)
+from .context import ConversionContext
+from .assets import (absolute_path, is_abs_path, web_file_exists,
+                     find_in_asset_index, build_asset_index, asset_index_hash)
+from .detect import (detect_version, has_remake_features, has_remake_conveyor,
+                     is_remake_conveyor, probe_map_sheet)
+from .translation import (translate_tile, build_translation_table,
+                          get_translation_table)
+from .objects import (OBJ_TRANSFORMERS, add_obj_transformer,
+                      get_obj_table)
+from .cache import (ProbeCache, default_cache_dir, get_probe_cache,
+                    configure_probe_cache, ResultCache, get_result_cache,
+                    configure_result_cache)
+from .probes import MapSheetProbe, probe_url, configure_probes
+from .writer import encode_zone, iter_world_json, save_world
+from .jsonbackend import JSON_BACKENDS, get_json_backend, set_json_backend
+from .reader import (BINARY_SIGNATURES, BinaryFileError, LazyZoneList,
+                     is_binary_file, load_world, peek_zone, read_world_file,
+                     zone_field)
+from .tilegrid import (TileGrid, convert_tile_grid, PaletteGrid,
+                       convert_palette_grid, pack_td32)
+from .profiling import Profile, PHASES
+from .parallel import ordered_map
@@ -0,0 +1,10 @@
+'''
+Entry point for `python -m worldconverter`. See cli.py.
+'''
+
+import sys
+
+from .cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
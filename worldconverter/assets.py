@@ -0,0 +1,217 @@
+'''
+Helpers for world resource URLs (map/obj sheets, assets, etc.), including
+checking whether a file exists on one of the game's asset servers.
+'''
+
+import hashlib
+import json
+import os
+from datetime import date
+from typing import *
+
+from .constants import *
+from .cache import get_probe_cache
+
+def absolute_path(version: int, rel_path: str):
+    '''
+    Given a relative path, convert to an absolute URL path
+    '''
+    if version == DELUXE:
+        return 'https://raw.githubusercontent.com/mroyale/assets-dx/main/' + \
+                rel_path
+    elif version == REMAKE:
+        return 'https://mroyale.net/' + rel_path
+    else: # LEGACY
+        return 'https://raw.githubusercontent.com/mroyale/assets/legacy/' + \
+                rel_path
+
+def is_abs_path(url: str):
+    return (url.startswith('http://') or \
+            url.startswith('https://') or \
+            url.startswith('//'))
+
+def web_file_exists(path:str, timeout:Optional[float]=None):
+    '''
+    Test if an image file exists on the web.
+    Return True if the specified string is a valid URL.
+    Return False if attempting to visit the URL returns an HTTP error.
+    Return None if GoNow forgot to renew his TLS certificate again.
+    If timeout is set and the server takes more than that many seconds to
+    respond, raise socket.timeout.
+    '''
+    # urllib.request is slow to import, so only load it if we go online
+    import socket
+    import urllib.request
+    kwargs = {} if timeout is None else {'timeout': timeout}
+    try:
+        # Just call to check for error
+        with urllib.request.urlopen(path, **kwargs):
+            return True
+    except urllib.error.HTTPError:
+        # If the path leads to a 404, or the server is down
+        return False
+    except urllib.error.URLError as e:
+        # A timeout while connecting doesn't tell us anything either way
+        if isinstance(e.reason, socket.timeout):
+            raise e.reason
+        # If Remake's certificate expired AGAIN. (URLError could also mean
+        # "no internet", but that case is handled elsewhere.)
+        return None
+
+def cached_web_file_exists(path:str) -> Tuple[bool, Optional[bool]]:
+    '''
+    Look up the result of web_file_exists() in the probe cache (see cache.py)
+    without going online.
+    Returns (hit, result). If hit is False, the URL still needs checking.
+    '''
+    probe_cache = get_probe_cache()
+    if probe_cache is None:
+        return (False, None)
+    return probe_cache.lookup(path)
+
+def check_web_file_exists(path:str,
+                          timeout:Optional[float]=None) -> Optional[bool]:
+    '''
+    Same as web_file_exists(), but saves the result in the probe cache.
+    '''
+    result = web_file_exists(path, timeout)
+    probe_cache = get_probe_cache()
+    if probe_cache is not None:
+        probe_cache.store(path, result)
+    return result
+
+# ASSET INDEX
+# A list of which image files exist on the Legacy and Remake asset servers,
+# bundled with the program so version detection doesn't need the internet.
+# Format: {"format": 1, "updated": date, "sources": {"legacy": revision,
+# "remake": revision}, "legacy": [paths], "remake": [paths]}
+# Paths are relative to the server root, e.g. "img/game/smb_map.png". The
+# revisions are the git commits the asset repos were at, or null if they
+# weren't git repos (or it wasn't built from them).
+# To update it, clone the asset repos and run:
+#     python -m worldconverter build-index LEGACY_DIR REMAKE_DIR
+ASSET_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'asset_index.json')
+ASSET_INDEX_FORMAT = 1
+# Only file types that can be used as sprite sheets go in the index
+INDEXED_EXTENSIONS = ('.png', '.gif', '.jpg', '.jpeg', '.webp')
+
+_asset_index : Optional[Dict[int, FrozenSet[str]]] = None
+# Hash of the asset index file (see asset_index_hash())
+_asset_index_hash = ''
+
+def normalize_asset_path(rel_path:str) -> str:
+    '''
+    Clean up a relative resource path so it can be looked up in the index,
+    e.g. "./img//game/smb_map.png" -> "img/game/smb_map.png"
+    '''
+    rel_path = rel_path.strip().replace('\\', '/')
+    # Query strings and anchors don't change which file it is
+    rel_path = rel_path.split('?', 1)[0].split('#', 1)[0]
+    parts = [i for i in rel_path.split('/') if i not in ('', '.')]
+    return '/'.join(parts)
+
+def load_asset_index() -> Dict[int, FrozenSet[str]]:
+    '''
+    Load the bundled asset index (only once -- after that it's cached).
+    Returns {version: set of paths}. If the index is missing or unreadable,
+    every set is empty, so nothing will be found in it.
+    '''
+    global _asset_index, _asset_index_hash
+    if _asset_index is None:
+        index : Dict[int, FrozenSet[str]] = {LEGACY: frozenset(),
+                                             REMAKE: frozenset()}
+        try:
+            with open(ASSET_INDEX_PATH, 'rb') as index_file:
+                raw = index_file.read()
+            _asset_index_hash = hashlib.blake2b(raw,
+                                                digest_size=20).hexdigest()
+            data = json.loads(raw.decode('utf-8'))
+            if data.get('format') == ASSET_INDEX_FORMAT:
+                index[LEGACY] = frozenset(data.get('legacy', ()))
+                index[REMAKE] = frozenset(data.get('remake', ()))
+        except (OSError, ValueError, AttributeError):
+            pass
+        _asset_index = index
+    return _asset_index
+
+def asset_index_hash() -> str:
+    '''
+    Return a hash of the asset index file, or '' if there isn't one. A new
+    index can detect some worlds differently, so anything remembered about
+    an auto-detected world should go with this.
+    '''
+    load_asset_index()
+    return _asset_index_hash
+
+def find_in_asset_index(rel_path:str) -> int:
+    '''
+    Look up a relative image path in the asset index.
+    Return LEGACY or REMAKE depending on which server has it, or AUTODETECT if
+    it's in neither. Legacy wins if both have it, because Legacy supports
+    more tiles.
+    '''
+    index = load_asset_index()
+    rel_path = normalize_asset_path(rel_path)
+    if rel_path in index[LEGACY]:
+        return LEGACY
+    elif rel_path in index[REMAKE]:
+        return REMAKE
+    return AUTODETECT
+
+def git_revision(folder:str) -> Optional[str]:
+    '''
+    Return the commit a git repo is checked out at, or None if the folder
+    isn't a git repo. Reads .git directly, so git doesn't need to be
+    installed.
+    '''
+    git_dir = os.path.join(folder, '.git')
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), encoding='utf-8') as head:
+            ref = head.read().strip()
+        if not ref.startswith('ref: '):
+            # Detached HEAD: it's the commit itself
+            return ref or None
+        ref = ref[5:]
+        try:
+            with open(os.path.join(git_dir, *ref.split('/')),
+                      encoding='utf-8') as ref_file:
+                return ref_file.read().strip() or None
+        except FileNotFoundError:
+            # Refs can also be packed into one file
+            with open(os.path.join(git_dir, 'packed-refs'),
+                      encoding='utf-8') as packed:
+                for line in packed:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1] == ref:
+                        return parts[0]
+    except OSError:
+        # Not a git repo (or a worktree, where .git is a file)
+        pass
+    return None
+
+def build_asset_index(legacy_dir:str, remake_dir:str) -> dict:
+    '''
+    Build a new asset index from local copies of the Legacy and Remake asset
+    repos. Returns the index in the format it's saved in.
+    '''
+    def list_images(root:str) -> List[str]:
+        found = []
+        for dir_path, dir_names, filenames in os.walk(root):
+            # No images in there
+            if '.git' in dir_names:
+                dir_names.remove('.git')
+            for filename in filenames:
+                if filename.lower().endswith(INDEXED_EXTENSIONS):
+                    found.append(normalize_asset_path(os.path.relpath(
+                        os.path.join(dir_path, filename), root)))
+        return sorted(found)
+
+    return {
+        'format': ASSET_INDEX_FORMAT,
+        'updated': date.today().isoformat(),
+        'sources': {'legacy': git_revision(legacy_dir),
+                    'remake': git_revision(remake_dir)},
+        'legacy': list_images(legacy_dir),
+        'remake': list_images(remake_dir),
+    }
@@ -0,0 +1,290 @@
+'''
+Persistent caches that are kept between runs of the program.
+'''
+
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import *
+
+from .constants import VERSION
+
+def default_cache_dir() -> str:
+    '''
+    Return the folder that caches are saved in by default.
+    Can be overridden with the WORLDCONVERTER_CACHE_DIR environment variable.
+    '''
+    if os.environ.get('WORLDCONVERTER_CACHE_DIR'):
+        return os.environ['WORLDCONVERTER_CACHE_DIR']
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or \
+                os.path.expanduser('~/.cache')
+    return os.path.join(base, 'worldconverter')
+
+class ProbeCache:
+    '''
+    Remembers whether files exist on the asset servers (i.e. the results of
+    web_file_exists()), keyed by URL, in an SQLite database. Safe to share
+    between threads and processes.
+
+    Files that exist are remembered for ttl seconds. Files that don't exist
+    (or that gave a security warning) are only remembered for negative_ttl
+    seconds, in case they get uploaded later.
+    If refresh is set, cached results are ignored (but new results are still
+    saved), so every URL gets checked again.
+    '''
+    def __init__(self, path:Optional[str]=None, *,
+                 ttl:float=30*24*60*60, negative_ttl:float=24*60*60,
+                 refresh:bool=False):
+        if path is None:
+            path = os.path.join(default_cache_dir(), 'probes.sqlite3')
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh = refresh
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Only open the database the first time it's needed, so creating a
+        # cache that never gets used costs nothing
+        if self._db is None:
+            import sqlite3
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)),
+                        exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30,
+                                       check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS probes ('
+                             'url TEXT PRIMARY KEY, '
+                             'result INTEGER, ' # 1, 0, or NULL for None
+                             'checked REAL NOT NULL)')
+            self._db.commit()
+        return self._db
+
+    def lookup(self, url:str) -> Tuple[bool, Optional[bool]]:
+        '''
+        Returns (hit, result). If hit is False, the URL isn't cached (or its
+        result has expired) and result should be ignored.
+        '''
+        if self.refresh:
+            return (False, None)
+        with self._lock:
+            row = self._connect().execute(
+                    'SELECT result, checked FROM probes WHERE url = ?',
+                    (url,)).fetchone()
+        if row is None:
+            return (False, None)
+        result = None if row[0] is None else bool(row[0])
+        ttl = self.ttl if result is True else self.negative_ttl
+        if time.time() - row[1] > ttl:
+            return (False, None)
+        return (True, result)
+
+    def store(self, url:str, result:Optional[bool]):
+        '''
+        Save the result of checking a URL.
+        '''
+        with self._lock:
+            db = self._connect()
+            db.execute('INSERT OR REPLACE INTO probes VALUES (?, ?, ?)',
+                       (url, None if result is None else int(result),
+                        time.time()))
+            db.commit()
+
+    def clear(self):
+        '''
+        Forget every cached result.
+        '''
+        with self._lock:
+            db = self._connect()
+            db.execute('DELETE FROM probes')
+            db.commit()
+
+# The probe cache used by auto-detection. None means caching is off, which
+# it is unless configure_probe_cache() turns it on (the command line and the
+# server do), so just importing the converter never writes to the disk.
+_probe_cache : Optional[ProbeCache] = None
+
+def get_probe_cache() -> Optional[ProbeCache]:
+    return _probe_cache
+
+def configure_probe_cache(enabled:bool=True, path:Optional[str]=None,
+                          refresh:bool=False):
+    '''
+    Change how the probe cache works for the rest of this process, e.g. to
+    turn it on (it's off by default), move it, or force every URL to be
+    checked again.
+    '''
+    global _probe_cache
+    _probe_cache = ProbeCache(path, refresh=refresh) if enabled else None
+
+class ResultCache:
+    '''
+    Remembers converted worlds, so converting the exact same file with the
+    exact same settings again is just a copy. Entries are keyed by a hash of
+    the file's contents, the settings, and the converter version (see key()),
+    so a world that changed in any way, or a new version of the converter
+    (or of the asset index, for auto-detected worlds), never gets an old
+    result. Failed conversions aren't remembered.
+
+    The converted worlds are saved in the folder at path, with an SQLite
+    index of their warnings. Once they add up to more than max_size bytes,
+    the ones that were used least recently are deleted. Safe to share between
+    threads and processes.
+    '''
+    def __init__(self, path:Optional[str]=None, *,
+                 max_size:int=512*1024*1024):
+        if path is None:
+            path = os.path.join(default_cache_dir(), 'results')
+        self.path = path
+        self.max_size = max_size
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Only open the database the first time it's needed
+        if self._db is None:
+            import sqlite3
+            os.makedirs(self.path, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.path, 'index.sqlite3'),
+                                       timeout=30, check_same_thread=False)
+            # Every hit updates its entry, so don't wait for the disk each
+            # time. (At worst, a crash forgets which entries were used last.)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS results ('
+                             'key TEXT PRIMARY KEY, '
+                             'convert_from INTEGER NOT NULL, '
+                             'warnings TEXT NOT NULL, '
+                             'size INTEGER NOT NULL, '
+                             'used REAL NOT NULL)')
+            self._db.commit()
+        return self._db
+
+    def _file_path(self, key:str) -> str:
+        return os.path.join(self.path, key + '.json')
+
+    @staticmethod
+    def key(open_path:str, convert_from:int, convert_to:int, use_prog:bool,
+            online:bool, asset_index:str='') -> str:
+        '''
+        Return the cache key for converting open_path with these settings.
+        online and asset_index (a hash of the asset index, see
+        assets.asset_index_hash()) are part of it because they can change
+        what auto-detection decides. Raises OSError if the file can't be
+        read.
+        '''
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(f'{VERSION}|{convert_from}|{convert_to}|'
+                      f'{int(use_prog)}|{int(online)}|{asset_index}|'
+                      .encode('utf-8'))
+        with open(open_path, 'rb') as world_file:
+            for chunk in iter(lambda: world_file.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def lookup(self, key:str, save_path:str) -> Optional[Tuple[int, str]]:
+        '''
+        If key is cached, copy the converted world to save_path and return
+        (the version it was converted from, its warnings). Otherwise return
+        None. The warnings still have the paths they were stored with (see
+        store()).
+        '''
+        with self._lock:
+            db = self._connect()
+            row = db.execute('SELECT convert_from, warnings FROM results '
+                             'WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            try:
+                shutil.copyfile(self._file_path(key), save_path)
+            except FileNotFoundError:
+                # Deleted from under us, so it's not really cached
+                db.execute('DELETE FROM results WHERE key = ?', (key,))
+                db.commit()
+                return None
+            db.execute('UPDATE results SET used = ? WHERE key = ?',
+                       (time.time(), key))
+            db.commit()
+        return (row[0], row[1])
+
+    def store(self, key:str, save_path:str, convert_from:int, warnings:str):
+        '''
+        Save the converted world at save_path, the version it was converted
+        from, and its warnings. Then delete old entries if the cache is too
+        big. Worlds bigger than the whole cache aren't saved.
+        '''
+        size = os.path.getsize(save_path)
+        if size > self.max_size:
+            return
+        file_path = self._file_path(key)
+        # Copy it in under a temporary name first, so other processes never
+        # see half a world
+        temp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}'
+        with self._lock:
+            db = self._connect()
+            shutil.copyfile(save_path, temp_path)
+            os.replace(temp_path, file_path)
+            db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                       (key, convert_from, warnings, size, time.time()))
+            db.commit()
+            self._evict(db)
+
+    def _evict(self, db):
+        # Delete the least recently used entries until it's small enough
+        total = db.execute('SELECT SUM(size) FROM results').fetchone()[0] or 0
+        if total <= self.max_size:
+            return
+        for key, size in db.execute('SELECT key, size FROM results '
+                                    'ORDER BY used').fetchall():
+            db.execute('DELETE FROM results WHERE key = ?', (key,))
+            try:
+                os.remove(self._file_path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_size:
+                break
+        db.commit()
+
+    def clear(self):
+        '''
+        Forget every cached result.
+        '''
+        with self._lock:
+            db = self._connect()
+            for (key,) in db.execute('SELECT key FROM results').fetchall():
+                try:
+                    os.remove(self._file_path(key))
+                except FileNotFoundError:
+                    pass
+            db.execute('DELETE FROM results')
+            db.commit()
+
+# The result cache used by folder conversions (in the GUI and on the command
+# line). None means caching is off.
+_result_cache : Optional[ResultCache] = ResultCache()
+
+def get_result_cache() -> Optional[ResultCache]:
+    return _result_cache
+
+def configure_result_cache(enabled:bool=True, path:Optional[str]=None,
+                           max_size:Optional[int]=None):
+    '''
+    Change how the result cache works for the rest of this process, e.g. to
+    turn it off, move it, or change how big it can get (in bytes).
+    '''
+    global _result_cache
+    if not enabled:
+        _result_cache = None
+    elif max_size is None:
+        _result_cache = ResultCache(path)
+    else:
+        _result_cache = ResultCache(path, max_size=max_size)
@@ -0,0 +1,417 @@
+'''
+Command-line interface for batch conversions.
+
+    python -m worldconverter convert SRC... [--from auto] [--to legacy]
+                                     [-j N] [-o OUTDIR]
+
+Each SRC can be a world file or a folder (every file in the folder gets
+converted). Files are spread across a pool of worker processes (or if
+there's only one big file, its zones are), and one status line is printed
+per file as soon as it's done. The exit code is 0 if
+every file converted successfully, or 1 if any of them failed.
+
+    python -m worldconverter serve [--port 8765 | --unix PATH]
+
+Runs a local conversion service (see server.py).
+
+    python -m worldconverter clear-cache
+
+Deletes everything saved in the caches (see cache.py).
+
+    python -m worldconverter build-index LEGACY_DIR REMAKE_DIR
+
+Rebuilds the asset index (see assets.py) from local copies of the Legacy and
+Remake asset repos.
+'''
+
+import argparse
+import json
+import os
+import sys
+from glob import glob
+from typing import *
+
+from .constants import *
+from . import assets, cache, core, probes
+from .context import ConversionContext
+from .jsonbackend import JSON_BACKENDS, set_json_backend
+from .profiling import PHASES, Profile
+
+# Names accepted by --from and --to
+VERSION_NAMES = {
+    'auto': AUTODETECT,
+    'deluxe': DELUXE,
+    'legacy': LEGACY,
+    'remake': REMAKE,
+    'classic': CLASSIC, # "cross-platform" in the GUI menu
+}
+
+# A single file at least this many bytes has its zones converted in parallel
+# (if -j allows it). Smaller files aren't worth starting processes for.
+PARALLEL_ZONES_SIZE = 4 * 1024 * 1024
+
+# Default max size of the result cache (see cache.py)
+RESULT_CACHE_SIZE = 512 * 1024 * 1024
+
+def init_worker(cache_settings:tuple, probe_timeout:float,
+                result_cache_settings:tuple=(False,),
+                json_backend:str='auto'):
+    '''
+    Apply the command-line settings to this process (or a worker process).
+    Raises ImportError if json_backend isn't installed.
+    '''
+    cache.configure_probe_cache(*cache_settings)
+    probes.configure_probes(timeout=probe_timeout)
+    cache.configure_result_cache(*result_cache_settings)
+    set_json_backend(json_backend)
+
+def convert_one(open_path:str, save_path:str, convert_from:int,
+                convert_to:int, use_prog:bool, online:bool=False,
+                profile_zones:Optional[bool]=None, jobs:int=1) \
+                -> Tuple[str, str, bool, str, Optional[dict], bool]:
+    '''
+    Convert a single file. Runs inside a worker process, so it only takes
+    and returns picklable values.
+    If profile_zones is True or False, the conversion is profiled (with or
+    without a per-zone breakdown; see profiling.py).
+    jobs is how many processes to convert the file's zones in.
+    Returns (open_path, save_path, failed, warnings, profile, cached), where
+    profile is Profile.to_dict() plus the conversion's stats (see
+    context.py), or None, and cached is whether the result
+    came from the result cache (see cache.py).
+    '''
+    profile = None if profile_zones is None else Profile(profile_zones)
+    context = ConversionContext(convert_from, convert_to, use_prog, online,
+                                profile, jobs)
+    try:
+        file_warnings = core.run_conversion(open_path, save_path, context,
+                                            cache.get_result_cache())
+        return (open_path, save_path, context.failed, file_warnings,
+                profile and dict(profile.to_dict(),
+                                 stats=dict(context.stats)),
+                bool(context.stats['result cache hits']))
+    except Exception as e:
+        # Don't let one broken world take down the whole batch
+        return (open_path, save_path, True,
+                f'Failed to convert {open_path}\n{type(e).__name__}: {e}\n',
+                profile and profile.to_dict(), False)
+
+def find_files(sources:List[str]) -> List[str]:
+    '''
+    Expand the list of SRC arguments into a list of files to convert.
+    Folders are expanded to every file directly inside them, like the
+    "Convert folder" button.
+    '''
+    files = []
+    for src in sources:
+        if os.path.isdir(src):
+            files += sorted(i for i in glob(os.path.join(src, '*'))
+                            if os.path.isfile(i))
+        else:
+            files.append(src)
+    return files
+
+def pick_save_paths(files:List[str], save_dir:str) -> List[str]:
+    '''
+    Given the list of files to convert, return a save path inside save_dir
+    for each one. If two files have the same name (e.g. from different
+    folders), tack a number on the end so they don't overwrite each other.
+    '''
+    used = set()
+    save_paths = []
+    for item in files:
+        filename = os.path.basename(item)
+        stem, ext = os.path.splitext(filename)
+        i = 1
+        while filename in used:
+            i += 1
+            filename = f'{stem}_{i}{ext}'
+        used.add(filename)
+        save_paths.append(os.path.join(save_dir, filename))
+    return save_paths
+
+def save_profile(path:str, profiles:List[dict]):
+    '''
+    Save the profile of every file (see convert_one), plus each phase's
+    totals across all files, to a JSON file.
+    '''
+    phases = {phase: {'seconds': sum(i['phases'][phase]['seconds']
+                                     for i in profiles),
+                      'calls': sum(i['phases'][phase]['calls']
+                                   for i in profiles),
+                      'items': sum(i['phases'][phase]['items']
+                                   for i in profiles)}
+              for phase in PHASES}
+    with open(path, 'w', encoding='utf-8') as profile_file:
+        json.dump({'total': sum(i['total'] for i in profiles),
+                   'phases': phases,
+                   'files': profiles}, profile_file, indent=4)
+        profile_file.write('\n')
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m worldconverter',
+            description=f'MR World Converter v{VERSION}')
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    subparsers.required = True
+
+    convert_parser = subparsers.add_parser('convert',
+            help='convert one or more worlds')
+    convert_parser.add_argument('sources', nargs='+', metavar='SRC',
+            help='world file, or folder of world files, to convert')
+    convert_parser.add_argument('--from', dest='convert_from', default='auto',
+            choices=list(VERSION_NAMES),
+            help='game version to convert from (default: auto)')
+    convert_parser.add_argument('--to', dest='convert_to', default='legacy',
+            choices=[name for name, version in VERSION_NAMES.items()
+                     if version != AUTODETECT],
+            help='game version to convert to (default: legacy)')
+    convert_parser.add_argument('--no-prog', dest='use_prog',
+            action='store_false',
+            help="don't use progressive item boxes (Legacy/Deluxe only)")
+    convert_parser.add_argument('--online', action='store_true',
+            help='when auto-detecting, check the asset servers for map '
+                 "sheets that aren't in the bundled asset index")
+    convert_parser.add_argument('--refresh-cache', action='store_true',
+            help='with --online, check every map sheet again instead of '
+                 'using cached results')
+    convert_parser.add_argument('--no-cache', action='store_true',
+            help="with --online, don't read or save cached results")
+    convert_parser.add_argument('--result-cache', action='store_true',
+            help='save converted worlds, and copy them from there instead '
+                 'of converting files that have been converted with the '
+                 'same settings before')
+    convert_parser.add_argument('--result-cache-size', type=float,
+            default=RESULT_CACHE_SIZE / 1024 / 1024, metavar='MB',
+            help='with --result-cache, max size of the saved results, in '
+                 f'megabytes (default: {RESULT_CACHE_SIZE // 1024 // 1024})')
+    convert_parser.add_argument('--probe-timeout', type=float,
+            default=probes.PROBE_TIMEOUT, metavar='SECONDS',
+            help='with --online, give up on an asset server after this many '
+                 f'seconds (default: {probes.PROBE_TIMEOUT:g})')
+    convert_parser.add_argument('--json-backend', default='auto',
+            choices=JSON_BACKENDS,
+            help='JSON library to read and write worlds with. The output is '
+                 'the same with any of them. (default: auto, the fastest '
+                 'one installed)')
+    convert_parser.add_argument('-j', '--jobs', type=int,
+            default=os.cpu_count() or 1,
+            help='number of worker processes (default: number of CPUs)')
+    convert_parser.add_argument('-o', '--output', metavar='OUTDIR',
+            help='folder to save converted worlds to (default: a new '
+                 '"converted" folder in the working directory)')
+    convert_parser.add_argument('--profile', metavar='FILE',
+            help='save how long each phase of each conversion took to a '
+                 'JSON file')
+    convert_parser.add_argument('--profile-zones', action='store_true',
+            help='with --profile, also break the times down by zone')
+
+    serve_parser = subparsers.add_parser('serve',
+            help='run a local conversion service (see server.py)')
+    serve_parser.add_argument('--host', default='127.0.0.1',
+            help='address to listen on (default: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8765,
+            help='port to listen on (default: 8765)')
+    serve_parser.add_argument('--unix', metavar='PATH',
+            help='listen on a Unix socket instead of a port')
+    # The defaults are server.py's, which isn't imported unless it's needed
+    serve_parser.add_argument('-j', '--jobs', type=int,
+            help='max number of worlds to convert at once '
+                 '(default: number of CPUs)')
+    serve_parser.add_argument('--timeout', type=float, metavar='SECONDS',
+            help='give up on a request after this many seconds '
+                 '(default: 60)')
+    serve_parser.add_argument('--max-size', type=float, metavar='MB',
+            help='biggest world to accept, in megabytes (default: 256)')
+    serve_parser.add_argument('--online', action='store_true',
+            help='when auto-detecting, check the asset servers for map '
+                 "sheets that aren't in the bundled asset index")
+    serve_parser.add_argument('--probe-timeout', type=float,
+            default=probes.PROBE_TIMEOUT, metavar='SECONDS',
+            help='with --online, give up on an asset server after this many '
+                 f'seconds (default: {probes.PROBE_TIMEOUT:g})')
+    serve_parser.add_argument('--json-backend', default='auto',
+            choices=JSON_BACKENDS,
+            help='JSON library to read and write worlds with '
+                 '(default: auto, the fastest one installed)')
+
+    subparsers.add_parser('clear-cache',
+            help='delete saved conversion results and asset server checks')
+
+    index_parser = subparsers.add_parser('build-index',
+            help='rebuild the asset index used for version detection')
+    index_parser.add_argument('legacy_dir', metavar='LEGACY_DIR',
+            help='local copy of the Legacy asset repo')
+    index_parser.add_argument('remake_dir', metavar='REMAKE_DIR',
+            help='local copy of the Remake asset files')
+    index_parser.add_argument('-o', '--output', metavar='FILE',
+            default=assets.ASSET_INDEX_PATH,
+            help='where to save the index (default: the bundled index)')
+    return parser
+
+def run_convert(args:argparse.Namespace) -> int:
+    '''
+    Handle the "convert" command. Returns the exit code.
+    '''
+    files = find_files(args.sources)
+    if not files:
+        print('No files to convert.', file=sys.stderr)
+        return 1
+
+    if args.output:
+        save_dir = args.output
+        os.makedirs(save_dir, exist_ok=True)
+    else:
+        save_dir = core.make_save_dir()
+    save_paths = pick_save_paths(files, save_dir)
+
+    convert_from = VERSION_NAMES[args.convert_from]
+    convert_to = VERSION_NAMES[args.convert_to]
+    jobs = max(1, args.jobs)
+    # Probe, cache and JSON settings, for this process and every worker process
+    worker_settings = ((not args.no_cache, None, args.refresh_cache),
+                       args.probe_timeout,
+                       (args.result_cache, None,
+                        int(args.result_cache_size * 1024 * 1024)),
+                       args.json_backend)
+    try:
+        init_worker(*worker_settings)
+    except ImportError as e:
+        print(f'{e}.', file=sys.stderr)
+        return 1
+    profile_zones = args.profile_zones if args.profile else None
+
+    all_warnings = ''
+    fail_count = 0
+    cached_count = 0
+    profiles = []
+    def report(result:Tuple[str, str, bool, str, Optional[dict], bool]):
+        nonlocal all_warnings, fail_count, cached_count
+        open_path, save_path, failed, file_warnings, profile, cached = result
+        if profile is not None:
+            profiles.append(dict(path=open_path, failed=failed, **profile))
+        if failed:
+            fail_count += 1
+            # First line of the warnings is the error message
+            print(f'FAIL {open_path}: {file_warnings.splitlines()[0]}',
+                  flush=True)
+        elif cached:
+            cached_count += 1
+            print(f'OK   {open_path} -> {save_path} (cached)', flush=True)
+        else:
+            print(f'OK   {open_path} -> {save_path}', flush=True)
+        all_warnings += file_warnings + '\n\n'
+
+    if len(files) == 1:
+        # Only 1 file, so split up its zones instead (see parallel.py)
+        zone_jobs = jobs if os.path.isfile(files[0]) and \
+                os.path.getsize(files[0]) >= PARALLEL_ZONES_SIZE else 1
+        report(convert_one(files[0], save_paths[0], convert_from, convert_to,
+                           args.use_prog, args.online, profile_zones,
+                           zone_jobs))
+    elif jobs == 1:
+        # No point starting up worker processes
+        for open_path, save_path in zip(files, save_paths):
+            report(convert_one(open_path, save_path, convert_from,
+                               convert_to, args.use_prog, args.online,
+                               profile_zones))
+    else:
+        # Only load this when there's a pool to start (see parallel.py)
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=jobs,
+                                 initializer=init_worker,
+                                 initargs=worker_settings) as pool:
+            futures = [pool.submit(convert_one, open_path, save_path,
+                                   convert_from, convert_to, args.use_prog,
+                                   args.online, profile_zones)
+                       for open_path, save_path in zip(files, save_paths)]
+            # Report results in the order they finish, not the order
+            # they were submitted
+            for future in as_completed(futures):
+                report(future.result())
+
+    # Save all warnings to a log file, same as the "Convert folder" button
+    with open(os.path.join(save_dir, '_WARNINGS.LOG'), 'a',
+              encoding='utf-8') as log_file:
+        log_file.write(all_warnings)
+
+    if args.profile:
+        save_profile(args.profile, profiles)
+
+    print(f'Converted {len(files) - fail_count} of {len(files)} files '
+          f'to {save_dir}' + (f' ({cached_count} from the result cache)'
+                              if cached_count else ''), file=sys.stderr)
+    return 1 if fail_count else 0
+
+def run_serve(args:argparse.Namespace) -> int:
+    '''
+    Handle the "serve" command. Returns the exit code.
+    '''
+    # Only the service needs the HTTP modules, so don't load them otherwise
+    from . import server
+    if args.unix and not hasattr(server, 'UnixConversionServer'):
+        print('Unix sockets are not supported on this system.',
+              file=sys.stderr)
+        return 1
+    try:
+        init_worker((True, None, False), args.probe_timeout, (False,),
+                    args.json_backend)
+    except ImportError as e:
+        print(f'{e}.', file=sys.stderr)
+        return 1
+    jobs = server.MAX_WORKERS if args.jobs is None else args.jobs
+    timeout = server.REQUEST_TIMEOUT if args.timeout is None \
+            else args.timeout
+    max_size = server.MAX_BODY_SIZE if args.max_size is None \
+            else int(args.max_size * 1024 * 1024)
+    server.serve(args.host, args.port, args.unix, jobs, timeout, max_size,
+                 args.online)
+    return 0
+
+def run_clear_cache(args:argparse.Namespace) -> int:
+    '''
+    Handle the "clear-cache" command. Returns the exit code.
+    '''
+    import sqlite3 # see cache.py
+    try:
+        cache.ResultCache().clear()
+        cache.ProbeCache().clear()
+    except (OSError, sqlite3.Error) as e:
+        print(f'Couldn’t clear the cache: {e}', file=sys.stderr)
+        return 1
+    print(f'Cleared the cache in {cache.default_cache_dir()}')
+    return 0
+
+def run_build_index(args:argparse.Namespace) -> int:
+    '''
+    Handle the "build-index" command. Returns the exit code.
+    '''
+    for folder in (args.legacy_dir, args.remake_dir):
+        if not os.path.isdir(folder):
+            print(f'Not a folder: {folder}', file=sys.stderr)
+            return 1
+    index = assets.build_asset_index(args.legacy_dir, args.remake_dir)
+    for version in ('legacy', 'remake'):
+        if not index[version]:
+            # Probably the wrong folder, and an empty list would make the
+            # index useless, so keep the old one
+            print(f'No images found in the {version.title()} folder.',
+                  file=sys.stderr)
+            return 1
+    with open(args.output, 'w', encoding='utf-8') as index_file:
+        json.dump(index, index_file, indent=4)
+        index_file.write('\n')
+    print(f'Saved {len(index["legacy"])} Legacy and {len(index["remake"])} '
+          f'Remake paths to {args.output}')
+    return 0
+
+def main(argv:Optional[List[str]]=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == 'convert':
+        return run_convert(args)
+    elif args.command == 'serve':
+        return run_serve(args)
+    elif args.command == 'clear-cache':
+        return run_clear_cache(args)
+    elif args.command == 'build-index':
+        return run_build_index(args)
+    return 2
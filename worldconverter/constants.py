@@ -0,0 +1,37 @@
+'''
+Version numbers and game version constants shared by the whole converter.
+'''
+
+VERSION = '3.4.6'
+
+# Compatibility constants (see database.py)
+DELUXE  = 0b10000
+LEGACY  = 0b01000
+REMAKE  = 0b00100
+CLASSIC = 0b00010 # listed as "cross-platform" in menu
+# "Inferno" is an available setting but it's currently unused.
+# Basically it would be treated as Classic with fewer tiles/objects.
+INFERNO = 0b00001
+
+AUTODETECT = 0b00000 # Only for convert_from
+
+def game_ver_str(i:int):
+    '''
+    Given a game version number (e.g. from convert_from or convert_to),
+    return the string associated with that game version number
+    (e.g. 'INFERNO' for i=1)
+    '''
+    if i == 0b10000:
+        return 'DELUXE'
+    elif i == 0b01000:
+        return 'LEGACY'
+    elif i == 0b00100:
+        return 'REMAKE'
+    elif i == 0b00010:
+        return 'CLASSIC'
+    elif i == 0b00001:
+        return 'INFERNO'
+    elif i == 0:
+        return 'AUTODETECT'
+    # else
+    return 'UNKNOWN'
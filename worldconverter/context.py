@@ -0,0 +1,72 @@
+'''
+Per-conversion state.
+
+Everything that one conversion needs to keep track of (its settings, the
+warnings it's collected so far, and what it's removed or replaced) lives in
+a ConversionContext instead of module globals. Every conversion gets its own
+context, so conversions can run at the same time in different threads
+without mixing up each other's warnings, and nothing from one file leaks
+into the report for the next.
+
+There's no memo of what each tile turned into: TileGrid and PaletteGrid
+(see tilegrid.py) already convert each different tile, or tile definition,
+only once per zone.
+'''
+
+from collections import Counter
+from typing import *
+
+from .constants import *
+from .profiling import Profile
+
+class ConversionContext:
+    '''
+    The settings, warnings and statistics of one conversion.
+    The settings are the same as convert()'s arguments.
+    '''
+    def __init__(self, convert_from:int=AUTODETECT, convert_to:int=LEGACY,
+                 use_prog:bool=True, online:bool=False,
+                 profile:Optional[Profile]=None, jobs:int=1):
+        self.convert_from = convert_from
+        self.convert_to = convert_to
+        self.use_prog = use_prog
+        self.online = online
+        self.profile = profile
+        self.jobs = jobs
+
+        # Converter warnings so far
+        self.warnings = ''
+        # Whether the conversion failed
+        self.failed = False
+        # Object IDs removed from the world. Only the keys matter; it's a dict
+        # so each ID is only listed once, in the order they were found.
+        self.removed_objects : Dict[Any, None] = {}
+        # Incompatible tiles that got replaced, as (old tile name, new tile
+        # name), in the same kind of dict
+        self.replacements : Dict[Tuple[str, str], None] = {}
+        # Counts of things that happened, e.g. zones converted
+        self.stats : Counter = Counter()
+
+    def warn(self, text:str):
+        '''
+        Add to the warnings. text should end with a newline.
+        '''
+        self.warnings += text
+
+    def add_replacements(self, replacements:Iterable[Tuple[str, str]]):
+        '''
+        Note down incompatible tile replacements (if they're not already).
+        '''
+        for i in replacements:
+            self.replacements[i] = None
+
+    def merge(self, other:'ConversionContext'):
+        '''
+        Add another context's warnings and statistics to this one's, as if
+        they had happened here (e.g. a zone converted in another process).
+        '''
+        self.warnings += other.warnings
+        self.failed = self.failed or other.failed
+        self.removed_objects.update(other.removed_objects)
+        self.replacements.update(other.replacements)
+        self.stats.update(other.stats)
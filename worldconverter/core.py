@@ -0,0 +1,1011 @@
+'''
+The conversion engine: tile/world conversion with no GUI dependencies.
+All options are passed in as plain ints/bools, so this module can be used by
+the Tkinter app, the command line, or any other Python program.
+'''
+
+import json
+import os
+import re
+import time
+from collections import abc
+from itertools import repeat
+from typing import *
+
+from .constants import *
+from .database import *
+from .translation import get_translation_table, translate_tile
+from .objects import FLAG_INDEX, get_obj_table
+from .tilegrid import (TileGrid, convert_tile_grid, PaletteGrid,
+                       convert_palette_grid)
+from .assets import absolute_path, asset_index_hash, is_abs_path
+from .detect import detect_version
+from .profiling import Profile, ZONE_PHASES
+from .jsonbackend import get_json_backend, set_json_backend
+from .jsonbackend import loads as json_loads
+from .reader import (BinaryFileError, LazyZoneList, is_binary_file,
+                     load_world, peek_zone, read_world_file, zone_field)
+from .writer import encode_zone, save_world
+from .parallel import ordered_map
+from .context import ConversionContext
+from .cache import ResultCache
+
+# Results of the last convert() call, for older code that reads them from
+# here. Anything that might run more than one conversion at once should use
+# run_conversion() and read them from its ConversionContext instead.
+warnings = ''
+convert_fail = False
+
+# World files at least this many bytes are read one zone at a time, to save
+# memory. Smaller ones are read all at once because it's faster.
+LAZY_LOAD_SIZE = 32 * 1024 * 1024
+
+def convert_tile(old_td:list, convert_from:int, convert_to:int,
+                 use_prog:bool=False, table:Optional[list]=None,
+                 context:Optional[ConversionContext]=None) \
+                 -> Union[list, int]:
+    '''
+    Convert a tile from one version to another, including any ID changes and
+    replacements of incompatible tiles.
+    Takes in an int[5] list, i.e. the Deluxe tile format, plus the versions to
+    convert from/to (convert_from must not be AUTODETECT).
+    If the caller already has the translation table for these settings, it
+    can pass it in as table to skip looking it up again.
+    If context is set, replacements of incompatible tiles are noted in it.
+    Returns the new tile in the target version's format.
+    '''
+    # Deluxe TD format:
+    # 0. sprite index (keep)
+    # 1. bump state (keep)
+    # 2. depth (keep)
+    # 3. tile data (change)
+    # 4. extra data (keep except in special cases)
+    tile_def = old_td[3]
+    extra = old_td[4]
+    if 0 <= tile_def < 256 and 0 <= extra < 256:
+        # Fast path: look up the precompiled answer
+        if table is None:
+            table = get_translation_table(convert_from, convert_to, use_prog)
+        new_def, new_extra, replacement = table[tile_def*256 + extra]
+    else:
+        # Deluxe tiles aren't limited to 8 bits, so they might not be in
+        # the table
+        new_def, new_extra, replacement = translate_tile(tile_def, extra,
+                convert_from, convert_to, use_prog)
+
+    # Leave note if the tile was replaced
+    if replacement is not None and context is not None:
+        context.replacements[replacement] = None
+
+    if convert_to == DELUXE:
+        # If we're converting to Deluxe,
+        # we're already using the right tile format
+        return [old_td[0], old_td[1], old_td[2], new_def, new_extra]
+    else:
+        # If we're converting to an older version,
+        # return the tile in td32 format
+        return old_td[0] + old_td[1]*(2**11) + old_td[2]*(2**15) + \
+                new_def*(2**16) + new_extra*(2**24)
+
+def extract_tile(tile:abc.Sequence,
+                 context:Optional[ConversionContext]=None):
+    '''
+    Given a tile of unknown format, return
+    the tile normalized to a list of 5 ints
+    If the tile can't be read and context is set, a warning is added to it.
+    '''
+
+    # Start with an empty tile
+    extracted_tile = [30,0,0,0,0]
+
+    try:
+        if isinstance(tile, list):
+            # Deluxe: list-based format
+            # ValueError = not an int (e.g. extra data in relative warp tiles)
+            # IndexError = out of range (e.g. if tile data is just [30])
+            try:
+                extracted_tile[0] = int(tile[0])
+            except (ValueError, IndexError):
+                extracted_tile[0] = 30 # empty sprite
+            try:
+                extracted_tile[1] = int(tile[1])
+            except (ValueError, IndexError):
+                extracted_tile[1] = 0
+            try:
+                extracted_tile[2] = int(tile[2])
+            except (ValueError, IndexError):
+                extracted_tile[2] = 0
+            try:
+                extracted_tile[3] = int(tile[3])
+            except (ValueError, IndexError):
+                extracted_tile[3] = 0
+            try:
+                extracted_tile[4] = int(tile[4])
+            except (ValueError, IndexError):
+                extracted_tile[4] = 0
+        elif isinstance(tile, int):
+            # Legacy and earlier: td32
+            extracted_tile[0] = tile % 2**11 # sprite: 11-bit
+            extracted_tile[1] = tile // 2**11 % 2**4 # bump state: 4-bit
+            extracted_tile[2] = tile // 2**15 % 2 # depth: 1-bit
+            extracted_tile[3] = tile // 2**16 % 2**8 # definition: 8-bit
+            extracted_tile[4] = tile // 2**24 % 2**8 # extra data: 8-bit
+        # Else, it's a format we just don't recognize at all, so we stick to
+        # the default extracted_tile
+    except Exception:
+        if context is not None:
+            context.warn(f'Failed to convert tile: {tile}\n')
+
+    return extracted_tile
+
+def convert_raw_tile(tile:Any, convert_from:int, convert_to:int,
+                     use_prog:bool, table:list,
+                     context:ConversionContext) -> Tuple[Union[list, int], int]:
+    '''
+    extract_tile() and convert_tile() in one go, for a tile straight from the
+    world file.
+    Returns (new tile, old tile definition).
+    '''
+    old_tile = extract_tile(tile, context)
+    new_tile = convert_tile(old_tile, convert_from, convert_to, use_prog,
+                            table, context)
+    return (new_tile, old_tile[3])
+
+def convert_raw_rows(rows:list, convert_from:int, convert_to:int,
+                     use_prog:bool, table:list, context:ConversionContext,
+                     check_flagpole:bool=True) -> Optional[Tuple[int, int]]:
+    '''
+    Convert a zone or layer's tile data (in place) one tile at a time with
+    convert_raw_tile(), for tile data the faster code can't handle.
+    Returns flagpole_pos, like convert_tile_grid()'s.
+    '''
+    flagpole_pos = None
+    for row_i, row in enumerate(rows):
+        water_cols = []
+        flagpole_col = None
+        # Loop tiles by col
+        for tile_i, tile in enumerate(row):
+            # Overwrite the old tiledata with the new
+            # tile in the appropriate format
+            # (list or td32, depending on game version),
+            # whatever its original format was
+            row[tile_i], old_def = convert_raw_tile(tile, convert_from,
+                    convert_to, use_prog, table, context)
+            if old_def == 7 or old_def == 8 or old_def == 9:
+                water_cols.append(tile_i)
+            elif old_def == 161 and flagpole_col is None:
+                flagpole_col = tile_i
+
+        # WATER HITBOX WORKAROUND
+        # The water hitboxes in Legacy (and probably
+        # Remake) are infamously bad—they’re about a
+        # tile too tall. Deluxe fixes them, but it
+        # means we have to change old worlds built
+        # with these hitboxes in mind.
+        # This will work because the row(s) above
+        # already have their “final” data
+        # (in list format).
+        # Make sure we’re not in top row
+        if convert_to == DELUXE and row_i >= 1:
+            above_row = rows[row_i-1]
+            for tile_i in water_cols:
+                # Get data for the tile 1 row up/same col
+                above_tile = above_row[tile_i]
+                # If td-1 is air, change it to water
+                if (above_tile[3] == 0):
+                    above_tile[3] = 7
+
+        # FLAGPOLE CHECK
+        # Check if this zone has a flagpole. If it
+        # does, then check later if it has a flag
+        # object. If it doesn't, add one at the top of
+        # the pole. This is needed because Remake
+        # doesn't use the flag object, but all other
+        # versions require a flag object if the zone
+        # has a flagpole.
+        if check_flagpole and flagpole_pos is None \
+                and flagpole_col is not None:
+            # Log the highest position with a
+            # flagpole tile, so we can place a flag
+            # object there if necessary
+            flagpole_pos = (flagpole_col, row_i) # (x, y)
+            # Note that the tile array does the top
+            # row first, while int-based coordinates
+            # use the bottom row first.
+    return flagpole_pos
+
+def palette_convert(rows:list, convert_from:int, convert_to:int,
+                    use_prog:bool, table:list, check_flagpole:bool=True) \
+                    -> Optional[Tuple[PaletteGrid, Optional[Tuple[int, int]],
+                                      list]]:
+    '''
+    Convert a zone or layer's tile data as a PaletteGrid (see tilegrid.py),
+    so each different tile is only converted once.
+    Returns (grid, flagpole_pos, replacements), like convert_tile_grid(), or
+    None if the tiles can't go in a PaletteGrid, or any of them would need
+    a warning. (The per-tile code warns about every one of those tiles.)
+    '''
+    grid = PaletteGrid.from_rows(rows)
+    if grid is None:
+        return None
+    # Only for this grid's warnings, so nothing gets noted down if it gives
+    # up
+    grid_context = ConversionContext(convert_from, convert_to, use_prog)
+    entries = TileGrid.from_rows(grid.entry_rows(),
+                                 lambda tile: extract_tile(tile, grid_context))
+    if entries is None or grid_context.warnings:
+        return None
+    return (grid,) + convert_palette_grid(grid, entries, convert_to, table,
+                                          check_flagpole)
+
+def make_save_dir(save_dir:str='./converted') -> str:
+    '''
+    Make a new folder to drop converted worlds in, and return its path.
+    If the folder already exists, tack a number on the end.
+    '''
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+    else:
+        i = 1
+        # Keep trying numbers until we get a folder name
+        # that doesn't exist yet
+        while os.path.exists(save_dir + str(i)):
+            i += 1
+        # Now that we know it works, permanently add the number to save_dir
+        save_dir += str(i)
+        # Create the folder with the number that works
+        os.makedirs(save_dir)
+    return save_dir
+
+def convert_zone(zone:dict, has_layers:bool, convert_from:int,
+                 convert_to:int, use_prog:bool=True,
+                 vertical_world:bool=False, tile_table:Optional[list]=None,
+                 profile:Optional[Profile]=None,
+                 context:Optional[ConversionContext]=None):
+    '''
+    Convert 1 zone (in place): its tiles, objects, warps, and any zone
+    settings that work differently in the target version.
+    convert_from must not be AUTODETECT. vertical_world is whether the world
+    as a whole scrolls vertically (see convert()).
+    If profile is set, the time spent on each part of the zone is recorded
+    in it (see profiling.py).
+    Warnings, removed objects and replaced tiles are noted in context. If
+    there's no context, they're thrown away.
+    '''
+    if context is None:
+        context = ConversionContext(convert_from, convert_to, use_prog)
+    context.stats['zones'] += 1
+    # For packing tiles (see tilegrid.py)
+    zone_extract_tile = lambda tile: extract_tile(tile, context)
+    if profile is not None:
+        zone_index = profile.start_zone()
+        zone_start = time.perf_counter()
+    if tile_table is None:
+        tile_table = get_translation_table(convert_from, convert_to, use_prog)
+    # Deluxe tiles are lists, so a PaletteGrid saves making a new list for
+    # every tile when the world is saved. For td32 tiles, TileGrid is faster.
+    use_palette = convert_to == DELUXE
+
+    # Calculate zone height (for flagpole placement and per-zone vertical
+    # setting)
+    if has_layers:
+        zone_height = len(zone['layers'][0]['data'])
+    else:
+        zone_height = len(zone['data'])
+    # Calculate zone width (for background looping)
+    zone_width = 0
+    if convert_from == DELUXE:
+        if has_layers:
+            zone_width = len(zone['layers'][0]['data'][0])
+        else:
+            zone_width = len(zone['data'][0])
+
+    if convert_to == DELUXE:
+        # Delete world data that isn't in Deluxe because it
+        # doesn't like extra parameters
+        if 'winmusic' in zone:
+            del zone['winmusic']
+        if 'victorymusic' in zone:
+            del zone['victorymusic']
+        if 'levelendoff' in zone:
+            del zone['levelendoff']
+
+        # If world was vertical in Remake, add free-roam camera
+        # to each zone in Deluxe if zone is above height limit 14
+        if vertical_world and zone_height > 14:
+            zone['camera'] = 2
+    elif convert_to == LEGACY:
+        # If world was vertical in Remake, add free-roam camera
+        # to each zone in Legacy if zone is above height limit 16
+        if vertical_world and zone_height > 16:
+            zone['camera'] = 2
+
+    # Fix background image URLs in Deluxe worlds
+    if convert_from == DELUXE and 'background' in zone:
+        for i in zone['background']:
+            dx_url = absolute_path(DELUXE, i['url'])
+            i['url'] = dx_url
+            # Legacy doesn't yet support infinite bg looping,
+            # so we need to calculate it from zone width + speed.
+            # Assume bg image width is ≥128px (the lowest width
+            # found in Deluxe's assets). In most cases our estimate
+            # will be too high, but that should be fine because
+            # there's background culling
+            if i['loop'] <= 0:
+                i['loop'] = (zone_width // 8) + 1
+
+    # Adjust position of left warp exits
+    # Remake and Legacy have a bug where you need to place a warp
+    # three tiles right of the pipe if you want the player to exit
+    # in the right place. Deluxe fixed this bug, so we need to
+    # shift any left warps in the zone
+    for warp in zone['warp']:
+        # Replace no-offset warps if converting to anything other
+        # than Deluxe or Legacy
+        if convert_to < LEGACY:
+            if warp['data'] == 5:
+                warp['data'] = 1
+            elif warp['data'] == 6:
+                warp['data'] = 2
+        if warp['data'] == 3:
+            if convert_to == DELUXE:
+                if warp['pos'] % 65536 >= 3:
+                    # Shift 3 left to "correct" position
+                    # (though it's still 1 tile left of
+                    # what I'd expect)
+                    warp['pos'] -= 3
+                else:
+                    # If warp is all the way at the left for some
+                    # reason, clip its x tile to 0
+                    warp['pos'] -= (warp['pos'] % 65536)
+            elif convert_from == DELUXE:
+                # Shift 3 right to "incorrect" position
+                # Note that warps CAN be placed outside the zone
+                # as long as they're to the RIGHT
+                warp['pos'] += 3
+
+    if profile is not None:
+        tiles_start = time.perf_counter()
+        tile_count = sum(len(row) for grid in (zone['layers'] if has_layers
+                                               else [zone])
+                         for row in grid['data'])
+
+    flagpole_pos = None
+    # All the rows, and how many were the same as one already converted
+    row_count = sum(len(grid['data']) for grid in (zone['layers']
+                                                   if has_layers else [zone]))
+    rows_reused = 0
+    # Two different conversion options based on if level has layers
+    if has_layers:
+        # Loop thru the layers
+        for layer_i, layer in enumerate(zone['layers']):
+            # If the layer's tiles are all clean, convert each different
+            # one once (see tilegrid.py)
+            grid_result = palette_convert(layer['data'], convert_from,
+                    convert_to, use_prog, tile_table,
+                    convert_from != DELUXE) \
+                if use_palette else None
+            if grid_result is not None:
+                layer['data'], grid_flagpole, \
+                    grid_replacements = grid_result
+                if flagpole_pos is None:
+                    flagpole_pos = grid_flagpole
+                context.add_replacements(grid_replacements)
+                rows_reused += layer['data'].repeated_rows
+                continue
+
+            # Or pack the layer into compact arrays and convert it there
+            saved_warnings = context.warnings
+            grid = TileGrid.from_rows(layer['data'], zone_extract_tile)
+            if grid is not None:
+                grid_flagpole, grid_replacements = convert_tile_grid(grid,
+                        convert_to, tile_table, convert_from != DELUXE)
+                layer['data'] = grid
+                if flagpole_pos is None:
+                    flagpole_pos = grid_flagpole
+                context.add_replacements(grid_replacements)
+                continue
+            # The slow path will warn about the same tiles again
+            context.warnings = saved_warnings
+
+            # Slow path for unusual tile data: loop thru the rows
+            grid_flagpole = convert_raw_rows(layer['data'], convert_from,
+                    convert_to, use_prog, tile_table, context,
+                    convert_from != DELUXE)
+            if flagpole_pos is None:
+                flagpole_pos = grid_flagpole
+    else:
+        # If the zone's tiles are all clean, convert each different one
+        # once (see tilegrid.py)
+        grid_result = palette_convert(zone['data'], convert_from,
+                convert_to, use_prog, tile_table) \
+            if use_palette else None
+        grid = None
+        if grid_result is not None:
+            zone['data'], flagpole_pos, grid_replacements = \
+                grid_result
+            context.add_replacements(grid_replacements)
+            if isinstance(zone['data'], PaletteGrid):
+                rows_reused = zone['data'].repeated_rows
+        else:
+            # Or pack the zone into compact arrays and convert it there
+            saved_warnings = context.warnings
+            grid = TileGrid.from_rows(zone['data'], zone_extract_tile)
+            if grid is not None:
+                flagpole_pos, grid_replacements = convert_tile_grid(grid,
+                        convert_to, tile_table)
+                zone['data'] = grid
+                context.add_replacements(grid_replacements)
+            else:
+                # The slow path will warn about the same tiles again
+                context.warnings = saved_warnings
+        if grid_result is None and grid is None:
+            # Slow path for unusual tile data: loop thru rows
+            flagpole_pos = convert_raw_rows(zone['data'], convert_from,
+                    convert_to, use_prog, tile_table, context)
+
+    context.stats['rows converted'] += row_count - rows_reused
+    context.stats['rows reused'] += rows_reused
+
+    if profile is not None:
+        tiles_end = time.perf_counter()
+        profile.add('tile loop', tiles_end - tiles_start, tile_count,
+                    zone_index)
+        obj_count = len(zone['obj'])
+
+    # Check for unsupported objects and remove them, and change the params
+    # of any objects that work differently in the target version.
+    # Objects that are kept go into a new list, so nothing has to be
+    # deleted from the middle of the old one.
+    # Object is incompatible if it's either:
+    #   - Not in the list of all objects
+    #   - In the list but not flagged as supported in
+    #     the target version
+    # Either way, it's not in the object table (see objects.py)
+    obj_table = get_obj_table(convert_from, convert_to)
+    kept_objs = []
+    has_flag = False
+    for obj in zone['obj']:
+        obj_info = obj_table.get(obj['type'])
+        if obj_info is None:
+            # Log the removed object (each ID is only listed once) and
+            # leave it out of the world
+            context.removed_objects[obj['type']] = None
+            continue
+        obj_index, transformer = obj_info
+        if transformer is not None:
+            transformer(obj)
+
+        # FLAG CHECK
+        if obj_index == FLAG_INDEX:
+            has_flag = True
+
+        kept_objs.append(obj)
+    zone['obj'] = kept_objs
+
+    if profile is not None:
+        objects_end = time.perf_counter()
+        # Zone settings and warps (before the tiles) count as objects too
+        profile.add('object loop', tiles_start - zone_start + objects_end -
+                    tiles_end, obj_count, zone_index)
+
+    # Now that we've left the loop, if we still don't have a flag,
+    # add one at the position we found earlier
+    if flagpole_pos is not None and not has_flag:
+        # Create object
+        new_flag_obj : Dict[str, Any] = {
+            'type': 177,
+            'pos': flagpole_pos[0] + \
+                (zone_height - 1 - flagpole_pos[1]) * (2**16),
+            'param': []
+        }
+        # Add object to JSON
+        zone['obj'].append(new_flag_obj)
+        if profile is not None:
+            profile.add('flag insertion', time.perf_counter() - objects_end,
+                        1, zone_index)
+    elif profile is not None:
+        profile.add('flag insertion', time.perf_counter() - objects_end, 0,
+                    zone_index)
+
+def _zone_jobs(content:dict, has_layers:bool, convert_from:int,
+               convert_to:int, use_prog:bool, vertical_world:bool,
+               profile:Optional[Profile]) -> Iterator[tuple]:
+    # Every zone in the world, in order, ready to send to _convert_zone_job()
+    # in another process
+    for level in content['world']:
+        zones = level.get('zone')
+        # Same check as iter_world_json()
+        if not isinstance(zones, abc.Sequence):
+            continue
+        for zone_i in range(len(zones)):
+            if isinstance(zones, LazyZoneList):
+                # Let the other process parse it
+                zone = zones.raw(zone_i)
+            else:
+                zone = zones[zone_i]
+                if isinstance(zones, list):
+                    # The other process has its own copy now
+                    zones[zone_i] = None
+            yield (zone, has_layers, convert_from, convert_to, use_prog,
+                   vertical_world, profile is not None)
+
+def _convert_zone_job(job:tuple) -> Tuple[str, ConversionContext, list]:
+    '''
+    Convert 1 zone in a worker process (see convert() and parallel.py).
+    job is from _zone_jobs(). Returns (zone JSON, context, profile records)
+    for just this zone.
+    '''
+    zone, has_layers, convert_from, convert_to, use_prog, vertical_world, \
+            profiled = job
+    if isinstance(zone, bytes):
+        zone = json_loads(zone)
+    context = ConversionContext(convert_from, convert_to, use_prog)
+    records : List[Tuple[str, float, int]] = []
+    profile = None
+    if profiled:
+        profile = Profile(callback=lambda phase, seconds, items, zone_index:
+                          records.append((phase, seconds, items)))
+    convert_zone(zone, has_layers, convert_from, convert_to, use_prog,
+                 vertical_world, None, profile, context)
+    return (encode_zone(zone), context, records)
+
+def _merge_zone_result(result:Tuple[str, ConversionContext, list],
+                       context:ConversionContext) -> str:
+    # Add what happened to a zone in another process to this conversion's
+    # context (in the same order as if it happened here), and return the
+    # zone's JSON
+    zone_json, zone_context, records = result
+    context.merge(zone_context)
+    profile = context.profile
+    if profile is not None:
+        zone_index = profile.start_zone()
+        for phase, seconds, items in records:
+            profile.add(phase, seconds, items, zone_index)
+    return zone_json
+
+def convert(open_path: str, save_path: str,
+            convert_from:int=AUTODETECT, convert_to:int=LEGACY,
+            use_prog:bool=True, online:bool=False,
+            profile:Optional[Profile]=None, jobs:int=1,
+            result_cache:Optional[ResultCache]=None) -> str:
+    '''
+    Convert 1 world file from one game version to another, and return string
+    containing all converter warnings.
+    convert_from and convert_to are game version constants (e.g. DELUXE).
+    If use_prog is set, standard item boxes (that contain a mushroom or flower)
+    become progressive item boxes in Legacy/Deluxe.
+    If online is set, auto-detection can check the asset servers for map
+    sheets that aren't in the bundled asset index.
+    If profile is set, the time spent on each phase of the conversion is
+    recorded in it (see profiling.py).
+    If jobs is more than 1, the zones are converted in that many processes
+    at once (see parallel.py). That only helps with big worlds, since
+    starting the processes takes a moment.
+    If result_cache is set, a file that's been converted with the same
+    settings before is copied from there instead (see cache.py).
+    Whether the conversion failed is saved in the module global convert_fail.
+    To run conversions at the same time (e.g. in threads), use
+    run_conversion() instead.
+    '''
+    global convert_fail, warnings
+    context = ConversionContext(convert_from, convert_to, use_prog, online,
+                                profile, jobs)
+    result = run_conversion(open_path, save_path, context, result_cache)
+    convert_fail = context.failed
+    warnings = context.warnings
+    return result
+
+# Stand-ins for the file paths in warnings saved in a ResultCache, since the
+# same world can be converted from and to different paths next time. Some
+# warnings (e.g. from MapSheetProbe) only have the file name of open_path.
+_OPEN_PATH_MARK = '\0open_path\0'
+_SAVE_PATH_MARK = '\0save_path\0'
+_OPEN_NAME_MARK = '\0open_name\0'
+
+def _mark_paths(warnings:str, open_path:str, save_path:str) -> str:
+    # Swap the paths in warnings for their stand-ins, all in one go (so a
+    # file name can't match inside a path, or a stand-in). Longer ones go
+    # first, since the file name is part of the path.
+    marks = {open_path.split(os.sep)[-1]: _OPEN_NAME_MARK,
+             open_path: _OPEN_PATH_MARK, save_path: _SAVE_PATH_MARK}
+    marks.pop('', None)
+    pattern = '|'.join(map(re.escape, sorted(marks, key=len, reverse=True)))
+    return re.sub(pattern, lambda match: marks[match.group()], warnings)
+
+def _unmark_paths(warnings:str, open_path:str, save_path:str) -> str:
+    # Undo _mark_paths(), with the paths of this conversion
+    return warnings.replace(_OPEN_PATH_MARK, open_path) \
+            .replace(_SAVE_PATH_MARK, save_path) \
+            .replace(_OPEN_NAME_MARK, open_path.split(os.sep)[-1])
+
+def run_conversion(open_path:str, save_path:str, context:ConversionContext,
+                   result_cache:Optional[ResultCache]=None) -> str:
+    '''
+    Same as convert(), but the settings come from context, and the warnings,
+    whether it failed, and other statistics are saved in context instead of
+    module globals. If the version is auto-detected, context.convert_from is
+    changed to the detected version.
+    Returns the warnings, or the error message if the conversion failed.
+    '''
+    if result_cache is not None and open_path != save_path:
+        return _run_cached_conversion(open_path, save_path, context,
+                                      result_cache)
+
+    convert_start = time.perf_counter()
+    convert_from = context.convert_from
+    convert_to = context.convert_to
+    use_prog = context.use_prog
+    online = context.online
+    profile = context.profile
+    jobs = context.jobs
+
+    if open_path == save_path:
+        context.failed = True
+        error_msg = f'For your safety, this program does not allow you to \
+overwrite your existing world files. \
+Please try a different file path.\n{open_path}\n'
+        return error_msg
+
+    try:
+        # Open and read the old world file
+        phase_start = time.perf_counter()
+        if os.path.isfile(open_path) and \
+                os.path.getsize(open_path) >= LAZY_LOAD_SIZE:
+            # Big file: only read zones when they're needed (see reader.py)
+            content = load_world(open_path)
+        else:
+            content = json_loads(read_world_file(open_path))
+    except FileNotFoundError:
+        # Not sure if we can get here now that the GUI handles file opening,
+        # but this can't hurt
+        context.failed = True
+        error_msg = f'The selected file does not exist.\n{open_path}\n'
+        return error_msg
+    except IsADirectoryError:
+        context.failed = True
+        error_msg = f'The selected file is a folder.\n{open_path}\n'
+        return error_msg
+    except (UnicodeDecodeError, BinaryFileError):
+        # File is an image, movie, or other binary
+        context.failed = True
+        error_msg = f'The selected file is a binary file such as an image, \
+song, or movie, and could not be read.\n{open_path}\n'
+        return error_msg
+    except json.decoder.JSONDecodeError:
+        # File is not JSON
+        context.failed = True
+        error_msg = f'''The selected text file could not be read.
+Are you sure it’s a world?\n{open_path}\n'''
+        return error_msg
+
+    if profile is not None:
+        # Zones in big files are only parsed as they're converted, so that
+        # part counts as serializing
+        profile.add('parse', time.perf_counter() - phase_start,
+                    os.path.getsize(open_path))
+
+    # Create a file at the save path if it doesn't already exist.
+    # No overwriting yet because if the user is saving over an existing level
+    # and the program crashes, we don't want the user to lose previous progress
+    try:
+        open(save_path, 'a', encoding='utf-8').close()
+    except PermissionError:
+        # If user tries to save to a folder they don't have write access to
+        context.failed = True
+        error_msg = f'Your computer blocked World Converter from saving to \
+the selected folder: \n{save_path}\n'
+        return error_msg
+
+    try:
+        # Might as well check for layers now,
+        # so we don't have to do it over and over again
+        if 'layers' in peek_zone(content['world'][0]['zone'], 0):
+            has_layers = True
+        else:
+            has_layers = False
+
+        # Auto-detect version of source file if necessary
+        if convert_from == AUTODETECT:
+            phase_start = time.perf_counter()
+            probe_time = profile.phases['network probe'][0] \
+                    if profile is not None else 0.0
+            convert_from, detect_warnings = detect_version(content,
+                    has_layers, open_path, online, profile)
+            context.warnings += detect_warnings
+            context.convert_from = convert_from
+            if profile is not None:
+                # Waiting for the asset servers is its own phase
+                probe_time = profile.phases['network probe'][0] - probe_time
+                profile.add('autodetect', time.perf_counter() - phase_start
+                            - probe_time, 1)
+
+        # Now that we know which versions we're converting between, get the
+        # precompiled tile translation table so each tile is just a lookup
+        phase_start = time.perf_counter()
+        tile_table = get_translation_table(convert_from, convert_to, use_prog)
+        if profile is not None:
+            profile.add('table build', time.perf_counter() - phase_start, 1)
+        phase_start = time.perf_counter()
+
+        # Vertical (really free-roam) scrolling is set zone-by-zone in L/D
+        vertical_world = False
+        if convert_from == REMAKE and 'vertical' in content:
+            if content['vertical'] == 'true':
+                vertical_world = True
+            del content['vertical']
+        # If ANY zone in a Deluxe or Legacy world is set to
+        # Vertical or Free-Roam camera, make the whole world vertical in Remake
+        if convert_from & (DELUXE|LEGACY) \
+                and convert_to == REMAKE:
+            # Yup, we gotta loop thru EVERY world, level, and zone
+            for level_i, level in enumerate(content['world']):
+                for zone_i in range(len(level['zone'])):
+                    # If world was vertical, add free-roam camera to each zone
+                    # (only the camera needs to be parsed, see reader.py)
+                    if zone_field(level['zone'], zone_i, 'camera') != 0:
+                        vertical_world = True
+                        break
+                if vertical_world: # Second break after detecting vertical
+                    break
+            # If we detected a vertical zone at any point in the loop,
+            # add the vertical flag to the world
+            content['vertical'] = 'true'
+
+        if convert_to == DELUXE:
+            # Add extra effects sprite sheet that's not in Legacy or Remake
+            content['resource'].append({"id":"effects",
+                    "src":"img/game/smb_effects.png"})
+
+            # Add audio override so Legacy worlds play their original music/SFX
+            # if convert_from == REMAKE:
+            #     content["audioOverrideURL"] = absolute_path(REMAKE,'audio/')
+            if convert_from & (LEGACY|CLASSIC|INFERNO):
+                content["audioOverrideURL"] = absolute_path(LEGACY, 'audio/')
+
+            # Remove effects sheet that's only in Deluxe
+            for index, dict_ in enumerate(content['resource']):
+                if dict_['id'] == 'effects':
+                    del content['resource'][index]
+
+        if convert_to & (DELUXE|INFERNO):
+            # Delete world data that isn't in Deluxe
+            if 'shortname' in content:
+                del content['shortname']
+            if 'longname' in content:
+                del content['longname']
+            if 'autoMove' in content:
+                del content['autoMove']
+            if 'musicOverridePath' in content:
+                del content['musicOverridePath']
+            if 'soundOverridePath' in content:
+                del content['soundOverridePath']
+            # NOTE: This is only necessary because the Java (Inferno/Deluxe)
+            # server rejects any world with a parameter it doesn't recognize,
+            # while the Python (Classic/Legacy) server simply ignores unknown
+            # parameters. (The Remake server also ignores them.)
+
+        if convert_to & (LEGACY|REMAKE|CLASSIC):
+            # Add shortname to make world pass validation in
+            # Classic and Legacy. For Remake, it's just useful as a watermark.
+            if 'shortname' not in content:
+                content['shortname'] = '[WC]'
+            # longname isn't *necessary* anywhere, but again, watermark
+            if 'longname' not in content:
+                content['longname'] = \
+                    f"Converted with Clippy's World Converter (v{VERSION})"
+            if 'mode' not in content:
+                content['mode'] = 'royale'
+            # Legacy music overrides only work with relative paths,
+            # not full URLs, so we can't play music in Legacy yet
+
+        # Turn lobbies into regular worlds so they don't crash the game
+        content['type'] = 'game'
+        # Any valid level should have a type, so no existence check needed.
+        # If the level is missing a type, it will throw a KeyError, which will
+        # make the program say the level is corrupted
+
+        # Add full URL for Legacy assets when converting to Deluxe
+        if convert_to == DELUXE:
+            if convert_from == LEGACY and 'assets' in content:
+                if not is_abs_path(content['assets']):
+                    content['assets'] = absolute_path(LEGACY,
+                                                  "assets/"+content['assets'])
+            # If the world doesn't specify assets (i.e. Classic & Remake),
+            # use Legacy assets because they're a superset of Classic/Remake's
+            # hardcoded animations
+            else:
+                content['assets'] = absolute_path(LEGACY,
+                        'assets/assets.json')
+        # Similar situation but for Deluxe->Legacy assets
+        elif convert_from == DELUXE and convert_to == LEGACY:
+            if 'assets' in content:
+                if not is_abs_path(content['assets']):
+                    content['assets'] = absolute_path(DELUXE,
+                                                  "assets/"+content['assets'])
+            else:
+                # Deluxe worlds won't use the Legacy animations
+                content['assets'] = absolute_path(DELUXE,
+                        'assets/assets-noanim.json')
+        # DX->R assets will just be wrong and there's nothing I can do about it
+
+        # Convert map & obj sheets
+        for index, item in enumerate(content['resource']):
+            # Expand relative map paths to the correct full URL,
+            # based on the version selected/detected earlier.
+            # First of all, only do this if it *is* a relative path, because
+            # if it's already a full URL, then we shouldn't have any issues
+            if item['id'] == 'map' and not is_abs_path(item['src']):
+                if convert_from == DELUXE:
+                    dx_url = absolute_path(DELUXE, item['src'])
+                    content['resource'][index]['src'] = dx_url
+                elif convert_from == REMAKE:
+                    remake_url = absolute_path(REMAKE, item['src'])
+                    content['resource'][index]['src'] = remake_url
+                else: # legacy
+                    legacy_url = absolute_path(LEGACY, item['src'])
+                    content['resource'][index]['src'] = legacy_url
+
+            # Either convert obj URL from relative to absolute, or if conversion
+            # involves Deluxe, change the obj to a set default because Deluxe
+            # uses a different obj sheet layout from other versions
+            if item['id'] == 'obj':
+                # Converting from Any to Deluxe: Switch to Deluxe default obj
+                if convert_to == DELUXE:
+                    content['resource'][index]['src'] = absolute_path(DELUXE,
+                            'img/game/smb_obj.png')
+                # Converting from Deluxe to Any: Switch to Legacy's SMAS obj
+                elif convert_from == DELUXE:
+                    content['resource'][index]['src'] = absolute_path(LEGACY,
+                            'img/game/smas_obj.png')
+                # Don't need a special case for Legacy->Remake because Legacy
+                # obj is a superset of Remake's
+                # If the conversion doesn't involve Deluxe but it uses a
+                # relative path
+                elif not is_abs_path(item['src']):
+                    # Converting from Remake to Legacy: Expand obj sheet URL
+                    # to absolute path on Remake domain
+                    if convert_from == REMAKE:
+                        content['resource'][index]['src'] = \
+                                absolute_path(REMAKE, item['src'])
+                    # Converting from Legacy to Remake: Expand obj sheet URL
+                    # to absolute path on Legacy domain
+                    else:
+                        legacy_url = \
+                        content['resource'][index]['src'] = \
+                                absolute_path(LEGACY, item['src'])
+                # Else (i.e. if the conversion doesn't involve Deluxe and it
+                # already uses an absolute path), leave it
+
+        if profile is not None:
+            profile.add('resource rewrite', time.perf_counter() - phase_start,
+                        len(content['resource']))
+            phase_start = time.perf_counter()
+            zone_time = sum(profile.phases[i][0] for i in ZONE_PHASES)
+
+        # Now convert the zones and save the world. Each zone is converted
+        # right before it's written to the file, and dropped from memory
+        # right after (see writer.py)
+        zone_json = None
+        if jobs > 1:
+            # Or, convert them in other processes and just write them here.
+            # They read and write zones with the same JSON library as this
+            # process.
+            zone_json = map(_merge_zone_result, ordered_map(
+                    _convert_zone_job,
+                    _zone_jobs(content, has_layers, convert_from, convert_to,
+                               use_prog, vertical_world, profile),
+                    jobs, initializer=set_json_backend,
+                    initargs=(get_json_backend(),)), repeat(context))
+        save_world(content, save_path,
+                   lambda zone: convert_zone(zone, has_layers, convert_from,
+                                             convert_to, use_prog,
+                                             vertical_world, tile_table,
+                                             profile, context),
+                   zone_json)
+
+        if profile is not None:
+            # Converting the zones has its own phases. (If that happened in
+            # other processes, the time spent waiting for them counts as
+            # serializing.)
+            zone_time = 0.0 if zone_json is not None else \
+                    sum(profile.phases[i][0] for i in ZONE_PHASES) - zone_time
+            profile.add('serialize', time.perf_counter() - phase_start
+                        - zone_time, os.path.getsize(save_path))
+
+    except UnicodeDecodeError:
+        # Zones in big files don't get read until now (see reader.py), so
+        # this is the first we hear about any problems in them
+        context.failed = True
+        error_msg = f'The selected file is a binary file such as an image, \
+song, or movie, and could not be read.\n{open_path}\n'
+        return error_msg
+    except json.decoder.JSONDecodeError:
+        context.failed = True
+        error_msg = f'''The selected text file could not be read.
+Are you sure it’s a world?\n{open_path}\n'''
+        return error_msg
+#     except KeyError:
+#         # File is missing required fields
+#         context.failed = True
+#         error_msg = '''The selected file appears to be corrupted.
+# Are you sure it’s a world?\n%s\n''' % open_path
+#         return error_msg
+    finally:
+        pass
+
+    context.warnings += \
+            f'\nYOUR CONVERTED WORLD HAS BEEN SAVED TO:\n{save_path}\n\n'
+
+    # Report the IDs of incompatible objects that were removed
+    if context.removed_objects:
+        context.warnings += \
+                'Removed incompatible objects with the following IDs: '
+        for index, item in enumerate(context.removed_objects):
+            # Print the name of the incompatible object if available
+            removed_obj_entry : Tuple[str, int, int, int]
+            if convert_from == DELUXE and item in deluxe_obj_lookup:
+                removed_obj_entry = OBJ_DATABASE[
+                    deluxe_obj_lookup[item]
+                ]
+            elif item in legacy_obj_lookup: # legacy/remake/etc
+                removed_obj_entry = OBJ_DATABASE[
+                    legacy_obj_lookup[item]
+                ]
+            else: # unknown/invalid object ID
+                removed_obj_entry = UNKNOWN_OBJ
+            context.warnings += f'{item} ({removed_obj_entry[0]})'
+            # Add comma if we aren't at the end of the removed objects list
+            if index < (len(context.removed_objects) - 1):
+                context.warnings += ', '
+        context.warnings += '\n'
+
+    # Report the IDs of incompatible tiles that were replaced
+    if context.replacements:
+        for i in context.replacements:
+            context.warnings += f'Incompatible tile definition “{i[0]}” \
+replaced with “{i[1]}”\n'
+    # Tiles that work the same but have different IDs across versions are
+    # converted silently as of v3.0.0
+
+    if profile is not None:
+        profile.total += time.perf_counter() - convert_start
+    return context.warnings
+
+def _run_cached_conversion(open_path:str, save_path:str,
+                           context:ConversionContext,
+                           result_cache:ResultCache) -> str:
+    # run_conversion(), but check result_cache first, and save the result
+    # there if it wasn't in it yet
+    try:
+        if is_binary_file(open_path):
+            # Not worth hashing just to find out it won't convert
+            return run_conversion(open_path, save_path, context)
+        # The asset index only matters when auto-detecting
+        key = result_cache.key(open_path, context.convert_from,
+                               context.convert_to, context.use_prog,
+                               context.online,
+                               asset_index_hash()
+                               if context.convert_from == AUTODETECT else '')
+        cached = result_cache.lookup(key, save_path)
+    except OSError:
+        # Unreadable world (let run_conversion() explain) or broken cache
+        return run_conversion(open_path, save_path, context)
+
+    if cached is not None:
+        context.convert_from, cached_warnings = cached
+        context.warnings = _unmark_paths(cached_warnings, open_path,
+                                         save_path)
+        context.stats['result cache hits'] += 1
+        return context.warnings
+
+    result = run_conversion(open_path, save_path, context)
+    context.stats['result cache misses'] += 1
+    if not context.failed:
+        try:
+            result_cache.store(key, save_path, context.convert_from,
+                               _mark_paths(result, open_path, save_path))
+        except OSError:
+            # Not being able to cache it doesn't make the conversion fail
+            pass
+    return result
@@ -0,0 +1,281 @@
+'''
+Object and tile databases, plus lookup tables built from them.
+'''
+
+from typing import *
+
+from .constants import DELUXE, REMAKE
+
+# OBJECT DATABASE
+# Format:
+# (name, compatibility, deluxe_id, legacy_id)
+# id of -1 means the tile doesn't exist in that version.
+#
+# compatibility is a binary number with bits in format <dlrci>, where:
+# - i for InfernoPlus (1.0.0 - 2.1.0),
+#   last common ancestor of Deluxe + all others
+# - c for Classic (by Igor & Cyuubi; 2.1.1 - 3.7.0),
+#   last common ancestor of Remake and Legacy
+# - r for Remake (by GoNow; no version numbers),
+#   new codebase but mostly backwards-compatible with Classic levels
+# - l for Legacy (by Terminal & Casini Loogi; 3.7.1 - 5.2.0)
+# - d for Deluxe (by Terminal & Casini Loogi)
+# EXAMPLES:
+# - 0b11011 means it's compatible with everything but Remake
+# - Semisolid at ID 6 is only compatible with Deluxe (0b10000) because it had a
+#   different ID in Classic, Legacy, and Remake
+ObjDbEntry = Tuple[str, int, int, int]
+OBJ_DATABASE : Tuple[ObjDbEntry, ...] = (
+    ('player',                  0b11111,1,  1),
+
+    ('goombrat',                0b11000,16, 16),
+    ('goomba',                  0b11111,17, 17),
+    ('green koopa troopa',      0b11111,18, 18),
+    ('red koopa troopa',        0b11111,19, 19),
+    ('koopa shell',             0b01000,-1, 20),
+    ('flying fish',             0b11111,21, 21),
+    ('piranha plant',           0b11111,22, 22),
+    ('spiny',                   0b11000,23, 23),
+    ('buzzy beetle',            0b11000,24, 24),
+    ('bowser',                  0b11111,25, 25),
+    ('dry bones',               0b01000,-1, 26),
+
+    ('made-up rabbit enemy',    0b01000,-1, 30),
+    ('boo',                     0b01000,-1, 31),
+    ('rotodisc',                0b01000,-1, 32),
+    ('fire bar',                0b11111,33, 33),
+    ('lava bubble',             0b11111,34, 34),
+    ('bill blaster',            0b11111,35, 35),
+    ('bullet bill',             0b11111,36, 36),
+    ('object spawner',          0b11110,37, 37),
+    ('banzai blaster',          0b01000,-1, 38),
+    ('banzai bill',             0b01000,-1, 39),
+    ('rex',                     0b10000,40, 40),
+    ('cheep cheep',             0b11000,38, 41),
+    ('thwomp',                  0b01000,-1, 42),
+    ('tweeter',                 0b01000,-1, 43),
+    ('icicle',                  0b01000,-1, 44),
+    ('fuzzy',                   0b01000,-1, 45),
+
+    ('hammer bro',              0b11111,49, 49),
+    ('fire bro',                0b11000,50, 50),
+
+    ('mushroom',                0b11111,81, 81),
+    ('fire flower',             0b11111,82, 82),
+    ('1up',                     0b11111,83, 83),
+    ('star',                    0b11111,84, 84),
+    ('axe',                     0b11111,85, 85),
+    ('poison mushroom',         0b11111,86, 86),
+    ('checkpoint',              0b01000,-1, 87),
+
+    ('coin',                    0b11111,97, 97),
+
+    ('gold flower',             0b01000,-1, 100),
+        # in Remake editor but unused in game
+
+    ('door',                    0b01000,-1, 129),
+    ('key',                     0b01000,-1, 130),
+
+    ('platform',                0b11111,145,145),
+    ('bus platform',            0b11111,146,146),
+    ('path platform',           0b01000,-1, 147),
+
+    ('spring',                  0b11111,149,149),
+
+    ('fireball projectile',     0b11111,161,161),
+    ('fire breath projectile',  0b11111,162,162),
+    ('hammer projectile',       0b11111,163,163),
+
+    ('flag',                    0b11111,177,177),
+    ('goalpost',                0b11000,178,178), # from SMW
+
+    ('cheep cheep spawner',     0b01000,-1, 193),
+    ('environment prop',        0b01000,-1, 200),
+
+    ('text',                    0b11111,253,253),
+    ('checkmark',               0b11111,254,254),
+
+    # Deluxe only:
+    ('blooper',                 0b10000,39, -1),
+    ('leaf',                    0b10000,87, -1),
+    ('hammer suit',             0b10000,88, -1),
+)
+UNKNOWN_OBJ = ('UNKNOWN', 0b00000, -1, -1)
+    # generic entry for unknown object, e.g. if an invalid ID is removed
+
+# TILE DATABASE
+# Format: (tile_name, version_support, deluxe_id, legacy_id, remake_id,
+#           (fallback1, fallback2, ...))
+# id of -1 means the tile doesn't exist in that version.
+# Fallback can be 0 (air), 1 (solid), or a valid tile_name.
+# If possible, make the last fallback supported in all versions.
+# If a version doesn't support any fallback, default to air.
+TileDbEntry = Tuple[str, int, int, int, int, tuple]
+TILE_DATABASE : Tuple[TileDbEntry, ...] = (
+    # The program expects index 0 to be Air and index 1 to be Solid Standard.
+    # All other indices do not have a guaranteed definition.
+    ('air', 0b11111, 0, 0, 0, (0,)),
+    ('solid standard', 0b11111, 1, 1, 1, (0,)),
+
+    # Supported in all versions
+    ('solid bumpable', 0b11111, 2, 2, 2, (0,)),
+    ('solid breakable', 0b11111, 3, 3, 3, (0,)),
+    ('item block', 0b11111, 17, 17, 17, (0,)),
+    ('coin block', 0b11111, 18, 18, 18, (0,)),
+    ('coin block multi', 0b11111, 19, 19, 19, (0,)),
+    ('item block invisible', 0b11111, 21, 21, 21, (0,)),
+    ('coin block invisible', 0b11111, 22, 22, 22, (0,)),
+    ('vine block', 0b11111, 24, 24, 24, (0,)),
+    ('warp tile', 0b11111, 81, 81, 81, (0,)),
+    ('warp pipe down slow', 0b11111, 82, 82, 82, (0,)),
+    ('warp pipe right slow', 0b11111, 83, 83, 83, (0,)),
+    ('warp pipe down fast', 0b11111, 84, 84, 84, (0,)),
+    ('warp pipe right fast', 0b11111, 85, 85, 85, (0,)),
+    ('level end warp', 0b11111, 86, 86, 86, (0,)),
+    ('flagpole', 0b11111, 160, 160, 160, (0,)),
+    ('vine', 0b11111, 165, 165, 165, (0,)),
+    ('vote block', 0b11111, 240, 240, 240, (0,)),
+
+    # Added in Cyuubi builds (common ancestor of Remake and Legacy)
+    # (sorted by Legacy ID)
+    ('solid damage', 0b11110, 4, 4, 4, (1,)),
+    ('semisolid', 0b11110, 6, 5, 5, (1,)),
+    ('semisolid weak', 0b01110, -1, 6, 6, (0,)),
+    ('water surface', 0b01110, -1, 8, 8, ('water', 0,)), # pushes you down
+    ('water current', 0b01110, -1, 9, 9, ('water', 0,)), # pushes you left/right
+    ('water', 0b11110, 7, 7, 7, (0,)),
+    ('item block infinite', 0b11110, 25, 25, 25, (0,)),
+
+    # Added in Remake (sorted by Remake ID)
+    ('solid ice', 0b11100, 10, 10, 10, (1,)),
+    ('note block', 0b11100, 11, 11, 11, (1,)),
+        # ^ called "pop block" in Remake but works the same
+    ('conveyor', 0b00100, -1, -1, 12, (1,)),
+        # ^ in Deluxe but as 2 different tiles
+
+    # Added in Legacy 4.x (sorted by Legacy ID)
+    ('item note block', 0b11000, 12, 12, -1, ('note block', 'item block',)),
+    ('ice -> tile', 0b01000, -1, 13, -1, ('ice -> object', 'solid ice', 1,)),
+    ('flip block', 0b11000, 8, 14, -1, ('solid breakable',)),
+    ('air damage', 0b11000, 5, 15, -1, ('solid damage', 0,)),
+    ('ice -> object', 0b11000, 13, 16, -1, ('solid ice', 1,)),
+    ('item block progressive', 0b11000, 20, 20, -1, ('item block',)),
+    ('semisolid ice', 0b01000, -1, 23, -1, ('semisolid', 1,)),
+    ('item block invisible progressive', 0b11000, 27, 26, -1,
+        ('item block invisible',)),
+    ('scroll lock x', 0b11000, 30, 30, -1, (0,)),
+    ('scroll unlock x', 0b11000, 31, 31, -1, (0,)),
+    ('checkpoint', 0b01000, -1, 40, -1, (0,)),
+    ('warp pipe single slow', 0b11000, 93, 87, -1, (1,)),
+    ('warp pipe single fast', 0b11000, 94, 88, -1, (1,)),
+    ('warp pipe left slow', 0b11000, 89, 89, -1, (1,)),
+    ('warp pipe left fast', 0b11000, 90, 90, -1, (1,)),
+    ('warp pipe up slow', 0b11000, 91, 91, -1, (1,)),
+    ('warp pipe up fast', 0b11000, 92, 92, -1, (1,)),
+    ('flagpole level end warp', 0b01000, -1, 161, -1, ('level end warp',)),
+
+    # ONLY in Deluxe (sorted by Deluxe ID)
+    ('conveyor left', 0b10000, 14, -1, -1, ('conveyor', 1,)),
+    ('conveyor right', 0b10000, 15, -1, -1, ('conveyor', 1,)),
+    ('item block regen', 0b10000, 26, -1, -1,
+        ('item block infinite', 'item block',)),
+    ('warp tile relative', 0b10000, 80, -1, -1, (0,)),
+        # ^ not compatible with td32
+    ('warp tile random', 0b10000, 87, -1, -1, (0,)),
+    ('message block', 0b10000, 241, -1, -1, (1,)),
+    ('sound block', 0b10000, 239, -1, -1, (0,)),
+
+    # Added in Legacy 5.x and later (sorted by Legacy ID)
+    ('half tile bumpable', 0b01000, -1, 27, -1, ('solid bumpable',)),
+    ('half tile solid', 0b01000, -1, 28, -1, (1,)),
+    ('half tile semisolid', 0b01000, -1, 29, -1, ('semisolid', 1,)),
+    ('scroll lock y', 0b01000, -1, 32, -1, (0,)),
+    ('scroll unlock y', 0b01000, -1, 33, -1, (0,)),
+    ('scroll lock x/y', 0b01000, -1, 34, -1, (0,)),
+    ('scroll unlock x/y', 0b01000, -1, 35, -1, (0,)),
+    ('player barrier', 0b11000, 9, 36, -1, (1,)),
+    ('enemy barrier', 0b01000, -1, 37, -1, (0,)),
+)
+
+# Build lookups for obj database based on L/D tile IDs
+# KEY: the object's ID in L/D
+# VALUE: the tuple index of the object's database entry
+# Loading this from a file would be faster but also less secure
+deluxe_obj_lookup : Dict[int, int] = {}
+for i_index, i_item in enumerate(OBJ_DATABASE):
+    obj_id = i_item[2]
+    if obj_id >= 0: # negative ID = obj doesn't exist in this version
+        deluxe_obj_lookup[obj_id] = i_index
+legacy_obj_lookup : Dict[int, int] = {}
+for i_index, i_item in enumerate(OBJ_DATABASE):
+    obj_id = i_item[3]
+    if obj_id >= 0: # negative ID = obj doesn't exist in this version
+        legacy_obj_lookup[obj_id] = i_index
+# Unlike tile lookups, there's no remake ID because that's the same as legacy
+
+# Build lookups for tile database based on R/L/D tile IDs
+# KEY: the tile's ID in R/L/D
+# VALUE: the tuple index of the tile's database entry
+# Loading this from a file would be faster but also less secure
+deluxe_tile_lookup : Dict[int, int] = {}
+for i_index, i_item in enumerate(TILE_DATABASE):
+    tile_id = i_item[2]
+    if tile_id >= 0: # negative ID = tile doesn't exist in this version
+        deluxe_tile_lookup[tile_id] = i_index
+legacy_tile_lookup : Dict[int, int] = {}
+for i_index, i_item in enumerate(TILE_DATABASE):
+    tile_id = i_item[3]
+    if tile_id >= 0: # negative ID = tile doesn't exist in this version
+        legacy_tile_lookup[tile_id] = i_index
+remake_tile_lookup : Dict[int, int] = {}
+for i_index, i_item in enumerate(TILE_DATABASE):
+    tile_id = i_item[4]
+    if tile_id >= 0:
+        remake_tile_lookup[tile_id] = i_index
+
+def get_obj_by_name(name:str) -> Optional[Tuple[str, int, int, int]]:
+    '''
+    Given an obj's standard string name as it appears in the above database,
+    return that obj's database entry.
+    '''
+    for i in OBJ_DATABASE:
+        if i[0] == name:
+            return i
+    # If name doesn't exist in database, return None
+    return None
+
+def get_obj_id_for_version(obj:Tuple[str, int, int, int],
+                           convert_to:int) -> int:
+    '''
+    Given an obj database entry, return the correct obj ID int for the game
+    version convert_to
+    '''
+    if convert_to == DELUXE:
+        new_id = obj[2]
+    else: # legacy/remake/classic/inferno
+        new_id = obj[3]
+    return new_id
+
+def get_tile_by_name(name:str) -> TileDbEntry:
+    '''
+    Given a tile's standard string name as it appears in the above database,
+    return that tile's database entry.
+    '''
+    for i in TILE_DATABASE:
+        if i[0] == name:
+            return i
+    # If name doesn't exist in database, return air
+    return TILE_DATABASE[0]
+
+def get_tile_id_for_version(tile:TileDbEntry, convert_to:int) -> int:
+    '''
+    Given a tile database entry, return the correct tile data int for the game
+    version convert_to
+    '''
+    if convert_to == DELUXE:
+        new_id = tile[2]
+    elif convert_to == REMAKE:
+        new_id = tile[4]
+    else: # legacy/classic/inferno
+        new_id = tile[3]
+    return new_id
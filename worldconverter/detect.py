@@ -0,0 +1,177 @@
+'''
+Auto-detection of which game version a world was made for.
+'''
+
+import os
+import re
+import time
+from typing import *
+
+from .constants import *
+from .assets import find_in_asset_index, is_abs_path
+from .probes import MapSheetProbe
+from .profiling import Profile
+from .reader import peek_zone
+from .tilegrid import pack_td32
+
+# Remake conveyors are tile ID 12 with a speed (112-143) in the extra data.
+# In Legacy, ID 12 = Item Note Block, so we also make sure Extra Data has a
+# reasonable speed value that ISN'T a valid object ID.
+# Stored as tile_def*256 + extra. (In a td32 tile, the definition is bits
+# 16-23 and the extra data is bits 24-31, so it's the other way around.)
+REMAKE_CONVEYORS = range(12*256 + 112, 12*256 + 144)
+# The same thing in packed td32 tiles (see pack_td32()): the definition
+# byte, then the extra data byte. Only matches that start at the definition
+# byte of a tile (i.e. offset 2 of 4) count.
+_PACKED_CONVEYOR = re.compile(rb'\x0c[\x70-\x8f]')
+
+def is_remake_conveyor(tile:Any) -> bool:
+    '''
+    Check if a tile (of any format) is a Remake conveyor.
+    '''
+    if isinstance(tile, int):
+        # td32: no need to decode the whole tile, just read the definition
+        # and extra data
+        return ((tile >> 16) & 0xff) * 256 + ((tile >> 24) & 0xff) \
+                in REMAKE_CONVEYORS
+    if isinstance(tile, list):
+        # Same rules as extract_tile(), but any tile it can't read is
+        # definitely not a conveyor
+        try:
+            return int(tile[3]) == 12 and 112 <= int(tile[4]) < 144
+        except Exception:
+            return False
+    return False
+
+def has_remake_conveyor(grid:list) -> bool:
+    '''
+    Check if a zone or layer's tiles have any Remake conveyors.
+    '''
+    packed = pack_td32(grid)
+    if packed is None:
+        # Unusual tile data, so go one tile at a time
+        return any(is_remake_conveyor(tile) for row in grid for tile in row)
+    # Only td32 tiles, so search all of them at once
+    return any(match.start() % 4 == 2
+               for match in _PACKED_CONVEYOR.finditer(packed))
+
+def has_remake_features(content:dict, has_layers:bool) -> bool:
+    '''
+    Look through the whole world, zone by zone, for features that only exist
+    in Remake. Stops as soon as it finds one.
+    Zones that haven't been parsed yet (see reader.py) stay parsed for the
+    conversion, as far as there's room.
+    '''
+    for level in content['world']: # Loop thru lvls
+        zones = level['zone']
+        for zone_i in range(len(zones)): # Loop thru zones
+            zone = peek_zone(zones, zone_i)
+            # Remake-exclusive feature check #1:
+            # Fire bars have 4 params in Remake, and 3 in Legacy
+            for obj in zone['obj']:
+                if obj['type'] == 33 and len(obj['param']) == 4:
+                    return True
+
+            # Remake-exclusive feature check #2: conveyors
+            if has_layers:
+                grids = [layer['data'] for layer in zone['layers']]
+            else:
+                grids = [zone['data']]
+            for grid in grids:
+                if has_remake_conveyor(grid):
+                    return True
+    return False
+
+def probe_map_sheet(src:str, open_path:str) -> Tuple[int, str]:
+    '''
+    Check the Legacy and Remake asset servers for a relative map sheet path,
+    and wait for the answer. (See probes.py.)
+    Returns (version, warnings), where version is AUTODETECT if the map sheet
+    couldn't be found (or we're not online).
+    '''
+    return MapSheetProbe(src, open_path).result()
+
+def detect_version(content:dict, has_layers:bool, open_path:str,
+                   online:bool=False, profile:Optional[Profile]=None) \
+                   -> Tuple[int, str]:
+    '''
+    Figure out which game version a world is from.
+    The map sheet is looked up in the bundled asset index. Only if it isn't
+    there, and online is set, do we check the asset servers themselves.
+    Returns (version, warnings) where warnings is a string of any converter
+    warnings about the detection.
+    If profile is set, the time spent waiting for the asset servers is
+    recorded in it as the network probe phase.
+    '''
+    warnings = ''
+
+    # Test for Deluxe format by checking if tiles are lists
+    first_zone = peek_zone(content['world'][0]['zone'], 0)
+    if has_layers:
+        dx_check = isinstance(first_zone['layers'][0]['data'][0][0], list)
+    else:
+        dx_check = isinstance(first_zone['data'][0][0], list)
+    if dx_check:
+        return (DELUXE, warnings)
+
+    # Remake-exclusive World attributes
+    if 'vertical' in content or 'autoMove' in content:
+        return (REMAKE, warnings)
+
+    # Legacy-exclusive World attributes
+    if 'group' in content or 'longname' in content:
+        return (LEGACY, warnings)
+
+    detected = AUTODETECT
+    probe = None
+
+    # Try to detect version based on which version has the map sheet
+    for item in content['resource']:
+        # Only do this if it's a relative path, because if it's already a
+        # full URL, then we can't tell what version it's from
+        if item['id'] != 'map' or is_abs_path(item['src']):
+            continue
+
+        # First check the bundled list of known map sheets
+        detected = find_in_asset_index(item['src'])
+        if detected != AUTODETECT:
+            break
+        if not online:
+            warnings += f'The map sheet {item["src"]} isn’t in the asset \
+index, so it couldn’t be used to detect the world version.\n'
+            break
+
+        # Otherwise, start checking the asset servers (if we have internet).
+        # That happens in the background while we look for Remake features.
+        probe = MapSheetProbe(item['src'], open_path)
+        # Since we've found the map sheet, we don't need to
+        # keep looping anymore
+        break
+
+    # Remake-only features override anything else we found, so they're only
+    # worth looking for if we don't already think it's a Remake world.
+    # This scan stops at the first Remake feature it finds.
+    if detected != REMAKE and has_remake_features(content, has_layers):
+        detected = REMAKE
+        # No need to wait for the asset servers anymore
+        if probe is not None:
+            probe.cancel()
+    elif probe is not None:
+        wait_start = time.perf_counter()
+        detected, probe_warnings = probe.result()
+        warnings += probe_warnings
+        if profile is not None:
+            profile.add('network probe', time.perf_counter() - wait_start, 1)
+
+    # Treat everything else as Legacy because it has more tile options
+    # and it's harder to detect from file contents
+    # This could make conveyors get misconverted, but they only show
+    # up in 2 known worlds (Royale City and Stiz 1)
+    if detected == AUTODETECT:
+        warnings += 'Failed to definitively detect world version; \
+defaulting to Legacy. Please check to make sure this is correct.\n'
+        detected = LEGACY
+    else:
+        warnings += f'World version detected as {game_ver_str(detected)}\n'
+
+    return (detected, warnings)
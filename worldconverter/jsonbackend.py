@@ -0,0 +1,119 @@
+'''
+Faster JSON libraries, if any are installed.
+
+Reading and writing JSON is most of the work for big worlds, and orjson and
+ujson both do it several times faster than the json module. Neither of them
+agrees with the json module about everything, though: both write floats and
+some strings differently. So the faster library only writes what it's known
+to handle the same way, and anything it can't read falls back on the json
+module. Converted worlds come out byte for byte the same whichever library
+is used, with two exceptions for worlds no editor makes: ujson reads a few
+kinds of broken JSON that the json module rejects, like numbers with leading
+zeros, so a world like that gets converted instead of failing. And orjson
+reads ints that don't fit in 64 bits as floats. (Checking for those would
+mean going through every byte of every world a second time.)
+
+Neither library is required. By default, orjson is used if it's installed,
+then ujson, then just the json module (see set_json_backend()).
+'''
+
+import json
+from typing import *
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Names accepted by set_json_backend()
+JSON_BACKENDS = ('auto', 'orjson', 'ujson', 'json')
+
+# What the JSON of a list of lists of ints (like a zone's tile data) is made
+# of. Every library writes those exactly the same way.
+_INT_ARRAY_BYTES = b'0123456789-,[]'
+
+# Errors the faster libraries raise for JSON they can't (or won't) read
+_LOAD_ERRORS = (ValueError, OverflowError, RecursionError)
+
+_backend = 'json'
+
+def set_json_backend(name:str='auto') -> str:
+    '''
+    Pick the JSON library to use for the rest of this process: one of
+    JSON_BACKENDS, where 'auto' is the fastest one that's installed.
+    Returns the name of the library picked.
+    Raises ValueError if the name isn't in JSON_BACKENDS, or ImportError if
+    that library isn't installed.
+    '''
+    global _backend
+    if name not in JSON_BACKENDS:
+        raise ValueError(f'Unknown JSON backend: {name}')
+    if name == 'auto':
+        if orjson is not None:
+            name = 'orjson'
+        elif ujson is not None:
+            name = 'ujson'
+        else:
+            name = 'json'
+    elif name == 'orjson' and orjson is None or \
+            name == 'ujson' and ujson is None:
+        raise ImportError(f'{name} is not installed')
+    _backend = name
+    return name
+
+def get_json_backend() -> str:
+    '''
+    Return the name of the JSON library in use.
+    '''
+    return _backend
+
+def loads(data:bytes) -> Any:
+    '''
+    Same as json.loads(data.decode('utf-8')), including the errors it raises
+    (UnicodeDecodeError or json.JSONDecodeError), but faster.
+    Like the json module, this doesn't skip byte order marks, so the caller
+    has to.
+    '''
+    if _backend == 'orjson':
+        try:
+            return orjson.loads(data)
+        except _LOAD_ERRORS:
+            pass
+    elif _backend == 'ujson':
+        try:
+            result = ujson.loads(data)
+        except _LOAD_ERRORS:
+            pass
+        else:
+            return result
+    # Let the json module decide what's wrong with it (if anything)
+    return json.loads(data.decode('utf-8'))
+
+def dumps_int_array(obj:Any) -> Optional[str]:
+    '''
+    Encode a list of ints (or of lists of ints...), like a zone's tile data,
+    the same way json.dumps(obj, separators=(',',':')) would, but faster.
+    Returns None if there's no faster library, or obj turns out to have
+    anything else in it. The caller should use the json module for those.
+    '''
+    try:
+        if _backend == 'orjson':
+            data = orjson.dumps(obj)
+        elif _backend == 'ujson':
+            data = ujson.dumps(obj).encode('utf-8')
+        else:
+            return None
+    except (TypeError, ValueError, OverflowError, RecursionError):
+        # Something it doesn't know how to encode
+        return None
+    if data.translate(None, _INT_ARRAY_BYTES):
+        # Floats, strings, bools... the json module might write them
+        # differently
+        return None
+    return data.decode('ascii')
+
+set_json_backend()
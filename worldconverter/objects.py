@@ -0,0 +1,134 @@
+'''
+Object translation: which objects survive a conversion, and how their params
+change.
+
+Like tiles (see translation.py), what happens to an object only depends on
+its type and the conversion setting. So for each (convert_from, convert_to)
+setting, every object type is looked up in the database once, and each
+object in a world after that is a single dict lookup. Objects whose params
+work differently in the target version get a transformer function, which is
+registered for a (object database index, convert_from, convert_to) key.
+'''
+
+from typing import *
+
+from .constants import *
+from .database import *
+
+# Changes an object's params (in place) for the target version
+ObjTransformer = Callable[[dict], None]
+
+# (index in OBJ_DATABASE, convert_from, convert_to) -> transformer
+OBJ_TRANSFORMERS : Dict[Tuple[int, int, int], ObjTransformer] = {}
+
+# Compiled object tables, one per (convert_from, convert_to) setting
+_obj_tables : Dict[Tuple[int, int],
+                   Dict[int, Tuple[int, Optional[ObjTransformer]]]] = {}
+
+def add_obj_transformer(name:str, convert_from:int, convert_to:int,
+                        transformer:ObjTransformer):
+    '''
+    Register a function that changes the params of an object (by its name in
+    OBJ_DATABASE) when converting from convert_from to convert_to.
+    '''
+    obj_index = OBJ_DATABASE.index(get_obj_by_name(name))
+    OBJ_TRANSFORMERS[(obj_index, convert_from, convert_to)] = transformer
+    # Tables that are already built don't know about it yet
+    _obj_tables.clear()
+
+def _int_param(params:list, i:int, default:int) -> int:
+    # The game doesn't care if params are int or str, but Python does
+    try:
+        return int(params[i])
+    except (ValueError, TypeError):
+        # Default value if a param is invalid or blank
+        return default
+
+def remake_to_legacy_fire_bar(obj:dict):
+    '''
+    Remake fire bar params are [phase, length, clockwise, speed_mult].
+    Legacy's are [phase, length, rate], where the default rate is 23 and
+    lower is faster.
+    '''
+    old_param = obj['param']
+    if len(old_param) == 2: # clockwise
+        old_param.append(0)
+        # fallthrough
+    if len(old_param) == 3: # speed_mult
+        old_param.append(1)
+    # len(old_param) is now at least 4
+
+    phase = _int_param(old_param, 0, 0)
+    length = _int_param(old_param, 1, 6)
+    clockwise = _int_param(old_param, 2, 0)
+    try:
+        speed_mult = float(old_param[3])
+    except (ValueError, TypeError):
+        # Default value if a param is invalid or blank
+        speed_mult = 1.0
+
+    cw = -1 if clockwise else 1
+    obj['param'] = [phase, length, 23//speed_mult*cw]
+
+def legacy_to_remake_fire_bar(obj:dict):
+    '''
+    The opposite of remake_to_legacy_fire_bar().
+    '''
+    old_param = obj['param']
+    if len(old_param) == 2: # rate
+        old_param.append(23)
+    # len(old_param) is now at least 3
+
+    phase = _int_param(old_param, 0, 0)
+    length = _int_param(old_param, 1, 6)
+    rate = _int_param(old_param, 2, 23)
+
+    obj['param'] = [phase, length, 0, 23/rate] # decimals allowed here
+    # Don't bother setting "clockwise" param
+    # because negating speed_mult does the same thing
+
+def flip_cheep_cheep_color(obj:dict):
+    '''
+    In both Legacy and Deluxe, the first cheep cheep param is the color
+    variant, but in Legacy, 0=red and 1=gray, while in Deluxe, 0=green and
+    1=red. So we need to flip these.
+    '''
+    old_param = obj['param']
+    if len(old_param) >= 1:
+        try:
+            # Flip 0 to 1, and 1 to 0
+            old_param[0] = int(not bool(int(old_param[0])))
+        except (ValueError, TypeError):
+            # Default value if a param is invalid or blank
+            old_param[0] = 0 # variant
+
+# Remake<->Legacy fire bar conversion
+# Deluxe only has 2 params (phase & length), like Classic
+add_obj_transformer('fire bar', REMAKE, LEGACY, remake_to_legacy_fire_bar)
+add_obj_transformer('fire bar', LEGACY, REMAKE, legacy_to_remake_fire_bar)
+# Deluxe<->Legacy cheep cheep conversion
+add_obj_transformer('cheep cheep', DELUXE, LEGACY, flip_cheep_cheep_color)
+add_obj_transformer('cheep cheep', LEGACY, DELUXE, flip_cheep_cheep_color)
+
+# Index of the flag object in OBJ_DATABASE
+FLAG_INDEX = OBJ_DATABASE.index(get_obj_by_name('flag'))
+
+def get_obj_table(convert_from:int, convert_to:int) \
+                  -> Dict[int, Tuple[int, Optional[ObjTransformer]]]:
+    '''
+    Return {object ID in convert_from: (index in OBJ_DATABASE, transformer
+    or None)} for every object that's supported in convert_to. Objects that
+    aren't in the table (including unknown IDs) should be removed.
+    '''
+    key = (convert_from, convert_to)
+    table = _obj_tables.get(key)
+    if table is None:
+        # Legacy IDs are used for every version except Deluxe
+        lookup = deluxe_obj_lookup if convert_from == DELUXE \
+                else legacy_obj_lookup
+        table = {obj_id: (obj_index, OBJ_TRANSFORMERS.get(
+                          (obj_index, convert_from, convert_to)))
+                 for obj_id, obj_index in lookup.items()
+                 if OBJ_DATABASE[obj_index][1] & convert_to}
+        _obj_tables[key] = table
+    return table
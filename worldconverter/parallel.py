@@ -0,0 +1,53 @@
+'''
+Converting the zones of one world in parallel.
+
+Folder conversions already spread files across processes (see cli.py), but
+that doesn't help when one world is huge. Apart from a few world-level
+settings that convert() works out before any zone is touched (the version,
+whether the world is vertical...), zones don't depend on each other, so they
+can be converted in a pool of processes instead.
+
+Zones of big files are sent to the workers as the bytes they take up in
+the file (see reader.py), so they're only parsed once, by the worker. Each
+worker sends its zone back already encoded as JSON, so the only work left
+for the main process is writing the zones to the file in the right order.
+'''
+
+from collections import deque
+from typing import *
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+def ordered_map(func:Callable, items:Iterable, jobs:int,
+                window:Optional[int]=None,
+                initializer:Optional[Callable]=None,
+                initargs:tuple=()) -> Iterator:
+    '''
+    Like map(func, items), but calls func in a pool of jobs processes.
+    Results come out in the same order as items. Unlike
+    ProcessPoolExecutor.map(), only up to window items (default: 2 per
+    process) are sent to the pool at once, so items can be generated as
+    they're needed instead of all being kept in memory.
+    Each process calls initializer(*initargs) first, same as in
+    ProcessPoolExecutor, e.g. to apply this process's settings to it.
+    func and the items have to be picklable.
+    '''
+    # Most conversions never get here, so don't load this until they do
+    from concurrent.futures import ProcessPoolExecutor
+    window = window or 2 * jobs
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer,
+                             initargs=initargs) as pool:
+        pending : Deque['Future'] = deque()
+        try:
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # If we stopped early (e.g. an error), don't bother finishing
+            # the rest
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,285 @@
+'''
+Checking the asset servers for map sheets, in the background.
+
+Every URL check runs on a small shared pool of threads with a strict timeout,
+so a slow or dead server can't hang a conversion. The Legacy and Remake
+checks for a map sheet are started at the same time, and the converter keeps
+working on the world (e.g. looking for Remake-only features) while they're in
+flight. As soon as one answer settles the question, the other check is
+cancelled (unless another world is still waiting for it too).
+'''
+
+import os
+import threading
+import time
+from typing import *
+
+from .constants import *
+from .assets import absolute_path, cached_web_file_exists, web_file_exists
+from .cache import get_probe_cache
+
+if TYPE_CHECKING:
+    # concurrent.futures is only loaded once something is actually checked
+    # (see _submit()), since most conversions never go online
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+# Max number of URLs being checked at once (per process)
+PROBE_WORKERS = 8
+# Max seconds to wait for a server before giving up on it
+PROBE_TIMEOUT = 5.0
+# How long to trust the result of the internet connection test
+CONNECTION_TTL = 60.0
+
+_pool : Optional['ThreadPoolExecutor'] = None
+# URL -> check that's currently running, so a URL is never checked twice at
+# the same time (e.g. by two worlds that use the same map sheet)
+_in_flight : Dict[str, 'Future'] = {}
+# (time started, result of the internet connection test)
+_connection : Optional[Tuple[float, 'Future']] = None
+# Check -> number of MapSheetProbes waiting for it. Checks are shared, so one
+# only gets cancelled once none of them want it anymore.
+_waiting : Dict['Future', int] = {}
+# Reentrant, because a done callback runs right away (still holding it) if
+# the future is already done
+_lock = threading.RLock()
+
+def configure_probes(workers:Optional[int]=None,
+                     timeout:Optional[float]=None):
+    '''
+    Change how many URLs can be checked at once and how long to wait for
+    each one, for the rest of this process.
+    '''
+    global PROBE_WORKERS, PROBE_TIMEOUT, _pool
+    with _lock:
+        if workers is not None:
+            PROBE_WORKERS = max(1, workers)
+            if _pool is not None:
+                # Checks that are already running get to finish
+                _pool.shutdown(wait=False)
+                _pool = None
+        if timeout is not None:
+            PROBE_TIMEOUT = timeout
+
+def _submit(func:Callable, *args) -> 'Future':
+    # Only call this with _lock held
+    global _pool
+    if _pool is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS,
+                                   thread_name_prefix='probe')
+    return _pool.submit(func, *args)
+
+def _done(result:Any) -> 'Future':
+    from concurrent.futures import Future
+    future = Future()
+    future.set_result(result)
+    return future
+
+def _hold(start:Callable[[], 'Future']) -> 'Future':
+    # Start a check (or find the one that's already running) with start(),
+    # and note down that one more probe is waiting for it
+    while True:
+        future = start()
+        with _lock:
+            if future.cancelled():
+                # The last probe waiting for it just let go, so start()
+                # will start a new one
+                continue
+            if future.done():
+                return future
+            if future not in _waiting:
+                future.add_done_callback(_forget_waiting)
+            _waiting[future] = _waiting.get(future, 0) + 1
+            return future
+
+def _release(future:'Future'):
+    # Note down that a probe isn't waiting for a check anymore, and cancel
+    # it if nothing else is
+    with _lock:
+        count = _waiting.get(future, 0) - 1
+        if count > 0:
+            _waiting[future] = count
+            return
+        _waiting.pop(future, None)
+        future.cancel()
+
+def _forget_waiting(future:'Future'):
+    with _lock:
+        _waiting.pop(future, None)
+
+def _check_connection():
+    # Basic internet connection test. If this causes an error, there's a 99%
+    # chance you're not connected to the internet.
+    import urllib.request # see web_file_exists()
+    with urllib.request.urlopen('http://google.com', timeout=PROBE_TIMEOUT):
+        return True
+
+def connection_check() -> 'Future':
+    '''
+    Start the internet connection test, or reuse the last one if it's recent
+    and passed. The future raises an exception if we're offline.
+    '''
+    global _connection
+    with _lock:
+        if _connection is not None:
+            started, future = _connection
+            failed = future.done() and (future.cancelled() or
+                                        future.exception() is not None)
+            if time.monotonic() - started < CONNECTION_TTL and not failed:
+                return future
+        future = _submit(_check_connection)
+        _connection = (time.monotonic(), future)
+        return future
+
+def probe_url(url:str) -> 'Future':
+    '''
+    Start checking if a file exists on the web. Returns a future for the
+    result of web_file_exists(), which is already done if the result is in
+    the probe cache.
+    The result is NOT saved in the probe cache, because a None result could
+    just mean we're offline -- see MapSheetProbe for that.
+    '''
+    hit, result = cached_web_file_exists(url)
+    if hit:
+        return _done(result)
+    with _lock:
+        future = _in_flight.get(url)
+        if future is None or future.cancelled():
+            future = _submit(web_file_exists, url, PROBE_TIMEOUT)
+            _in_flight[url] = future
+            def forget(future:'Future', url:str=url):
+                with _lock:
+                    if _in_flight.get(url) is future:
+                        del _in_flight[url]
+            future.add_done_callback(forget)
+        return future
+
+class MapSheetProbe:
+    '''
+    Checks the Legacy and Remake asset servers for a relative map sheet path.
+    Both checks start as soon as this is created. Call result() to wait for
+    the answer, or cancel() if it's not needed anymore.
+    '''
+    def __init__(self, src:str, open_path:str):
+        self.src = src
+        self.open_path = open_path
+        self.urls = {LEGACY: absolute_path(LEGACY, src),
+                     REMAKE: absolute_path(REMAKE, src)}
+        self.futures = {LEGACY: _hold(lambda: probe_url(self.urls[LEGACY]))}
+        legacy = self.futures[LEGACY]
+        if legacy.done() and legacy.result() is not False:
+            # Cached answer from Legacy, so Remake doesn't matter
+            self.futures[REMAKE] = _done(None)
+        else:
+            self.futures[REMAKE] = _hold(lambda: probe_url(self.urls[REMAKE]))
+        self.connection = None
+        if not all(i.done() for i in self.futures.values()):
+            # Only go online for the connection test if we're going online
+            # for the map sheet anyway
+            self.connection = _hold(connection_check)
+        self.deadline = time.monotonic() + PROBE_TIMEOUT
+        # Checks this probe is still waiting for
+        self._held = list(self.futures.values())
+        if self.connection is not None:
+            self._held.append(self.connection)
+
+    def cancel(self):
+        '''
+        Stop any checks that haven't started yet, unless another probe is
+        waiting for them too. (Ones that already started can't be stopped,
+        but they'll give up after PROBE_TIMEOUT seconds.)
+        '''
+        held, self._held = self._held, []
+        for future in held:
+            _release(future)
+
+    def _wait(self, future:'Future') -> Any:
+        # Wait for a future, but not past the deadline. Raises the same
+        # exception the future did, or TimeoutError.
+        return future.result(max(0, self.deadline - time.monotonic()))
+
+    def _online(self) -> bool:
+        from concurrent.futures import CancelledError
+        if self.connection is None:
+            return True
+        try:
+            self._wait(self.connection)
+            return True
+        except CancelledError:
+            # Nothing to do with the internet (see _check())
+            return True
+        except Exception:
+            return False
+
+    def _check(self, version:int) -> Tuple[str, Optional[bool]]:
+        # Returns ('ok', result), ('timeout', None) or ('offline', None)
+        from concurrent.futures import CancelledError
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        try:
+            result = self._wait(self.futures[version])
+        except CancelledError:
+            # Only if the check got cancelled anyway, e.g. because the pool
+            # was shut down (see configure_probes()). Treat it like a timeout.
+            return ('timeout', None)
+        except (FutureTimeoutError, OSError):
+            # socket.timeout (from web_file_exists) is an OSError.
+            # Don't cache anything -- the server might just be slow today.
+            if not self._online():
+                return ('offline', None)
+            return ('timeout', None)
+        if result is None:
+            # URLError without an HTTP status: either a bad certificate or no
+            # internet. Only the first one is worth remembering.
+            if not self._online():
+                return ('offline', None)
+        probe_cache = get_probe_cache()
+        if probe_cache is not None:
+            probe_cache.store(self.urls[version], result)
+        return ('ok', result)
+
+    def result(self) -> Tuple[int, str]:
+        '''
+        Wait for the checks to finish.
+        Returns (version, warnings), where version is AUTODETECT if the map
+        sheet couldn't be found (or we're not online).
+        '''
+        try:
+            return self._result()
+        finally:
+            # Whatever's still going isn't needed anymore (by this probe)
+            self.cancel()
+
+    def _result(self) -> Tuple[int, str]:
+        no_internet = 'No internet connection! Version \
+detection will be less accurate.\n'
+        warnings = ''
+
+        # Legacy gets priority, so its answer is the one that settles it
+        status, exists_in_legacy = self._check(LEGACY)
+        if status == 'offline':
+            return (AUTODETECT, no_internet)
+        if exists_in_legacy is True:
+            return (LEGACY, warnings)
+        elif exists_in_legacy is None and status == 'ok':
+            return (LEGACY, 'Security warning on Legacy map image.\n')
+        elif status == 'timeout':
+            warnings += 'Timed out checking the Legacy server for the map \
+sheet.\n'
+
+        # If it's not in Legacy, fall back to Remake URL
+        status, exists_in_remake = self._check(REMAKE)
+        if status == 'offline':
+            return (AUTODETECT, warnings + no_internet)
+        if exists_in_remake is True:
+            return (REMAKE, warnings)
+        elif exists_in_remake is None and status == 'ok':
+            return (REMAKE, warnings +
+                    'Security warning on Remake map image, what a surprise.\n')
+        elif status == 'timeout':
+            warnings += 'Timed out checking the Remake server for the map \
+sheet.\n'
+        # If it's not in Legacy or Remake, give up
+        warnings += \
+f'Couldn’t find the map sheet {self.open_path.split(os.sep)[-1]} in Legacy \
+or Remake. Defaulting to Legacy for the world version.\n'
+        return (AUTODETECT, warnings)
@@ -0,0 +1,96 @@
+'''
+Timing and counting each phase of a conversion.
+
+Pass a Profile to convert() and it gets filled in with how long each phase
+took and how much it worked on (see PHASES), so when a batch slows down you
+can tell whether it's the network, the tiles or the disk. For example:
+
+    profile = Profile(per_zone=True)
+    convert('old.json', 'new.json', convert_to=LEGACY, profile=profile)
+    print(profile.to_dict())
+
+To watch a conversion as it happens, give the Profile a callback. It's
+called every time a phase finishes.
+'''
+
+from typing import *
+
+# Every phase, in the order they happen, and what their items are
+PHASES = (
+    'parse',            # bytes read
+    'autodetect',       # worlds checked (not counting network probe)
+    'network probe',    # map sheets looked up on the asset servers
+    'table build',      # tile translation tables looked up (built the
+                        # first time each conversion setting is used)
+    'resource rewrite', # resource URLs (and other world settings)
+    'tile loop',        # tiles
+    'object loop',      # objects, warps and other zone settings
+    'flag insertion',   # flag objects added
+    'serialize',        # bytes written (not counting converting zones)
+)
+
+# Phases that happen once per zone, so they're in per-zone breakdowns
+ZONE_PHASES = ('tile loop', 'object loop', 'flag insertion')
+
+class Profile:
+    '''
+    Times and counts for each phase of one or more conversions.
+    If per_zone is set, each zone's time in ZONE_PHASES is also recorded
+    separately, in zones.
+    If callback is set, it's called as callback(phase, seconds, items,
+    zone_index) whenever a phase finishes. zone_index is None for phases
+    that aren't per-zone.
+    '''
+    def __init__(self, per_zone:bool=False,
+                 callback:Optional[Callable[[str, float, int,
+                                             Optional[int]], None]]=None):
+        self.per_zone = per_zone
+        self.callback = callback
+        # phase -> [seconds, calls, items]
+        self.phases : Dict[str, list] = {i: [0.0, 0, 0] for i in PHASES}
+        self.zones : List[Dict[str, Any]] = []
+        self.zone_count = 0
+        self.total = 0.0
+
+    def start_zone(self) -> int:
+        '''
+        Call at the start of each zone. Returns the zone's index (counting
+        every zone in the world, in order).
+        '''
+        zone_index = self.zone_count
+        self.zone_count += 1
+        if self.per_zone:
+            self.zones.append({'index': zone_index})
+        return zone_index
+
+    def add(self, phase:str, seconds:float, items:int=0,
+            zone_index:Optional[int]=None):
+        '''
+        Record that phase took seconds and worked on items things.
+        '''
+        totals = self.phases[phase]
+        totals[0] += seconds
+        totals[1] += 1
+        totals[2] += items
+        if zone_index is not None and self.per_zone:
+            zone = self.zones[zone_index]
+            zone[phase] = zone.get(phase, 0.0) + seconds
+            if items:
+                zone[phase + ' items'] = items
+        if self.callback is not None:
+            self.callback(phase, seconds, items, zone_index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        '''
+        Everything recorded so far, in a form that can be saved as JSON.
+        '''
+        result : Dict[str, Any] = {
+            'total': self.total,
+            'phases': {phase: {'seconds': seconds, 'calls': calls,
+                               'items': items}
+                       for phase, (seconds, calls, items)
+                       in self.phases.items()},
+        }
+        if self.per_zone:
+            result['zones'] = self.zones
+        return result
@@ -0,0 +1,357 @@
+'''
+Zone-at-a-time reader for huge world files.
+
+json.load() turns the whole world into Python objects at once, and Python
+lists of ints take up several times more memory than the JSON text they came
+from. So for big files, load_world() only reads the "skeleton" of the world
+(everything except the zones) up front. Each level's zones are left in the
+file as byte ranges, and a zone is only parsed when it's actually used --
+e.g. when the writer converts and saves it (see writer.py). Zones that had
+to be parsed earlier (e.g. to auto-detect the version) are kept for the
+writer, but only up to KEEP_PARSED_SIZE of them; the rest are parsed again.
+Other than that, nothing keeps parsed zones around, so memory use follows
+the biggest zone instead of the whole world. The file itself is
+memory-mapped rather than read in, so it doesn't take up any of Python's
+memory either.
+
+Smaller files are read all at once with read_world_file(), straight into
+one buffer that goes to the JSON parser as is.
+
+Both check the first few bytes of the file before anything else, so
+images, songs and such (which tend to end up in world folders) are turned
+away without reading the rest.
+'''
+
+import codecs
+import json
+import mmap
+import os
+import re
+from collections import abc
+from typing import *
+
+from .jsonbackend import loads
+
+# Tokens that matter for finding where a zone ends, i.e. brackets and
+# strings (which might have brackets inside them). The first group lets
+# rows of tiles (a list of lists of numbers, or just a list of numbers) be
+# skipped over in one go instead of bracket by bracket.
+_TOKEN = re.compile(rb'(\[\s*(?:\[[^\[\]{}"]*\]\s*(?:,\s*)?)*\]'
+                    rb'|\[[^\[\]{}"]*\]'
+                    rb'|"(?:[^"\\]|\\.)*")'
+                    rb'|([\[{])'
+                    rb'|([\]}])')
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"')
+_SCALAR = re.compile(rb'[^\s,\]}]+')
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+
+# How common binary files start: images, sounds, videos and archives.
+# JSON can't start with any of these.
+BINARY_SIGNATURES = (
+    b'\x89PNG\r\n\x1a\n', # PNG
+    b'OggS',                # Ogg (Vorbis/Opus sounds, Theora videos)
+    b'\xff\xd8\xff',        # JPEG
+    b'GIF87a', b'GIF89a',   # GIF
+    b'RIFF',                # WAV, WebP, AVI
+    b'ID3',                 # MP3 (with tags)
+    b'\x1aE\xdf\xa3',       # WebM, MKV
+    b'PK\x03\x04',           # ZIP
+)
+# Enough of the start of a file to check for any of them
+_HEAD_SIZE = 16
+
+# How much of a world (in bytes of JSON) can be kept parsed between
+# LazyZoneList.peek() and the zone's next lookup. Parsed zones take up
+# several times more memory than that.
+KEEP_PARSED_SIZE = 8 * 1024 * 1024
+
+class BinaryFileError(ValueError):
+    '''
+    The file is obviously not a world (e.g. it starts like a PNG).
+    '''
+
+def _check_head(head:bytes, open_path:str):
+    if head.startswith(BINARY_SIGNATURES):
+        raise BinaryFileError(f'Not a JSON file: {open_path}')
+
+def is_binary_file(open_path:str) -> bool:
+    '''
+    Return whether the file starts like a binary file (see
+    BINARY_SIGNATURES). Raises OSError if it can't be read.
+    '''
+    with open(open_path, 'rb') as read_file:
+        return read_file.read(_HEAD_SIZE).startswith(BINARY_SIGNATURES)
+
+def read_world_file(open_path:str) -> bytearray:
+    '''
+    Read a whole world file, minus the byte order mark (if there is one),
+    for jsonbackend.loads(). The file goes straight into one buffer, without
+    being decoded (the parser does that) or copied around.
+    Raises BinaryFileError if the file starts like a binary file.
+    '''
+    with open(open_path, 'rb') as read_file:
+        head = read_file.read(_HEAD_SIZE)
+        _check_head(head, open_path)
+        if head.startswith(codecs.BOM_UTF8):
+            # Skip it, same as the utf-8-sig codec
+            head = head[len(codecs.BOM_UTF8):]
+        size = max(os.fstat(read_file.fileno()).st_size, _HEAD_SIZE)
+        buf = bytearray(size - _HEAD_SIZE + len(head))
+        buf[:len(head)] = head
+        count = len(head) + read_file.readinto(memoryview(buf)[len(head):])
+        if count < len(buf):
+            # It got shorter since we checked
+            del buf[count:]
+        else:
+            # Or longer
+            buf += read_file.read()
+    return buf
+
+class _KeptZones:
+    # Zones parsed by LazyZoneList.peek(), keyed by where they start in the
+    # file. Shared by all the levels of a world.
+    __slots__ = ('zones', 'size')
+
+    def __init__(self):
+        self.zones : Dict[int, Any] = {}
+        self.size = 0
+
+class LazyZoneList(abc.Sequence):
+    '''
+    The zones of one level, still in the world file. Every time a zone is
+    looked up, it's parsed again from the file, so changes to a zone won't
+    stick unless you keep your own reference to it. The only exception is a
+    zone that was just parsed by peek().
+    '''
+    def __init__(self, buf:Union[bytes, mmap.mmap],
+                 spans:List[Tuple[int, int]],
+                 kept:Optional[_KeptZones]=None):
+        self._buf = buf
+        self._spans = spans
+        self._kept = kept if kept is not None else _KeptZones()
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        start, end = self._spans[index]
+        if start in self._kept.zones:
+            # Parsed by peek(), so hand it over instead of parsing it again
+            self._kept.size -= end - start
+            return self._kept.zones.pop(start)
+        return _load(self._buf, start, end)
+
+    def peek(self, index:int) -> Any:
+        '''
+        Look up a zone that's going to be looked up again later (e.g. by
+        the writer). If there's room (see KEEP_PARSED_SIZE), the parsed zone
+        is kept, and the next lookup gets it instead of parsing the zone
+        again. So don't change it, unless the change should stick.
+        '''
+        start, end = self._spans[index]
+        if start in self._kept.zones:
+            return self._kept.zones[start]
+        zone = _load(self._buf, start, end)
+        if self._kept.size + end - start <= KEEP_PARSED_SIZE:
+            self._kept.zones[start] = zone
+            self._kept.size += end - start
+        return zone
+
+    def field(self, index:int, key:str) -> Any:
+        '''
+        Same as self[index][key], but only that item of the zone is parsed
+        (unless the whole zone was already kept by peek()).
+        '''
+        start, end = self._spans[index]
+        if start in self._kept.zones:
+            return self._kept.zones[start][key]
+        buf = self._buf
+        if buf[start:start+1] != b'{':
+            # Not an object, so let the lookup fail the usual way
+            return self[index][key]
+        found = []
+        def read_item(item_key:Optional[str], item_start:int) \
+                -> Tuple[None, int]:
+            item_end = _value_end(buf, item_start)
+            if item_key == key:
+                # If it's in there more than once, the last one counts
+                found[:] = [_load(buf, item_start, item_end)]
+            return (None, item_end)
+        _read_items(buf, start, read_item)
+        if not found:
+            raise KeyError(key)
+        return found[0]
+
+    def raw(self, index:int) -> bytes:
+        '''
+        The JSON text of a zone, straight from the file (UTF-8 encoded).
+        Counts as a lookup, so if peek() kept the zone, it's let go.
+        '''
+        start, end = self._spans[index]
+        if start in self._kept.zones:
+            del self._kept.zones[start]
+            self._kept.size -= end - start
+        return self._buf[start:end]
+
+def peek_zone(zones:Sequence, index:int) -> Any:
+    '''
+    zones[index], but if zones is a LazyZoneList, the zone is kept for its
+    next lookup (see LazyZoneList.peek()).
+    '''
+    if isinstance(zones, LazyZoneList):
+        return zones.peek(index)
+    return zones[index]
+
+def zone_field(zones:Sequence, index:int, key:str) -> Any:
+    '''
+    zones[index][key], but if zones is a LazyZoneList, only that item of the
+    zone is parsed (see LazyZoneList.field()).
+    '''
+    if isinstance(zones, LazyZoneList):
+        return zones.field(index, key)
+    return zones[index][key]
+
+def _error(msg:str, pos:int) -> json.JSONDecodeError:
+    # The file is bytes, not a str, so there's no doc to quote
+    return json.JSONDecodeError(msg, '', pos)
+
+def _load(buf:bytes, start:int, end:int) -> Any:
+    # Same as json.load() on a piece of the file (decoding it the same way
+    # codecs.open() would, so bad UTF-8 still raises UnicodeDecodeError)
+    return loads(buf[start:end])
+
+def _skip_whitespace(buf:bytes, pos:int) -> int:
+    return _WHITESPACE.match(buf, pos).end()
+
+def _expect(buf:bytes, pos:int, char:bytes) -> int:
+    # Skip to the next character, make sure it's char, and skip over it
+    pos = _skip_whitespace(buf, pos)
+    if buf[pos:pos+1] != char:
+        raise _error(f'Expecting {char.decode()!r}', pos)
+    return pos + 1
+
+def _value_end(buf:bytes, pos:int) -> int:
+    # Find where the JSON value starting at pos ends, without parsing it
+    first = buf[pos:pos+1]
+    if first == b'"':
+        match = _STRING.match(buf, pos)
+        if match is None:
+            raise _error('Unterminated string', pos)
+        return match.end()
+    if first in (b'[', b'{'):
+        depth = 0
+        for match in _TOKEN.finditer(buf, pos):
+            if match.lastindex == 2: # [ or {
+                depth += 1
+            elif match.lastindex == 3: # ] or }
+                depth -= 1
+            if depth <= 0:
+                return match.end()
+        raise _error('Unterminated array or object', pos)
+    match = _SCALAR.match(buf, pos)
+    if match is None:
+        raise _error('Expecting value', pos)
+    return match.end()
+
+def _read_items(buf:bytes, pos:int,
+                read_item:Callable[[Optional[str], int], Tuple[Any, int]]) \
+                -> Tuple[List[Tuple[Optional[str], Any]], int]:
+    # Read the array or object starting at pos, letting read_item decide how
+    # to read each item: read_item(key, item start) -> (item, item end),
+    # where key is None for arrays.
+    # Returns ([(key, item)...], end position).
+    opener = buf[pos:pos+1]
+    closer = b']' if opener == b'[' else b'}'
+    items = []
+    pos = _skip_whitespace(buf, pos + 1)
+    if buf[pos:pos+1] == closer:
+        return (items, pos + 1)
+    while True:
+        pos = _skip_whitespace(buf, pos)
+        key = None
+        if opener == b'{':
+            if buf[pos:pos+1] != b'"':
+                raise _error('Expecting property name enclosed in double '
+                             'quotes', pos)
+            key_end = _value_end(buf, pos)
+            key = _load(buf, pos, key_end)
+            pos = _skip_whitespace(buf, _expect(buf, key_end, b':'))
+        item, pos = read_item(key, pos)
+        items.append((key, item))
+        pos = _skip_whitespace(buf, pos)
+        next_char = buf[pos:pos+1]
+        if next_char == closer:
+            return (items, pos + 1)
+        if next_char != b',':
+            raise _error("Expecting ',' delimiter", pos)
+        pos += 1
+
+def _read_value(buf:bytes, pos:int) -> Tuple[Any, int]:
+    end = _value_end(buf, pos)
+    return (_load(buf, pos, end), end)
+
+def _read_zones(buf:bytes, pos:int, kept:_KeptZones) -> Tuple[Any, int]:
+    # Find where each zone starts and ends, but don't parse them
+    if buf[pos:pos+1] != b'[':
+        return _read_value(buf, pos)
+    def read_span(key:None, item_start:int) -> Tuple[Tuple[int, int], int]:
+        item_end = _value_end(buf, item_start)
+        return ((item_start, item_end), item_end)
+    items, end = _read_items(buf, pos, read_span)
+    return (LazyZoneList(buf, [span for _, span in items], kept), end)
+
+def _read_level(buf:bytes, pos:int, kept:_KeptZones) -> Tuple[Any, int]:
+    if buf[pos:pos+1] != b'{':
+        return _read_value(buf, pos)
+    items, end = _read_items(buf, pos, lambda key, item_start:
+            _read_zones(buf, item_start, kept) if key == 'zone' else
+            _read_value(buf, item_start))
+    return (dict(items), end)
+
+def _read_levels(buf:bytes, pos:int) -> Tuple[Any, int]:
+    if buf[pos:pos+1] != b'[':
+        return _read_value(buf, pos)
+    # Every level's zones share one limit for how many can be kept parsed
+    kept = _KeptZones()
+    items, end = _read_items(buf, pos, lambda key, item_start:
+            _read_level(buf, item_start, kept))
+    return ([level for _, level in items], end)
+
+def load_world(open_path:str) -> dict:
+    '''
+    Read a world file like json.load() would, except that each level's
+    'zone' list is a LazyZoneList that parses zones on demand.
+    Raises json.JSONDecodeError if the world's skeleton isn't valid JSON, or
+    BinaryFileError if the file starts like a binary file.
+    Errors inside a zone only show up when that zone gets parsed.
+    '''
+    with open(open_path, 'rb') as read_file:
+        _check_head(read_file.read(_HEAD_SIZE), open_path)
+        try:
+            buf : Union[bytes, mmap.mmap] = mmap.mmap(read_file.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Empty files (and some file systems) can't be mapped
+            read_file.seek(0)
+            buf = read_file.read()
+    pos = 0
+    if buf[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8:
+        # Skip the byte order mark, same as the utf-8-sig codec
+        pos = len(codecs.BOM_UTF8)
+    try:
+        pos = _skip_whitespace(buf, pos)
+        if buf[pos:pos+1] != b'{':
+            raise _error('Expecting object', pos)
+        items, end = _read_items(buf, pos, lambda key, item_start:
+                _read_levels(buf, item_start) if key == 'world' else
+                _read_value(buf, item_start))
+        if _skip_whitespace(buf, end) != len(buf):
+            raise _error('Extra data', end)
+    except json.JSONDecodeError:
+        # If it's not even text (e.g. an image), raise UnicodeDecodeError
+        # instead, same as json.load() would
+        str(buf, 'utf-8')
+        raise
+    return dict(items)
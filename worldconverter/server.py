@@ -0,0 +1,294 @@
+'''
+A local conversion service, for running the converter behind a website or
+another program without starting a new Python process for every world.
+
+    python -m worldconverter serve [--port 8765 | --unix PATH]
+
+The server stays running, so the translation tables (see translation.py and
+objects.py) are only built once, when it starts, and the asset probe cache
+(see probes.py) stays warm between requests.
+
+Endpoints:
+    GET  /health
+        {"status": "ok", "version": "..."}
+    POST /convert?from=auto&to=legacy&prog=1&name=world.json
+        The request body is a world file (name is only used in the
+        warnings, and has to be a plain file name). The response is
+        {"failed": false, "warnings": "...", "world": {...converted world...}}
+        or, if the world couldn't be converted, status 422 and
+        {"failed": true, "warnings": "...error message...", "world": null}
+        (or status 500 if something went wrong with the server itself)
+
+At most a fixed number of worlds are converted at once. Requests that can't
+get a turn within the timeout get status 503, and conversions that take
+longer than the timeout get status 504.
+'''
+
+import json
+import os
+import shutil
+import signal
+import socketserver
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import *
+from urllib.parse import parse_qs, urlsplit
+
+from .constants import *
+from .context import ConversionContext
+from .core import run_conversion
+from .objects import get_obj_table
+from .translation import get_translation_table
+
+# Names accepted by the from= and to= query parameters
+VERSION_NAMES = {
+    'auto': AUTODETECT,
+    'deluxe': DELUXE,
+    'legacy': LEGACY,
+    'remake': REMAKE,
+    'classic': CLASSIC,
+}
+
+# Longest name= accepted, in bytes (file names can be 255 at most, and
+# the converted world's name is a bit longer)
+MAX_NAME_SIZE = 200
+
+# Default settings
+MAX_WORKERS = os.cpu_count() or 1
+REQUEST_TIMEOUT = 60.0
+MAX_BODY_SIZE = 256 * 1024 * 1024
+
+def warm_up():
+    '''
+    Build every translation table the server might need, so the first
+    request for each setting doesn't have to wait for it.
+    '''
+    for convert_from in (DELUXE, LEGACY, REMAKE):
+        for convert_to in (DELUXE, LEGACY, REMAKE, CLASSIC):
+            get_obj_table(convert_from, convert_to)
+            for use_prog in (False, True):
+                get_translation_table(convert_from, convert_to, use_prog)
+
+class ConversionService:
+    '''
+    Runs conversions for the server: up to max_workers at once, each one
+    given up on (from the client's point of view) after timeout seconds.
+    Worlds are converted through temporary files (in a new folder inside
+    temp_dir), so big worlds still get read one zone at a time (see
+    reader.py).
+    '''
+    def __init__(self, max_workers:int=MAX_WORKERS,
+                 timeout:float=REQUEST_TIMEOUT, online:bool=False,
+                 temp_dir:Optional[str]=None):
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.online = online
+        self.temp_dir = tempfile.mkdtemp(prefix='worldconverter-',
+                                         dir=temp_dir)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                        thread_name_prefix='convert')
+        # One per conversion that's running (or timed out but still going)
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+
+    def _convert(self, world:bytes, name:str, convert_from:int,
+                 convert_to:int,
+                 use_prog:bool) -> Tuple[bool, str, Optional[str]]:
+        # Convert in the background thread. Returns (failed, warnings,
+        # converted world JSON).
+        try:
+            request_dir = tempfile.mkdtemp(dir=self.temp_dir)
+            open_path = os.path.join(request_dir, name)
+            save_path = os.path.join(request_dir, 'converted-' + name)
+            try:
+                with open(open_path, 'wb') as world_file:
+                    world_file.write(world)
+                context = ConversionContext(convert_from, convert_to,
+                                            use_prog, self.online)
+                try:
+                    warnings = run_conversion(open_path, save_path, context)
+                except Exception as e:
+                    # A world that's broken in some way the converter
+                    # doesn't expect (same as the CLI)
+                    context.failed = True
+                    warnings = f'Failed to convert {open_path}\n\
+{type(e).__name__}: {e}\n'
+                # The temporary folder means nothing to the client
+                warnings = warnings.replace(request_dir + os.sep, '')
+                if context.failed:
+                    return (True, warnings, None)
+                with open(save_path, 'r', encoding='utf-8') as save_file:
+                    return (False, warnings, save_file.read())
+            finally:
+                shutil.rmtree(request_dir, ignore_errors=True)
+        finally:
+            self._slots.release()
+
+    def convert(self, world:bytes, convert_from:int, convert_to:int,
+                use_prog:bool=True, name:str='world.json') -> Tuple[int, str]:
+        '''
+        Convert a world file's contents. name is the world's file name, for
+        the warnings. Returns (HTTP status, response JSON).
+        '''
+        if not self._slots.acquire(timeout=self.timeout):
+            return (503, _error_json('Too many conversions at once. '
+                                     'Try again later.\n'))
+        future = self._pool.submit(self._convert, world, name,
+                                   convert_from, convert_to, use_prog)
+        try:
+            failed, warnings, converted = future.result(self.timeout)
+        except FutureTimeoutError:
+            # It keeps its slot until it's actually done, so timed out
+            # conversions can't pile up
+            return (504, _error_json('The conversion took too long.\n'))
+        except Exception as e:
+            # Not the world's fault, e.g. the temporary folder is full
+            return (500, _error_json(f'Internal server error\n\
+{type(e).__name__}: {e}\n'))
+        if failed:
+            return (422, _error_json(warnings))
+        # The converted world is already JSON, so paste it in as is
+        return (200, '{"failed":false,"warnings":' + json.dumps(warnings) +
+                ',"world":' + converted + '}')
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+def is_plain_file_name(name:str) -> bool:
+    '''
+    Check that name can only be a file in the folder it's put in, i.e. it's
+    not empty, '.' or '..', and doesn't have any slashes in it.
+    '''
+    return name not in ('', '.', '..') and not any(
+            char in name for char in ('/', '\\', '\0')) \
+        and len(name.encode('utf-8', 'surrogatepass')) <= MAX_NAME_SIZE
+
+def _error_json(message:str) -> str:
+    return json.dumps({'failed': True, 'warnings': message, 'world': None})
+
+class RequestHandler(BaseHTTPRequestHandler):
+    '''
+    Handles one HTTP request. self.server.service is the ConversionService.
+    '''
+    server_version = f'WorldConverter/{VERSION}'
+    # Max seconds to wait for the client to send something
+    timeout = REQUEST_TIMEOUT
+
+    def send_json(self, status:int, body:str):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/health':
+            self.send_json(200, json.dumps({'status': 'ok',
+                                            'version': VERSION}))
+        else:
+            self.send_json(404, _error_json('Not found.\n'))
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/convert':
+            self.send_json(404, _error_json('Not found.\n'))
+            return
+        query = {key: values[-1]
+                 for key, values in parse_qs(url.query).items()}
+        convert_from = VERSION_NAMES.get(query.get('from', 'auto'))
+        convert_to = VERSION_NAMES.get(query.get('to', 'legacy'))
+        if convert_from is None or convert_to in (None, AUTODETECT):
+            self.send_json(400, _error_json('Unknown game version.\n'))
+            return
+        use_prog = query.get('prog', '1') not in ('0', 'false')
+        # Only used in the warnings (and as the name of the temporary file),
+        # so don't let it go anywhere else
+        name = query.get('name') or 'world.json'
+        if not is_plain_file_name(name):
+            self.send_json(400, _error_json('The name has to be a file name, '
+                                            'without any folders.\n'))
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.send_json(411, _error_json('Content-Length is required.\n'))
+            return
+        if length > self.server.max_body_size:
+            self.send_json(413, _error_json('The world is too big.\n'))
+            return
+        world = self.rfile.read(length)
+        if len(world) < length:
+            # Client hung up
+            return
+
+        status, body = self.server.service.convert(world, convert_from,
+                                                   convert_to, use_prog, name)
+        self.send_json(status, body)
+
+    def address_string(self) -> str:
+        # Unix sockets don't have a client address
+        return self.client_address[0] if self.client_address else 'local'
+
+class ConversionServer(socketserver.ThreadingMixIn, HTTPServer):
+    '''
+    HTTP server on a TCP port, one thread per connection.
+    '''
+    daemon_threads = True
+
+    def __init__(self, address:Tuple[str, int], service:ConversionService,
+                 max_body_size:int=MAX_BODY_SIZE):
+        super().__init__(address, RequestHandler)
+        self.service = service
+        self.max_body_size = max_body_size
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class UnixConversionServer(socketserver.ThreadingMixIn,
+                               socketserver.UnixStreamServer):
+        '''
+        The same server on a Unix socket (not available on Windows).
+        '''
+        daemon_threads = True
+
+        def __init__(self, path:str, service:ConversionService,
+                     max_body_size:int=MAX_BODY_SIZE):
+            super().__init__(path, RequestHandler)
+            self.service = service
+            self.max_body_size = max_body_size
+
+def serve(host:str='127.0.0.1', port:int=8765, unix_path:Optional[str]=None,
+          max_workers:int=MAX_WORKERS, timeout:float=REQUEST_TIMEOUT,
+          max_body_size:int=MAX_BODY_SIZE, online:bool=False):
+    '''
+    Run the conversion service until interrupted (e.g. with Ctrl+C) or
+    terminated. If unix_path is set, listen on that Unix socket instead of
+    host:port.
+    '''
+    if threading.current_thread() is threading.main_thread():
+        # Clean up the same way when terminated (e.g. by a service manager)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    warm_up()
+    service = ConversionService(max_workers, timeout, online)
+    if unix_path is not None:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        server = UnixConversionServer(unix_path, service, max_body_size)
+        where = unix_path
+    else:
+        server = ConversionServer((host, port), service, max_body_size)
+        where = f'http://{host}:{server.server_address[1]}'
+    print(f'Converting worlds at {where} (press Ctrl+C to stop)', flush=True)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if unix_path is not None and os.path.exists(unix_path):
+            os.remove(unix_path)
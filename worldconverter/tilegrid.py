@@ -0,0 +1,496 @@
+'''
+Compact storage for a zone or layer's tiles while it's being converted.
+
+A Deluxe tile is a Python list of 5 ints (over 100 bytes each), and a td32
+tile is a big int object. A TileGrid stores the same tiles as 5 parallel
+arrays (one per field), which takes 6 bytes per tile, and converts them in
+place. It only turns back into JSON-style lists when the world is saved
+(see writer.py).
+
+Most zones are only a few dozen different tiles, though, so a PaletteGrid
+is usually even smaller: each different tile is stored once, in a palette,
+and each cell is just the 1 or 2 byte index of its tile in the palette.
+Converting it only means converting the palette.
+'''
+
+import sys
+from array import array
+from itertools import filterfalse
+from typing import *
+
+from .constants import *
+
+# An array type with 4-byte items, for packing td32 tiles
+_UINT32 = array('I')
+
+class TileGrid:
+    '''
+    A rectangular grid of tiles, stored row by row (top row first) as
+    parallel arrays: sprite index, bump state, depth, tile definition and
+    extra data.
+    deluxe is whether to_rows() gives Deluxe lists or td32 ints.
+    '''
+    __slots__ = ('width', 'height', 'sprite', 'bump', 'depth', 'tile_def',
+                 'extra', 'deluxe')
+
+    def __init__(self, width:int, height:int, deluxe:bool=False):
+        self.width = width
+        self.height = height
+        self.sprite = array('H')
+        self.bump = array('B')
+        self.depth = array('B')
+        self.tile_def = array('B')
+        self.extra = array('B')
+        self.deluxe = deluxe
+
+    @classmethod
+    def from_rows(cls, rows:list,
+                  extract_tile:Callable[[Any], list]) -> Optional['TileGrid']:
+        '''
+        Pack a zone or layer's tile data (in any format) into a TileGrid.
+        Whole rows are packed at once when every tile in them is a clean
+        Deluxe list or td32 int. Any other row is packed one tile at a time,
+        using extract_tile() (from core.py) for tiles that need cleaning up.
+        Returns None if the rows have different lengths, or a value is too
+        big for the arrays. The caller should use the regular per-tile code
+        for those.
+        '''
+        width = len(rows[0]) if rows else 0
+        grid = cls(width, len(rows))
+        columns = (grid.sprite, grid.bump, grid.depth, grid.tile_def,
+                   grid.extra)
+        for row in rows:
+            if len(row) != width:
+                return None
+            if not row:
+                continue
+            row_start = len(grid.sprite)
+            try:
+                if type(row[0]) is list:
+                    # Deluxe: turn the row of tiles into a column per field.
+                    # Any extra fields past the 5th are ignored, same as in
+                    # extract_tile().
+                    fields = list(zip(*row))
+                    if len(fields) < 5 or len(fields[0]) != width:
+                        raise TypeError('not a clean Deluxe row')
+                    # fromlist() and bytes() are much faster than extend()
+                    grid.sprite.fromlist(list(fields[0]))
+                    grid.bump.frombytes(bytes(fields[1]))
+                    grid.depth.frombytes(bytes(fields[2]))
+                    grid.tile_def.frombytes(bytes(fields[3]))
+                    grid.extra.frombytes(bytes(fields[4]))
+                else:
+                    _split_td32(row, grid)
+                continue
+            except (TypeError, ValueError, OverflowError):
+                # Something that isn't an int, or is out of range. Undo
+                # whatever got added and go tile by tile instead.
+                for column in columns:
+                    del column[row_start:]
+            try:
+                for tile in row:
+                    tile_start = len(grid.sprite)
+                    try:
+                        if type(tile) is not list:
+                            raise TypeError
+                        grid.sprite.append(tile[0])
+                        grid.bump.append(tile[1])
+                        grid.depth.append(tile[2])
+                        grid.tile_def.append(tile[3])
+                        grid.extra.append(tile[4])
+                    except (TypeError, IndexError):
+                        # Let extract_tile() clean it up (or decode td32)
+                        for column in columns:
+                            del column[tile_start:]
+                        for column, value in zip(columns, extract_tile(tile)):
+                            column.append(value)
+            except OverflowError:
+                return None
+        return grid
+
+    def to_rows(self) -> list:
+        '''
+        Unpack the grid into a list of rows, in the format the world file
+        uses (Deluxe lists or td32 ints).
+        '''
+        if not self.width:
+            return [[] for _ in range(self.height)]
+        if self.deluxe:
+            tiles = list(map(list, zip(self.sprite, self.bump, self.depth,
+                                       self.tile_def, self.extra)))
+        else:
+            tiles = self._td32_values()
+        return [tiles[i : i + self.width]
+                for i in range(0, len(tiles), self.width)]
+
+    def _td32_values(self) -> List[int]:
+        # Encode every tile as td32
+        count = len(self.sprite)
+        if not count or max(self.sprite) >= 2**11 or max(self.bump) >= 2**4 \
+                or max(self.depth) >= 2 or sys.byteorder != 'little' \
+                or _UINT32.itemsize != 4:
+            # Fields overlap (only possible with weird Deluxe tiles), so add
+            # them up the long way
+            return [s + (b << 11) + (d << 15) + (t << 16) + (e << 24)
+                    for s, b, d, t, e in zip(self.sprite, self.bump,
+                            self.depth, self.tile_def, self.extra)]
+        # Otherwise, every field has its own bits, so each td32 is just these
+        # 4 bytes: sprite low byte, then (sprite high bits | bump << 3 |
+        # depth << 7), then tile definition, then extra data. The second
+        # byte is done for every tile at once by treating the columns as
+        # big ints.
+        sprite = self.sprite.tobytes()
+        second = int.from_bytes(sprite[1::2], 'little') | \
+                int.from_bytes(self.bump.tobytes(), 'little') << 3 | \
+                int.from_bytes(self.depth.tobytes(), 'little') << 7
+        packed = bytearray(4 * count)
+        packed[0::4] = sprite[0::2]
+        packed[1::4] = second.to_bytes(count, 'little')
+        packed[2::4] = self.tile_def.tobytes()
+        packed[3::4] = self.extra.tobytes()
+        values = array(_UINT32.typecode)
+        values.frombytes(packed)
+        return values.tolist()
+
+def pack_td32(rows:list) -> Optional[bytes]:
+    '''
+    Pack a grid of td32 tiles into 4 little-endian bytes per tile (sprite
+    low byte, then sprite high bits | bump << 3 | depth << 7, then tile
+    definition, then extra data), so a field of every tile can be read at
+    once, e.g. packed[2::4] for the tile definitions.
+    Returns None if any tile isn't a td32 int from 0 to 2**32-1.
+    '''
+    if _UINT32.itemsize != 4:
+        return None
+    packed = array(_UINT32.typecode)
+    try:
+        for row in rows:
+            packed.fromlist(row)
+    except (TypeError, OverflowError):
+        return None
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+# Byte maps for splitting the second byte of a td32 tile
+_SPRITE_HIGH_MAP = bytes(i & 0x7 for i in range(256))
+_BUMP_MAP = bytes(i >> 3 & 0xf for i in range(256))
+_DEPTH_MAP = bytes(i >> 7 for i in range(256))
+
+def _split_td32(row:list, grid:TileGrid):
+    # Add a row of td32 tiles to a grid. Raises TypeError or OverflowError
+    # for anything that isn't a td32 tile from 0 to 2**32-1.
+    if sys.byteorder != 'little' or _UINT32.itemsize != 4:
+        # Just do the math
+        grid.sprite.fromlist([i & 0x7ff for i in row])
+        grid.bump.frombytes(bytes([i >> 11 & 0xf for i in row]))
+        grid.depth.frombytes(bytes([i >> 15 & 0x1 for i in row]))
+        grid.tile_def.frombytes(bytes([i >> 16 & 0xff for i in row]))
+        grid.extra.frombytes(bytes([i >> 24 & 0xff for i in row]))
+        return
+    # Bytes of each tile: sprite low byte, then (sprite high bits |
+    # bump << 3 | depth << 7), then tile definition, then extra data
+    packed = array(_UINT32.typecode)
+    packed.fromlist(row)
+    packed = packed.tobytes()
+    second = packed[1::4]
+    sprite = bytearray(len(packed) // 2)
+    sprite[0::2] = packed[0::4]
+    sprite[1::2] = second.translate(_SPRITE_HIGH_MAP)
+    grid.sprite.frombytes(sprite)
+    grid.bump.frombytes(second.translate(_BUMP_MAP))
+    grid.depth.frombytes(second.translate(_DEPTH_MAP))
+    grid.tile_def.frombytes(packed[2::4])
+    grid.extra.frombytes(packed[3::4])
+
+# Byte maps for bytes.translate(), used by convert_tile_grid()
+_WATER_MAP = bytes(1 if i in (7, 8, 9) else 0 for i in range(256))
+_AIR_MAP = bytes(1 if i == 0 else 0 for i in range(256))
+_FLAGPOLE = bytes([161])
+_FLAGPOLE_MAP = bytes(1 if i == 161 else 0 for i in range(256))
+
+# Translation tables boiled down to byte maps, keyed by id(table):
+# (table, new definition map, "needs extra data" map, replacements)
+_byte_maps : Dict[int, Tuple[list, bytes, bytes, list]] = {}
+
+def _get_byte_maps(table:list) -> Tuple[bytes, bytes, list]:
+    # Most tile definitions translate the same way no matter what the extra
+    # data is, and leave the extra data alone. Those can be converted with
+    # a 256-byte map. Only the rest (usually 0-3 definitions, e.g. item
+    # blocks) need the full table.
+    cached = _byte_maps.get(id(table))
+    if cached is not None and cached[0] is table:
+        return cached[1:]
+    def_map = bytearray(256)
+    needs_extra = bytearray(256)
+    def_replacements = [None] * 256
+    for tile_def in range(256):
+        rows = table[tile_def*256 : tile_def*256 + 256]
+        new_def, _, replacement = rows[0]
+        if all(row == (new_def, extra, replacement)
+               for extra, row in enumerate(rows)):
+            def_map[tile_def] = new_def
+            def_replacements[tile_def] = replacement
+        else:
+            needs_extra[tile_def] = 1
+    cached = (table, bytes(def_map), bytes(needs_extra), def_replacements)
+    _byte_maps[id(table)] = cached
+    return cached[1:]
+
+def convert_tile_grid(grid:TileGrid, convert_to:int, table:list,
+                      check_flagpole:bool=True) \
+                      -> Tuple[Optional[Tuple[int, int]], list]:
+    '''
+    Convert every tile in a grid in place, using a translation table from
+    get_translation_table(). Also does the water hitbox workaround when
+    converting to Deluxe (see convert_zone()).
+    Returns (flagpole_pos, replacements), where flagpole_pos is the (x, y) of
+    the first flagpole tile (if check_flagpole is set) or None, and
+    replacements is the list of incompatible tile replacements in the order
+    they first appear.
+
+    Nothing here loops over every tile in Python: the tile definitions are
+    converted with bytes.translate(), and only tiles whose extra data
+    matters are looked up one by one.
+    '''
+    def_map, needs_extra, def_replacements = _get_byte_maps(table)
+    old_defs = grid.tile_def.tobytes()
+    new_defs = bytearray(old_defs.translate(def_map))
+    extras = grid.extra
+    width = grid.width
+
+    # Replacements, as {replacement: index of first tile with it}
+    first_seen : Dict[Tuple[str, str], int] = {}
+    for tile_def, replacement in enumerate(def_replacements):
+        if replacement is not None:
+            i = old_defs.find(tile_def)
+            if i != -1 and i < first_seen.get(replacement, len(old_defs)):
+                first_seen[replacement] = i
+
+    # Tiles that need the full table
+    extra_mask = old_defs.translate(needs_extra)
+    i = extra_mask.find(1)
+    while i != -1:
+        new_defs[i], extras[i], replacement = \
+                table[old_defs[i]*256 + extras[i]]
+        if replacement is not None and \
+                i < first_seen.get(replacement, len(old_defs)):
+            first_seen[replacement] = i
+        i = extra_mask.find(1, i + 1)
+
+    # WATER HITBOX WORKAROUND: air directly above water becomes water.
+    # Done on whole rows at once by treating them as big ints: the mask has
+    # a 1 byte wherever the tile below is water and this tile is now air,
+    # and since those tiles are 0, OR-ing in mask*7 makes them 7.
+    if convert_to == DELUXE and width and len(old_defs) > width:
+        below_is_water = old_defs[width:].translate(_WATER_MAP)
+        is_air = new_defs[:-width].translate(_AIR_MAP)
+        mask = int.from_bytes(below_is_water, 'little') & \
+                int.from_bytes(is_air, 'little')
+        if mask:
+            new_defs[:-width] = (int.from_bytes(new_defs[:-width], 'little')
+                    | mask*7).to_bytes(len(new_defs) - width, 'little')
+
+    # FLAGPOLE CHECK
+    flagpole_pos = None
+    if check_flagpole:
+        i = old_defs.find(_FLAGPOLE)
+        if i != -1:
+            flagpole_pos = (i % width, i // width) # (x, y)
+
+    grid.tile_def = array('B', new_defs)
+    grid.deluxe = convert_to == DELUXE
+    replacements = sorted(first_seen, key=first_seen.__getitem__)
+    return (flagpole_pos, replacements)
+
+# For checking that a list is all ints
+_INT64 = array('q')
+
+# Most different tiles a PaletteGrid can have (so indexes fit in 1 byte).
+# Zones with more than that are handled just as well by TileGrid.
+MAX_PALETTE_SIZE = 256
+
+class PaletteGrid:
+    '''
+    A rectangular grid of tiles, stored as a palette (every different tile
+    in the grid, in the order they first appear) plus the palette index of
+    every cell, row by row (top row first). The indexes are 1 byte each
+    until conversion adds more than MAX_PALETTE_SIZE entries (see
+    convert_palette_grid()).
+    Palette entries are tiles in the world file's format (td32 ints or
+    Deluxe lists), except that before conversion, Deluxe tiles are tuples.
+    See entry_rows() for converting them.
+    Cells with the same tile share the same palette entry, so don't change
+    the tiles from to_rows() in place.
+    repeated_rows is how many rows from_rows() found were the same as one
+    it had already done.
+    '''
+    __slots__ = ('width', 'height', 'palette', 'indexes', 'repeated_rows')
+
+    def __init__(self, width:int, height:int, palette:list, indexes:array):
+        self.width = width
+        self.height = height
+        self.palette = palette
+        self.indexes = indexes
+        self.repeated_rows = 0
+
+    @classmethod
+    def from_rows(cls, rows:list) -> Optional['PaletteGrid']:
+        '''
+        Build a PaletteGrid from a zone or layer's tile data.
+        Returns None if the rows have different lengths, the tiles aren't
+        all td32 ints or all Deluxe lists (of hashable values), or there are
+        more than MAX_PALETTE_SIZE different tiles. The caller should use
+        TileGrid (or the regular per-tile code) for those.
+        '''
+        width = len(rows[0]) if rows else 0
+        if any(len(row) != width for row in rows):
+            return None
+        deluxe = width and type(rows[0][0]) is list
+        # Dicts keep their keys in the order they were added
+        positions : Dict[Hashable, int] = {}
+        # Each different row's indexes, so a row that's the same as one
+        # before it is just a lookup
+        row_indexes : Dict[tuple, bytes] = {}
+        chunks : List[bytes] = []
+        repeated_rows = 0
+        # Row by row, so zones with too many different tiles are given up
+        # on early
+        for row in rows:
+            if deluxe:
+                if set(map(type, row)) != {list}:
+                    return None
+                row = tuple(map(tuple, row))
+            else:
+                # Only ints (and bools, which convert the same way). Other
+                # types can be equal to an int (e.g. 1.0 == 1) but don't
+                # convert the same way, so they can't share its entry.
+                try:
+                    _INT64.fromlist(row)
+                except (TypeError, OverflowError):
+                    return None
+                finally:
+                    del _INT64[:]
+                row = tuple(row)
+            try:
+                chunk = row_indexes.get(row)
+                if chunk is None:
+                    # Only the tiles that haven't been seen yet
+                    for tile in filterfalse(positions.__contains__,
+                                            dict.fromkeys(row)):
+                        positions[tile] = len(positions)
+            except TypeError:
+                # Something weird in a Deluxe tile, like another list
+                return None
+            if chunk is not None:
+                repeated_rows += 1
+            else:
+                if len(positions) > MAX_PALETTE_SIZE:
+                    return None
+                # bytes() is much faster than fromlist()
+                chunk = row_indexes[row] = \
+                        bytes(list(map(positions.__getitem__, row)))
+            chunks.append(chunk)
+        indexes = array('B')
+        indexes.frombytes(b''.join(chunks))
+        grid = cls(width, len(rows), list(positions), indexes)
+        grid.repeated_rows = repeated_rows
+        return grid
+
+    def entry_rows(self) -> list:
+        '''
+        The palette as rows of tiles (1 row), for TileGrid.from_rows().
+        '''
+        return [[list(tile) if type(tile) is tuple else tile
+                 for tile in self.palette]]
+
+    def to_rows(self) -> list:
+        '''
+        Expand the grid into a list of rows, in the format the world file
+        uses.
+        '''
+        if not self.width:
+            return [[] for _ in range(self.height)]
+        tiles = list(map(self.palette.__getitem__, self.indexes))
+        return [tiles[i : i + self.width]
+                for i in range(0, len(tiles), self.width)]
+
+    def _cell_flags(self, entry_flags:bytes) -> bytes:
+        # Given a 0 or 1 for each palette entry, return the one for each cell
+        return self.indexes.tobytes().translate(entry_flags.ljust(256, b'\0'))
+
+def convert_palette_grid(grid:PaletteGrid, entries:TileGrid,
+                         convert_to:int, table:list,
+                         check_flagpole:bool=True) \
+                         -> Tuple[Optional[Tuple[int, int]], list]:
+    '''
+    Convert a PaletteGrid in place, using a translation table from
+    get_translation_table(). entries is the grid's palette, packed as a
+    TileGrid with 1 row. Also does the water hitbox workaround when
+    converting to Deluxe (see convert_zone()).
+    Returns (flagpole_pos, replacements), like convert_tile_grid().
+    '''
+    old_defs = entries.tile_def.tobytes()
+    # 1 row, so there's no water to fix yet
+    _, replacements = convert_tile_grid(entries, convert_to, table, False)
+    new_palette = entries.to_rows()[0]
+    width = grid.width
+    cell_count = len(grid.indexes)
+
+    # FLAGPOLE CHECK
+    flagpole_pos = None
+    if check_flagpole and _FLAGPOLE in old_defs:
+        i = grid._cell_flags(old_defs.translate(_FLAGPOLE_MAP)).find(1)
+        flagpole_pos = (i % width, i // width) # (x, y)
+
+    # WATER HITBOX WORKAROUND: air directly above water becomes water.
+    # The cells are found the same way as in convert_tile_grid(), and each
+    # one gets a copy of its palette entry that's water instead of air.
+    water_entries = old_defs.translate(_WATER_MAP)
+    if convert_to == DELUXE and width and cell_count > width \
+            and 1 in water_entries:
+        below_is_water = grid._cell_flags(water_entries)[width:]
+        is_air = grid._cell_flags(
+                entries.tile_def.tobytes().translate(_AIR_MAP))[:-width]
+        mask = int.from_bytes(below_is_water, 'little') & \
+                int.from_bytes(is_air, 'little')
+        air_entries = [i for i, tile in enumerate(new_palette)
+                       if tile[3] == 0]
+        if mask and len(new_palette) + len(air_entries) <= MAX_PALETTE_SIZE:
+            # Give every air entry a water copy, then switch the masked
+            # cells to the copies, again as big ints
+            copy_map = bytearray(range(256))
+            for i in air_entries:
+                copy_map[i] = len(new_palette)
+                new_palette.append(new_palette[i][:3] + [7] +
+                                   new_palette[i][4:])
+            data = grid.indexes.tobytes()
+            above = data[:-width]
+            byte_mask = mask * 0xff
+            above = (int.from_bytes(above, 'little') & ~byte_mask |
+                     int.from_bytes(above.translate(copy_map), 'little')
+                     & byte_mask).to_bytes(len(above), 'little')
+            grid.indexes = array('B', above + data[-width:])
+        elif mask:
+            # Too many for 1 byte indexes, so go cell by cell
+            mask_bytes = mask.to_bytes(cell_count - width, 'little')
+            indexes = grid.indexes
+            # palette index -> index of its water copy
+            water_copies : Dict[int, int] = {}
+            i = mask_bytes.find(1)
+            while i != -1:
+                entry = indexes[i]
+                water_copy = water_copies.get(entry)
+                if water_copy is None:
+                    water_copy = water_copies[entry] = len(new_palette)
+                    new_palette.append(new_palette[entry][:3] + [7] +
+                                       new_palette[entry][4:])
+                    if len(new_palette) > MAX_PALETTE_SIZE \
+                            and indexes.typecode == 'B':
+                        # Water copies have to go past the end
+                        indexes = grid.indexes = array('H', indexes)
+                indexes[i] = water_copy
+                i = mask_bytes.find(1, i + 1)
+
+    grid.palette = new_palette
+    return (flagpole_pos, replacements)
@@ -0,0 +1,174 @@
+'''
+Tile definition translation, plus precompiled translation tables.
+
+What a tile turns into only depends on its tile definition, its extra data,
+and the conversion settings. So instead of looking up the tile database and
+following fallback chains for every tile in a world, we work out the answer
+for every possible (tile definition, extra data) pair once per
+(convert_from, convert_to, use_prog) setting, and each tile after that is
+a single list index.
+'''
+
+from typing import *
+
+from .constants import *
+from .database import *
+
+# (new_def, new_extra, replacement)
+# replacement is a (old tile name, new tile name) tuple if an incompatible
+# tile got replaced with a fallback, or None if it didn't
+TileTranslation = Tuple[int, int, Optional[Tuple[str, str]]]
+
+def translate_tile(tile_def:int, extra:int, convert_from:int, convert_to:int,
+                   use_prog:bool=False) -> TileTranslation:
+    '''
+    Work out what a tile definition + extra data turns into in another
+    version, including any ID changes and replacements of incompatible tiles.
+    This is the slow path that the translation tables are built from.
+    '''
+    # Get data of the tile that the old ID refers to
+    if convert_from == DELUXE:
+        try:
+            db_entry = TILE_DATABASE[deluxe_tile_lookup[tile_def]]
+        except KeyError:
+            # If tile ID is invalid, turn it into air
+            db_entry = TILE_DATABASE[0]
+    elif convert_from == REMAKE:
+        try:
+            db_entry = TILE_DATABASE[remake_tile_lookup[tile_def]]
+        except KeyError:
+            # If tile ID is invalid, turn it into air
+            db_entry = TILE_DATABASE[0]
+    else: # legacy/classic/inferno
+        try:
+            db_entry = TILE_DATABASE[legacy_tile_lookup[tile_def]]
+        except KeyError:
+            # If tile ID is invalid, turn it into air
+            db_entry = TILE_DATABASE[0]
+
+    # Find that tile's new ID
+    new_def = get_tile_id_for_version(db_entry, convert_to)
+    new_extra = extra
+    replacement = None
+
+    # If converting to L/D, use progressive item blocks where appropriate
+    if convert_to & (LEGACY|DELUXE) and use_prog \
+            and extra in (81, 82): # mushroom, flower
+        if db_entry[0] == 'item block':
+            new_def = 20 # progressive item block ID in both Legacy & Deluxe
+        if db_entry[0] == 'item block invisible':
+            new_def = 27 if convert_to==DELUXE else 26
+
+    # If tile not compatible with target version, follow fallback chain
+    if not (db_entry[1] & convert_to):
+        replacement = ('error', 'error')
+
+        for i in db_entry[5]: # tuple of possible fallback tiles
+            if i == 0 or i == 1:
+                # In the database, 0 and 1 are accepted shorthands for
+                # air and solid, respectively -- for convenience
+                fallback_id = i
+                fallback_entry = TILE_DATABASE[i]
+            else:
+                fallback_entry = get_tile_by_name(i)
+                fallback_id = get_tile_id_for_version(fallback_entry,
+                        convert_to)
+
+            # If the fallback tile is compatible with the target version:
+            if fallback_entry[1] & convert_to:
+                new_def = fallback_id
+
+                # Get data for fallback tile to add to log
+                # (may be changed by special cases below)
+                replacement = (db_entry[0], fallback_entry[0])
+
+                # BEGIN SPECIAL CASES (mostly for extra data)
+
+                # Convert conveyors from Remake to Deluxe format
+                if db_entry[0] == 'conveyor' and convert_to == DELUXE:
+                    if extra < 128:
+                        new_def = 14 # Conveyor left
+                        replacement = (db_entry[0], 'conveyor left')
+                    elif extra > 128:
+                        new_def = 15 # Conveyor right
+                        replacement = (db_entry[0], 'conveyor right')
+                    else: # Remake conveyor speed = 0
+                        new_def = 1 # Solid standard
+
+                # Convert conveyors from Deluxe to Remake format
+                # Make the custom Remake speed about the same as
+                # the only Deluxe speed
+                if db_entry[0] == 'conveyor left' and \
+                        convert_to == REMAKE:
+                    new_extra = 124
+                if db_entry[0] == 'conveyor right' and \
+                        convert_to == REMAKE:
+                    new_extra = 132
+
+                # Make former progressive item blocks
+                # always spit out a mushroom
+                if 'progressive' in db_entry[0]:
+                    new_extra = 81 # mushroom
+
+                # turn ice -> tile blocks into ice -> object blocks
+                # that turn into 0 object
+                if 'ice -> tile' in db_entry[0]:
+                    new_extra = 0
+
+                # END SPECIAL CASES
+
+                break
+            # If fallback tile is NOT compatible with target
+            # version, do another round of the loop
+
+        # When loop is done, replacement holds the note that the tile
+        # was replaced
+
+    return (new_def, new_extra, replacement)
+
+# Compiled translation tables, one per (convert_from, convert_to, use_prog)
+# setting. Each one is only built the first time it's needed.
+_translation_tables : Dict[Tuple[int, int, bool], List[TileTranslation]] = {}
+
+def build_translation_table(convert_from:int, convert_to:int,
+                            use_prog:bool=False) -> List[TileTranslation]:
+    '''
+    Translate every possible (tile definition, extra data) pair in advance.
+    Both are 8-bit in td32, so the result is a flat list of 65536 entries,
+    where the entry for a tile is at index tile_def*256 + extra.
+    '''
+    if convert_from == DELUXE:
+        lookup = deluxe_tile_lookup
+    elif convert_from == REMAKE:
+        lookup = remake_tile_lookup
+    else: # legacy/classic/inferno
+        lookup = legacy_tile_lookup
+
+    # Every invalid tile definition turns into air the same way,
+    # so they can all share one row of the table
+    invalid_row = [translate_tile(-1, extra, convert_from, convert_to,
+                                  use_prog)
+                   for extra in range(256)]
+
+    table : List[TileTranslation] = []
+    for tile_def in range(256):
+        if tile_def in lookup:
+            table += [translate_tile(tile_def, extra, convert_from,
+                                     convert_to, use_prog)
+                      for extra in range(256)]
+        else:
+            table += invalid_row
+    return table
+
+def get_translation_table(convert_from:int, convert_to:int,
+                          use_prog:bool=False) -> List[TileTranslation]:
+    '''
+    Return the translation table for a conversion setting, building it if it
+    hasn't been used yet.
+    '''
+    key = (convert_from, convert_to, bool(use_prog))
+    table = _translation_tables.get(key)
+    if table is None:
+        table = build_translation_table(*key)
+        _translation_tables[key] = table
+    return table
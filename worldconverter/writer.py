@@ -0,0 +1,139 @@
+'''
+Streaming JSON writer for converted worlds.
+
+Instead of converting the whole world and then saving it with one big
+json.dump() call, each zone is converted just before it's written and thrown
+away right after, so memory use doesn't pile up with the size of the world.
+The output is byte-for-byte the same as
+json.dump(content, file, separators=(',',':')), though the tile data is
+encoded with a faster JSON library if there is one (see jsonbackend.py).
+'''
+
+import json
+import os
+from collections import abc
+from typing import *
+
+from .jsonbackend import dumps_int_array, get_json_backend
+from .tilegrid import PaletteGrid, TileGrid
+
+def _to_json(obj:Any) -> Any:
+    # Tile grids are only turned back into lists when they're written
+    if isinstance(obj, (TileGrid, PaletteGrid)):
+        return obj.to_rows()
+    raise TypeError(f'Object of type {type(obj).__name__} '
+                    'is not JSON serializable')
+
+# The same settings convert() has always saved worlds with. encode() (unlike
+# json.dump) uses the fast C encoder.
+_encode = json.JSONEncoder(separators=(',',':'), default=_to_json).encode
+
+def _encode_tiles(data:Any) -> str:
+    # A zone or layer's tile data, which is most of the world
+    if isinstance(data, (TileGrid, PaletteGrid)):
+        data = data.to_rows()
+    data_json = dumps_int_array(data)
+    return data_json if data_json is not None else _encode(data)
+
+def _encode_tiled(obj:Any) -> str:
+    # Same as _encode(), but if obj is a zone or layer, its tile data goes
+    # through _encode_tiles()
+    if get_json_backend() == 'json' or type(obj) is not dict \
+            or any(type(key) is not str for key in obj):
+        return _encode(obj)
+    items = []
+    for key, value in obj.items():
+        if key == 'data':
+            value_json = _encode_tiles(value)
+        elif key == 'layers' and type(value) is list:
+            value_json = '[' + ','.join(map(_encode_tiled, value)) + ']'
+        else:
+            value_json = _encode(value)
+        items.append(_encode(key) + ':' + value_json)
+    return '{' + ','.join(items) + '}'
+
+def encode_zone(zone:dict) -> str:
+    '''
+    Encode 1 zone the same way iter_world_json() would.
+    '''
+    return _encode_tiled(zone)
+
+def iter_world_json(content:dict,
+                    convert_zone:Optional[Callable[[dict], None]]=None,
+                    zone_json:Optional[Iterator[str]]=None) -> Iterator[str]:
+    '''
+    Encode a world as compact JSON, one piece at a time.
+    If convert_zone is set, it's called on each zone (to change it in place)
+    right before the zone is encoded.
+    If zone_json is set, the zones aren't looked at at all. Instead, each
+    one's JSON is taken from zone_json, which has to give every zone in the
+    world, in order (see parallel.py).
+    Zones are removed from content (replaced with None) once they've been
+    encoded, so content can't be used again afterwards.
+    '''
+    yield '{'
+    for key_i, (key, value) in enumerate(content.items()):
+        if key_i:
+            yield ','
+        yield _encode(key) + ':'
+        if key != 'world':
+            yield _encode(value)
+            continue
+
+        # World: list of levels
+        yield '['
+        for level_i, level in enumerate(value):
+            if level_i:
+                yield ','
+            yield '{'
+            for level_key_i, (level_key, level_value) in \
+                    enumerate(level.items()):
+                if level_key_i:
+                    yield ','
+                yield _encode(level_key) + ':'
+                if level_key != 'zone':
+                    yield _encode(level_value)
+                    continue
+
+                # Level: list of zones
+                yield '['
+                if zone_json is not None and isinstance(level_value,
+                                                        abc.Sequence):
+                    for zone_i in range(len(level_value)):
+                        yield (',' if zone_i else '') + next(zone_json)
+                    yield ']'
+                    continue
+                for zone_i, zone in enumerate(level_value):
+                    if convert_zone is not None:
+                        convert_zone(zone)
+                    yield (',' if zone_i else '') + encode_zone(zone)
+                    # Done with this zone, so let it be garbage collected
+                    # (zones that are read lazily aren't stored anyway)
+                    if isinstance(level_value, list):
+                        level_value[zone_i] = None
+                yield ']'
+            yield '}'
+        yield ']'
+    yield '}'
+
+def save_world(content:dict, save_path:str,
+               convert_zone:Optional[Callable[[dict], None]]=None,
+               zone_json:Optional[Iterator[str]]=None):
+    '''
+    Write a world to save_path as it's being converted (see iter_world_json).
+    The file is written under a temporary name first, so if anything goes
+    wrong partway through, any existing file at save_path is left alone.
+    '''
+    temp_path = save_path + '.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as write_file:
+            for chunk in iter_world_json(content, convert_zone, zone_json):
+                write_file.write(chunk)
+        os.replace(temp_path, save_path)
+    except BaseException:
+        # Don't leave half a world lying around
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise